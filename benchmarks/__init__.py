@@ -0,0 +1,7 @@
+"""
+Mesures de performance de l'application sur des flottes synthétiques.
+
+Exécution, sans Streamlit, depuis la racine du dépôt :
+
+    python -m benchmarks --tailles 1000 10000 --sortie resultats.json
+"""
@@ -0,0 +1,39 @@
+import argparse
+import json
+import sys
+
+from benchmarks.suite import STOCKAGES, TAILLES, comparer, executer
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description="Mesure le chargement, la sauvegarde, le filtrage, le scoring, les statistiques "
+                    "et la génération de PDF sur des flottes synthétiques."
+    )
+    parser.add_argument('--tailles', type=int, nargs='+', default=TAILLES, help="Tailles de flotte mesurées")
+    parser.add_argument('--repetitions', type=int, default=3, help="Nombre d'exécutions de chaque mesure")
+    parser.add_argument('--graine', type=int, default=0, help="Graine de génération des flottes")
+    parser.add_argument('--stockage', choices=sorted(STOCKAGES), default='sqlite', help="Moteur de stockage mesuré")
+    parser.add_argument('--sortie', help="Fichier JSON des résultats (sortie standard par défaut)")
+    parser.add_argument('--reference', help="Résultats JSON d'une exécution précédente à comparer")
+    args = parser.parse_args()
+
+    # La progression va sur la sortie d'erreur, la sortie standard ne contient que le JSON
+    def journal(message):
+        print(message, file=sys.stderr, flush=True)
+
+    resultats = executer(args.tailles, args.repetitions, args.graine, args.stockage, journal)
+
+    if args.reference:
+        with open(args.reference, 'r', encoding='utf-8') as f:
+            comparer(resultats, json.load(f), journal)
+
+    texte = json.dumps(resultats, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            f.write(texte + '\n')
+    else:
+        print(texte)
+
+if __name__ == '__main__':
+    main()
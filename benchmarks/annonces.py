@@ -0,0 +1,201 @@
+"""
+Mesure de l'analyse des pages d'annonces (voir utils.scraping) : chaque analyseur
+HTML installé, avec et sans analyse partielle, comparé à l'analyse complète avec
+html.parser. Les informations extraites doivent être identiques dans tous les cas.
+
+Exécution depuis la racine du dépôt, sur les pages du dépôt (benchmarks/pages :
+pages anonymisées aux données fictives, de la structure lue par l'extraction),
+sur d'autres pages enregistrées (fichiers autoscout24*.html et leboncoin*.html
+du dossier donné) ou sur des pages synthétiques générées à la volée :
+
+    python -m benchmarks.annonces
+    python -m benchmarks.annonces --pages dossier_des_pages --sortie resultats.json
+    python -m benchmarks.annonces --synthetiques --nombre 50
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+
+from benchmarks.suite import chronometrer, environnement
+from utils.scraping import analyseurs_disponibles, extraire_infos_page
+
+# Pages enregistrées dans le dépôt, mesurées par défaut
+DOSSIER_PAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pages')
+
+# Mode de référence : l'analyse de la page entière, comme avant l'analyse partielle
+REFERENCE = ('html.parser', False)
+
+URLS = {
+    'autoscout24.fr': 'https://www.autoscout24.fr/offres/{}',
+    'leboncoin.fr': 'https://www.leboncoin.fr/voitures/{}.htm'
+}
+
+MODELES = [
+    ('Peugeot', '308'), ('Renault', 'Clio'), ('Citroën', 'C3'), ('BMW', 'Série 3'),
+    ('Audi', 'A3'), ('Mercedes', 'Classe A'), ('Volkswagen', 'Golf')
+]
+EQUIPEMENTS = [
+    'Climatisation', 'GPS', 'Régulateur de vitesse', 'Caméra de recul', 'Sièges chauffants',
+    'Bluetooth', 'Radar de recul', 'Jantes alliage', 'Toit ouvrant', 'Apple CarPlay'
+]
+
+def _bruit(generateur, blocs):
+    """
+    Contenu que l'extraction ne lit pas, comme sur les pages réelles : menus,
+    annonces similaires, scripts et styles en ligne.
+    """
+    parties = ['<nav><ul>' + ''.join(f'<li><a href="/rubrique/{i}">Rubrique {i}</a></li>' for i in range(40)) + '</ul></nav>']
+    for i in range(blocs):
+        marque, modele = generateur.choice(MODELES)
+        parties.append(
+            f'<article class="similar-ad card"><a href="/annonce/{i}"><img src="https://img.example/{i}.jpg" alt="">'
+            f'<div class="card-body"><p class="card-title">{marque} {modele}</p>'
+            f'<p class="card-text">{generateur.randint(2000, 60000)} € · {generateur.randint(1000, 250000)} km</p>'
+            f'<ul class="tags"><li>{generateur.choice(EQUIPEMENTS)}</li><li>{generateur.choice(EQUIPEMENTS)}</li></ul>'
+            '</div></a></article>'
+        )
+    parties.append('<script>window.__DATA__ = ' + json.dumps({'ids': list(range(500))}) + ';</script>')
+    parties.append('<style>' + ''.join(f'.c{i}{{margin:{i}px}}' for i in range(200)) + '</style>')
+    return '\n'.join(parties)
+
+def _page_autoscout24(generateur, blocs):
+    marque, modele = generateur.choice(MODELES)
+    equipements = generateur.sample(EQUIPEMENTS, 6)
+    specs = {
+        'Carburant': generateur.choice(['Essence', 'Diesel', 'Hybride']),
+        'Puissance': f"{generateur.randint(70, 300)} ch",
+        'Boîte de vitesses': generateur.choice(['Automatique', 'Manuelle']),
+        'Type de véhicule': generateur.choice(['Berline', 'Citadine', 'SUV'])
+    }
+    return f"""<!DOCTYPE html>
+<html lang="fr"><head><title>{marque} {modele}</title></head><body>
+{_bruit(generateur, blocs)}
+<main>
+<h1>{marque} {modele}</h1>
+<div class="price-block"><span class="price">{generateur.randint(3000, 60000):,} €</span>
+<span class="year">{generateur.randint(2005, 2024)}</span></div>
+<img class="gallery-picture main" src="https://img.example/annonce.jpg" alt="">
+<div class="technical-specifications">
+{''.join(f'<div class="item"><span class="label">{label}</span> <span class="value">{valeur}</span></div>' for label, valeur in specs.items())}
+</div>
+<div class="dealer-info">Garage du centre</div>
+<div class="rating">{generateur.randint(30, 50) / 10} / 5</div>
+<div class="location">Lyon ({generateur.randint(1, 400)} km)</div>
+<div class="equipment"><ul>{''.join(f'<li> {equipement} </li>' for equipement in equipements)}</ul></div>
+</main>
+{_bruit(generateur, blocs)}
+</body></html>"""
+
+def _page_leboncoin(generateur, blocs):
+    marque, modele = generateur.choice(MODELES)
+    annee = generateur.randint(2005, 2024)
+    vehicule = {
+        'vehicle': {
+            'fuelType': generateur.choice(['Essence', 'Diesel']),
+            'enginePower': generateur.randint(70, 300),
+            'transmissionType': generateur.choice(['Automatique', 'Manuelle']),
+            'bodyType': generateur.choice(['Berline', 'Citadine', 'SUV'])
+        }
+    }
+    return f"""<!DOCTYPE html>
+<html lang="fr"><head><title>{marque} {modele}</title>
+<script type="application/ld+json">{json.dumps(vehicule, ensure_ascii=False)}</script></head><body>
+{_bruit(generateur, blocs)}
+<div class="_3Jcbv"><h1 class="_3MDJa">{marque} {modele} {annee}</h1>
+<span class="_1F5u3 _2Dq3v">{generateur.randint(3000, 60000):,} €</span></div>
+<img class="_3GJ1I" src="https://img.example/annonce.jpg" alt="">
+<div class="sellerRating">{generateur.randint(30, 50) / 10}</div>
+<div class="_1yzJv">Nantes ({generateur.randint(1, 400)} km)</div>
+<div class="_3eNLO">{''.join(f'<div class="_3Jxf3">{equipement}</div>' for equipement in generateur.sample(EQUIPEMENTS, 5))}</div>
+{_bruit(generateur, blocs)}
+</body></html>"""
+
+def pages_synthetiques(nombre, graine=0, blocs=150):
+    """
+    Génère des pages d'annonces des deux sites, de taille proche des pages réelles
+    (une centaine de Ko). Retourne une liste de (nom, url, html).
+    """
+    generateur = random.Random(graine)
+    pages = []
+    for i in range(nombre):
+        site = 'autoscout24.fr' if i % 2 == 0 else 'leboncoin.fr'
+        html = (_page_autoscout24 if site == 'autoscout24.fr' else _page_leboncoin)(generateur, blocs)
+        pages.append((f"{site.split('.')[0]}_{i}", URLS[site].format(i), html))
+    return pages
+
+def pages_enregistrees(dossier):
+    """Lit les pages enregistrées d'un dossier (autoscout24*.html, leboncoin*.html)."""
+    pages = []
+    for site, modele_url in URLS.items():
+        for chemin in sorted(glob.glob(os.path.join(dossier, f"{site.split('.')[0]}*.html"))):
+            nom = os.path.splitext(os.path.basename(chemin))[0]
+            with open(chemin, 'r', encoding='utf-8') as f:
+                pages.append((nom, modele_url.format(nom), f.read()))
+    return pages
+
+def mesurer(pages, repetitions, journal=print):
+    """
+    Mesure l'extraction de toutes les pages dans chaque mode (analyseur, partielle)
+    et vérifie que les informations extraites sont celles du mode de référence.
+    """
+    modes = [(analyseur, partielle) for analyseur in analyseurs_disponibles() for partielle in (False, True)]
+    modes.sort(key=lambda mode: mode != REFERENCE)
+    attendues = [extraire_infos_page(html, url, analyseur=REFERENCE[0], partielle=REFERENCE[1]) for _, url, html in pages]
+
+    resultats = {}
+    reference = None
+    for analyseur, partielle in modes:
+        nom = f"{analyseur}{' partielle' if partielle else ''}"
+        for (page, url, html), infos in zip(pages, attendues):
+            if extraire_infos_page(html, url, analyseur=analyseur, partielle=partielle) != infos:
+                raise AssertionError(f"{nom} : informations différentes pour la page {page}")
+        mesure = chronometrer(
+            lambda: [extraire_infos_page(html, url, analyseur=analyseur, partielle=partielle) for _, url, html in pages],
+            repetitions
+        )
+        mesure['min_par_page'] = mesure['min'] / len(pages)
+        reference = reference or mesure['min']
+        mesure['acceleration'] = reference / mesure['min']
+        resultats[nom] = mesure
+        journal(f"{nom:<24} {mesure['min_par_page'] * 1000:8.2f} ms/page  ×{mesure['acceleration']:.1f}")
+    return resultats
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.annonces',
+        description="Mesure l'analyse des pages d'annonces selon l'analyseur HTML et l'analyse partielle."
+    )
+    parser.add_argument('--pages', default=DOSSIER_PAGES, help="Dossier de pages enregistrées (benchmarks/pages par défaut)")
+    parser.add_argument('--synthetiques', action='store_true', help="Mesure sur des pages synthétiques générées à la volée")
+    parser.add_argument('--nombre', type=int, default=20, help="Nombre de pages synthétiques")
+    parser.add_argument('--repetitions', type=int, default=3, help="Nombre d'exécutions de chaque mesure")
+    parser.add_argument('--graine', type=int, default=0, help="Graine de génération des pages synthétiques")
+    parser.add_argument('--sortie', help="Fichier JSON des résultats (sortie standard par défaut)")
+    args = parser.parse_args()
+
+    def journal(message):
+        print(message, file=sys.stderr, flush=True)
+
+    pages = pages_synthetiques(args.nombre, args.graine) if args.synthetiques else pages_enregistrees(args.pages)
+    if not pages:
+        parser.error(f"aucune page autoscout24*.html ou leboncoin*.html dans {args.pages}")
+    taille = sum(len(html) for _, _, html in pages) / len(pages)
+    journal(f"{len(pages)} pages, {taille / 1024:.0f} Ko en moyenne")
+
+    resultats = {
+        'environnement': dict(environnement(), analyseurs=analyseurs_disponibles()),
+        'pages': len(pages),
+        'modes': mesurer(pages, args.repetitions, journal)
+    }
+    texte = json.dumps(resultats, ensure_ascii=False, indent=2)
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            f.write(texte + '\n')
+    else:
+        print(texte)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+import json
+import numpy as np
+import pandas as pd
+
+CHEMIN_MARQUES = 'data/marques.csv'
+CHEMIN_EQUIPEMENTS = 'data/equipements.csv'
+
+# Valeurs des colonnes libres, proches de celles saisies dans l'application
+STATUTS = ['En attente', 'Validé', 'Rejeté']
+TYPES_VENDEUR = ['Particulier', 'Professionnel']
+TAGS = ['', '', '', 'citadine', 'familiale', 'fiable, économique', 'sportive', 'premier propriétaire']
+POINTS_FORTS = ['', 'Entretien suivi\nPneus neufs', 'Faible kilométrage', 'Carnet complet']
+POINTS_FAIBLES = ['', 'Rayures carrosserie', 'Embrayage à prévoir\nPneus usés']
+RED_FLAGS = ['', '', '', 'Kilométrage élevé', 'Historique incomplet, Accident déclaré']
+# Équipements hors vocabulaire, saisis librement
+EXTRAS = ['Toit panoramique', 'Affichage tête haute', 'Sellerie cuir']
+
+def _options(texte):
+    """Découpe une liste d'options de marques.csv ('Essence/Diesel')."""
+    return [option.strip() for option in texte.split('/') if option.strip()]
+
+def _choix_par_modele(generateur, modeles, options):
+    """Choisit pour chaque véhicule une option parmi celles de son modèle."""
+    resultat = np.empty(len(modeles), dtype=object)
+    for position, valeurs in enumerate(options):
+        selection = modeles == position
+        resultat[selection] = generateur.choice(valeurs, selection.sum())
+    return resultat
+
+def _equipements(generateur, vocabulaire, annees):
+    """
+    Tire les équipements de chaque véhicule : plus un véhicule est récent, plus il
+    est équipé. Quelques véhicules ont en plus un équipement hors vocabulaire.
+    """
+    n = len(annees)
+    frequences = generateur.uniform(0.1, 0.8, len(vocabulaire))
+    recence = np.clip((annees - 1995) / 30, 0, 1)[:, None]
+    presences = generateur.random((n, len(vocabulaire))) < frequences * (0.3 + 0.7 * recence)
+    extras = generateur.random(n) < 0.05
+    choix_extras = generateur.integers(0, len(EXTRAS), n)
+    vocabulaire = np.asarray(vocabulaire, dtype=object)
+    textes = []
+    for position in range(n):
+        equipements = list(vocabulaire[presences[position]])
+        if extras[position]:
+            equipements.append(EXTRAS[choix_extras[position]])
+        textes.append(', '.join(equipements))
+    return textes
+
+def generer_flotte(n, graine=0):
+    """
+    Génère une flotte synthétique de n véhicules, aux colonnes de l'application,
+    à partir des modèles de data/marques.csv et des équipements de data/equipements.csv.
+    La même graine produit toujours la même flotte.
+    """
+    generateur = np.random.default_rng(graine)
+    marques = pd.read_csv(CHEMIN_MARQUES)
+    vocabulaire = pd.read_csv(CHEMIN_EQUIPEMENTS)['equipement'].tolist()
+
+    modeles = generateur.integers(0, len(marques), n)
+    catalogue = marques.iloc[modeles].reset_index(drop=True)
+    debut, fin = catalogue['annee_debut'].to_numpy(), catalogue['annee_fin'].to_numpy()
+    annees = debut + (generateur.random(n) * (fin - debut + 1)).astype(int)
+    pmin, pmax = catalogue['puissance_min'].to_numpy(), catalogue['puissance_max'].to_numpy()
+    puissances = (pmin + generateur.random(n) * (pmax - pmin)) // 5 * 5
+    motorisations = _choix_par_modele(generateur, modeles, [_options(m) for m in marques['motorisation']])
+    transmissions = _choix_par_modele(generateur, modeles, [_options(t) for t in marques['transmission']])
+
+    # Prix décroissant avec l'âge, croissant avec la puissance
+    age = 2025 - annees
+    prix = 12000 * (puissances / 150) * 0.9 ** age * generateur.lognormal(0, 0.25, n)
+    prix = np.maximum(prix, 1000) // 100 * 100
+    base_conso = pd.Series(motorisations).map({'Essence': 6.5, 'Diesel': 5.0, 'Hybride': 4.5}).to_numpy()
+    consommation = np.round(base_conso + puissances / 100 + generateur.normal(0, 0.5, n), 1)
+    assurance = (300 + puissances * 2.5 + generateur.normal(0, 80, n)).astype(int)
+
+    notes_detaillees = np.where(
+        generateur.random(n) < 0.2,
+        json.dumps({'Confort': 4, 'Fiabilité': 3, 'Esthétique': 5}),
+        ''
+    )
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(generateur.integers(0, 365 * 86400, n), unit='s')
+    numeros = pd.Series(np.arange(n)).astype(str)
+
+    return pd.DataFrame({
+        'Prix': prix,
+        'Marque': catalogue['marque'],
+        'Modele': catalogue['modele'],
+        'Annee': annees,
+        'Image_URL': 'https://annonces.example/images/' + numeros + '.jpg',
+        'Motorisation': motorisations,
+        'Puissance': puissances,
+        'Transmission': transmissions,
+        'Categorie': catalogue['categorie'],
+        'Type_Vendeur': generateur.choice(TYPES_VENDEUR, n),
+        'Note_Vendeur': np.round(generateur.uniform(2.5, 5, n), 1),
+        'Distance': generateur.integers(5, 500, n),
+        'Consommation': consommation,
+        'Cout_Assurance': assurance,
+        'Fiabilite': generateur.integers(4, 11, n),
+        'Equipements': _equipements(generateur, vocabulaire, annees),
+        'Lien_Annonce': 'https://annonces.example/annonces/' + numeros,
+        'Date_Ajout': pd.Series(dates).dt.strftime('%Y-%m-%d %H:%M:%S'),
+        'Status': generateur.choice(STATUTS, n),
+        'Selection_Franck': generateur.random(n) < 0.1,
+        'Points_Forts': generateur.choice(POINTS_FORTS, n),
+        'Points_Faibles': generateur.choice(POINTS_FAIBLES, n),
+        'Red_Flags': generateur.choice(RED_FLAGS, n),
+        'Tags': generateur.choice(TAGS, n),
+        'Notes': '',
+        'Notes_Detaillees': notes_detaillees,
+        'Score_Match': 0.0,
+        'Coup_de_Coeur': generateur.random(n) < 0.05
+    })
+
+def criteres_reference():
+    """
+    Critères de recherche utilisés pour les mesures : ceux de la configuration par
+    défaut, avec quelques marques, motorisations et équipements souhaités.
+    """
+    return {
+        'budget_min': {'valeur': 5000, 'poids': 5, 'obligatoire': True},
+        'budget_max': {'valeur': 20000, 'poids': 5, 'obligatoire': True},
+        'annee_min': {'valeur': 2015, 'poids': 3, 'obligatoire': False},
+        'annee_max': {'valeur': 2025, 'poids': 3, 'obligatoire': False},
+        'marques': {'valeur': ['Peugeot', 'Renault', 'Toyota'], 'poids': 4, 'obligatoire': False},
+        'categories': {'valeur': [], 'poids': 3, 'obligatoire': False},
+        'motorisations': {'valeur': ['Hybride', 'Essence'], 'poids': 4, 'obligatoire': False},
+        'puissance_min': {'valeur': 100, 'poids': 3, 'obligatoire': False},
+        'puissance_max': {'valeur': 300, 'poids': 3, 'obligatoire': False},
+        'transmissions': {'valeur': ['Automatique'], 'poids': 3, 'obligatoire': False},
+        'conso_max': {'valeur': 8.0, 'poids': 4, 'obligatoire': False},
+        'assurance_max': {'valeur': 1000, 'poids': 3, 'obligatoire': False},
+        'type_vendeur': {'valeur': [], 'poids': 3, 'obligatoire': False},
+        'note_vendeur': {'valeur': 4.0, 'poids': 3, 'obligatoire': False},
+        'distance_max': {'valeur': 100, 'poids': 2, 'obligatoire': False},
+        'equipements_securite': {
+            'valeur': ['ABS', 'ESP'],
+            'poids_individuels': {'ABS': {'poids': 10, 'obligatoire': True}, 'ESP': {'poids': 5, 'obligatoire': False}}
+        },
+        'equipements_confort': {
+            'valeur': ['Climatisation automatique', 'Sièges chauffants'],
+            'poids_individuels': {
+                'Climatisation automatique': {'poids': 4, 'obligatoire': False},
+                'Sièges chauffants': {'poids': 2, 'obligatoire': False}
+            }
+        },
+        'equipements_multimedia': {
+            'valeur': ['GPS', 'Apple CarPlay'],
+            'poids_individuels': {'GPS': {'poids': 3, 'obligatoire': False}, 'Apple CarPlay': {'poids': 2, 'obligatoire': False}}
+        }
+    }
+
+def filtres_reference():
+    """
+    Jeux de filtres de la barre latérale mesurés séparément puis combinés.
+    """
+    aucun = {'vehicules': None, 'search': '', 'status': [], 'marques': [], 'equipements': [], 'prix_range': None}
+    return {
+        'aucun': aucun,
+        'texte': dict(aucun, search='clio'),
+        'statut': dict(aucun, status=['En attente', 'Validé']),
+        'marques': dict(aucun, marques=['Peugeot', 'Renault', 'BMW']),
+        'equipements': dict(aucun, equipements=['GPS', 'Caméra de recul']),
+        'prix': dict(aucun, prix_range=(5000, 15000)),
+        'annee': dict(aucun, annee_range=(2010, 2020)),
+        'motorisation': dict(aucun, motorisations=['Diesel'], transmissions=['Automatique']),
+        'tags': dict(aucun, tags=['fiable']),
+        'combine': dict(
+            aucun, search='e', status=['En attente'], marques=['Peugeot', 'Renault', 'BMW'],
+            equipements=['GPS'], prix_range=(5000, 15000), annee_range=(2005, 2025)
+        )
+    }
@@ -0,0 +1,205 @@
+import gc
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.flotte import criteres_reference, filtres_reference, generer_flotte
+from utils import data
+from utils.cache_annonces import fermer_cache_annonces
+from utils.cache_scores import fermer_cache_scores
+from utils.data import charger_donnees, filtrer_vehicules, masque_filtres, positions_filtrees, sauvegarder_donnees
+from utils.pdf import generer_pdf_vehicule
+from utils.recherche_texte import IndexTrigrammes
+from utils.scoring import calculer_score_vehicule, calculer_scores_vehicules
+from utils.statistiques import calculer_statistiques
+from utils.stockage import StockageJSON, StockageJournalise, StockageSQLite, definir_stockage, obtenir_stockage
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FICHIERS_REFERENCES = ['data/marques.csv', 'data/equipements.csv']
+TAILLES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Nombre de véhicules sur lesquels sont mesurées les opérations unitaires
+ECHANTILLON_SCORES = 1000
+ECHANTILLON_PDF = 20
+
+STOCKAGES = {
+    'sqlite': lambda: StockageJournalise(StockageSQLite()),
+    'json': lambda: StockageJSON()
+}
+
+def chronometrer(fonction, repetitions):
+    """
+    Exécute une fonction plusieurs fois et retourne ses durées en secondes
+    (minimum, médiane, moyenne). Le minimum est le plus stable d'une exécution à l'autre.
+    """
+    durees = []
+    for _ in range(repetitions):
+        gc.collect()
+        debut = time.perf_counter()
+        fonction()
+        durees.append(time.perf_counter() - debut)
+    return {
+        'min': min(durees),
+        'mediane': statistics.median(durees),
+        'moyenne': statistics.fmean(durees),
+        'repetitions': repetitions
+    }
+
+def _par_unite(mesure, unites):
+    """Complète une mesure portant sur plusieurs unités avec la durée par unité."""
+    mesure['unites'] = unites
+    mesure['min_par_unite'] = mesure['min'] / unites
+    return mesure
+
+def _revision_git():
+    try:
+        resultat = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RACINE, capture_output=True, text=True, timeout=10
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return resultat.stdout.strip() or None
+
+def environnement():
+    """Décrit la machine et les versions, pour ne comparer que des exécutions comparables."""
+    return {
+        'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'revision': _revision_git(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plateforme': platform.platform(),
+        'processeurs': os.cpu_count()
+    }
+
+def _preparer_dossier(dossier, stockage):
+    """
+    Crée un dossier de travail contenant les fichiers de référence, s'y place et
+    active un stockage neuf : les données réelles de l'application ne sont jamais touchées.
+    """
+    os.makedirs(os.path.join(dossier, 'data', 'saved'), exist_ok=True)
+    for fichier in FICHIERS_REFERENCES:
+        shutil.copy(os.path.join(RACINE, fichier), os.path.join(dossier, fichier))
+    os.chdir(dossier)
+    definir_stockage(STOCKAGES[stockage]())
+
+def _liberer_dossier():
+    """
+    Ferme le stockage et les caches ouverts dans le dossier de travail avant sa
+    suppression, et les oublie : ceux de la taille suivante sont ouverts dans son dossier.
+    """
+    obtenir_stockage().fermer()
+    definir_stockage(None)
+    fermer_cache_scores()
+    fermer_cache_annonces()
+
+def mesurer_taille(n, repetitions=3, graine=0, journal=print):
+    """
+    Mesure les opérations de l'application sur une flotte synthétique de n véhicules.
+    Doit être appelée depuis un dossier de travail préparé (voir executer).
+    """
+    resultats = {}
+
+    def mesurer(nom, fonction, repetitions=repetitions):
+        resultats[nom] = chronometrer(fonction, repetitions)
+        journal(f"  {nom:<36} {resultats[nom]['min']:.4f} s")
+        return resultats[nom]
+
+    debut = time.perf_counter()
+    df = generer_flotte(n, graine)
+    resultats['generation'] = {'min': time.perf_counter() - debut, 'repetitions': 1}
+
+    mesurer('sauvegarder_donnees', lambda: sauvegarder_donnees(df))
+
+    def charger_a_froid():
+        data._cache.invalider('vehicules')
+        charger_donnees()
+    mesurer('charger_donnees', charger_a_froid)
+    mesurer('charger_donnees (cache)', charger_donnees)
+    df, _ = charger_donnees()
+
+    for nom, filtres in filtres_reference().items():
+        mesurer(f'filtrer_vehicules ({nom})', lambda filtres=filtres: filtrer_vehicules(df, filtres))
+        mesurer(f'masque_filtres ({nom})', lambda filtres=filtres: masque_filtres(df, filtres))
+    mesurer('IndexTrigrammes (construction)', lambda: IndexTrigrammes(df), 1)
+    index_texte = IndexTrigrammes(df)
+    mesurer('rechercher (texte approché)', lambda: index_texte.rechercher('mercedes c 200'))
+
+    # Requête répétée puis resserrée : servies par le cache des requêtes
+    combine = filtres_reference()['combine']
+    mesurer('positions_filtrees (cache)', lambda: positions_filtrees(df, combine))
+    mesurer('positions_filtrees (resserree)', lambda: positions_filtrees(df, dict(combine, prix_range=(6000, 15000))), 1)
+
+    criteres = criteres_reference()
+    echantillon = [ligne for _, ligne in df.head(ECHANTILLON_SCORES).iterrows()]
+    mesure = mesurer(
+        'calculer_score_vehicule',
+        lambda: [calculer_score_vehicule(vehicule, criteres) for vehicule in echantillon]
+    )
+    _par_unite(mesure, len(echantillon))
+    mesure = mesurer(
+        'calculer_score_vehicule (detail)',
+        lambda: [calculer_score_vehicule(vehicule, criteres, detail=True) for vehicule in echantillon]
+    )
+    _par_unite(mesure, len(echantillon))
+    mesurer('calculer_scores_vehicules', lambda: calculer_scores_vehicules(df, criteres))
+
+    df_scores = df.assign(Score_Match=calculer_scores_vehicules(df, criteres))
+    mesurer('calculer_statistiques', lambda: calculer_statistiques(df_scores))
+
+    vehicules = [ligne for _, ligne in df_scores.head(ECHANTILLON_PDF).iterrows()]
+    details = [calculer_score_vehicule(vehicule, criteres, detail=True)[1] for vehicule in vehicules]
+    mesure = mesurer(
+        'generer_pdf_vehicule',
+        lambda: [generer_pdf_vehicule(vehicule, detail) for vehicule, detail in zip(vehicules, details)]
+    )
+    _par_unite(mesure, len(vehicules))
+
+    return resultats
+
+def executer(tailles=TAILLES, repetitions=3, graine=0, stockage='sqlite', journal=print):
+    """
+    Exécute la suite pour chaque taille de flotte, chacune dans un dossier temporaire,
+    et retourne les résultats sous forme de dictionnaire sérialisable en JSON.
+    """
+    repertoire_initial = os.getcwd()
+    resultats = {
+        'environnement': environnement(),
+        'parametres': {'repetitions': repetitions, 'graine': graine, 'stockage': stockage},
+        'tailles': {}
+    }
+    try:
+        for n in tailles:
+            journal(f"Flotte de {n} véhicules")
+            with tempfile.TemporaryDirectory(prefix='benchmark_voitures_') as dossier:
+                _preparer_dossier(dossier, stockage)
+                try:
+                    resultats['tailles'][str(n)] = mesurer_taille(n, repetitions, graine, journal)
+                finally:
+                    _liberer_dossier()
+                    os.chdir(repertoire_initial)
+    finally:
+        os.chdir(repertoire_initial)
+    return resultats
+
+def comparer(resultats, reference, journal=print):
+    """
+    Affiche, pour chaque mesure présente dans les deux exécutions, le rapport des
+    durées minimales (nouvelle / référence) : sous 1, l'opération est plus rapide.
+    """
+    for taille, mesures in resultats['tailles'].items():
+        anciennes = reference.get('tailles', {}).get(taille)
+        if not anciennes:
+            continue
+        journal(f"Flotte de {taille} véhicules (rapport à la référence)")
+        for nom, mesure in mesures.items():
+            if nom in anciennes and anciennes[nom]['min'] > 0:
+                journal(f"  {nom:<36} x{mesure['min'] / anciennes[nom]['min']:.2f}")
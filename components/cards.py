@@ -1,79 +1,174 @@
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from html import escape
+
 import streamlit as st
+from utils.data import charger_donnees, mettre_a_jour_vehicule
+from utils.images import obtenir_cache_images
+
+# Modèle HTML d'une carte de la grille, rempli une fois par véhicule et par score
+_MODELE_CARTE = (
+    '<div class="{classe}">'
+    '<div class="badge-container">'
+    '<div class="match-badge">Match {score:.0f}%</div>{coup_de_coeur}'
+    '</div>'
+    '<h3 style="font-size: 1.4em; margin-bottom: 1rem;">{marque} {modele}</h3>'
+    '{image}'
+    '<div class="car-info">'
+    '<div style="display: flex; justify-content: space-between; align-items: center;">'
+    '<span style="font-size: 1.1em;">Année {annee}</span>'
+    '<span class="car-price">{prix:,.0f} €</span>'
+    '</div>'
+    '<div class="car-stats">'
+    '<span title="Fiabilité">🔋 {fiabilite}/10</span>'
+    '<span title="Consommation">⛽ {consommation}L/100km</span>'
+    '<span title="Assurance">🛡️ {assurance}€/an</span>'
+    '</div>'
+    '</div>'
+    '{points}{annonce}'
+    '</div>'
+)
+_MODELE_COUP_DE_COEUR = "<div class='favorite-badge'>❤️ Coup de cœur</div>"
+_MODELE_IMAGE = '<img class="car-image" src="{url}" alt="" loading="lazy">'
+_MODELE_SANS_IMAGE = '<div class="car-image car-image-vide">🚗</div>'
+_MODELE_ANNONCE = '<a href="{lien}" target="_blank" class="action-button">🔗 Annonce</a>'
+# Numéro de la carte dans la galerie, repris par la barre d'actions
+_MODELE_EMPLACEMENT = '<div class="car-slot"><div class="car-rank">#{rang}</div>{carte}</div>'
+
+# Cartes déjà rendues, par (véhicule, révision, score, URL de la vignette)
+TAILLE_CACHE_CARTES = 512
+_cartes = OrderedDict()
+_verrou_cartes = threading.Lock()
+
+def _points(texte, classe, symbole):
+    """Bloc HTML des deux premiers points (un par ligne) d'un texte, ou chaîne vide."""
+    if not isinstance(texte, str):
+        return ''
+    points = [p.strip() for p in texte.split('\n') if p.strip()][:2]
+    if not points:
+        return ''
+    return f'<div class="{classe}">' + ''.join(f'<div>{symbole} {escape(point)}</div>' for point in points) + '</div>'
 
-def afficher_carte_vehicule(vehicule, idx, df, sauvegarder_donnees):
+def _servir_media(donnees):
     """
-    Affiche une carte détaillée pour un véhicule.
+    Enregistre une image auprès du gestionnaire des fichiers média de Streamlit
+    (celui de st.image, qui n'a pas d'API publique pour du HTML) et retourne son
+    URL, ou None si ce gestionnaire n'est pas disponible (hors serveur Streamlit,
+    ou API interne modifiée par une autre version de Streamlit).
     """
-    # Détermination de la classe CSS en fonction du score
-    card_class = "car-card premium-card" if vehicule['Score_Match'] >= 80 else "car-card"
-    
-    # Construction du HTML pour la carte
-    html = f"""
-    <div class="{card_class}">
-        <div class="badge-container">
-            <div class="match-badge">Match {vehicule['Score_Match']:.0f}%</div>
-            {"<div class='favorite-badge'>❤️ Coup de cœur</div>" if vehicule.get('Coup_de_Coeur', False) else ""}
-        </div>
-        
-        <h3 style="font-size: 1.4em; margin-bottom: 1rem;">{vehicule['Marque']} {vehicule['Modele']}</h3>
-        
-        <div class="car-info">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-                <span style="font-size: 1.1em;">Année {vehicule['Annee']}</span>
-                <span class="car-price">{vehicule['Prix']:,.0f} €</span>
-            </div>
-            
-            <div class="car-stats">
-                <span title="Fiabilité">🔋 {vehicule['Fiabilite']}/10</span>
-                <span title="Consommation">⛽ {vehicule['Consommation']}L/100km</span>
-                <span title="Assurance">🛡️ {vehicule['Cout_Assurance']}€/an</span>
-            </div>
-        </div>
+    try:
+        from streamlit import runtime
+        gestionnaire = runtime.get_instance().media_file_mgr
+        # L'URL est dérivée du contenu : une coordonnée par image suffit à la garder
+        # enregistrée pour la session tant qu'elle est affichée
+        coordonnees = f"vignette.{hashlib.sha1(donnees).hexdigest()}"
+        url = gestionnaire.add(donnees, 'image/jpeg', coordonnees)
+    except (ImportError, AttributeError, TypeError, RuntimeError):
+        return None
+    base = st.get_option('server.baseUrlPath').strip('/')
+    return f"/{base}{url}" if base else url
+
+def url_vignette(chemin):
     """
+    Retourne l'URL d'une vignette pour une balise <img> : l'URL sous laquelle le
+    serveur la sert (voir _servir_media), stable d'une exécution à l'autre et gardée
+    en cache par le navigateur, ou à défaut l'image intégrée en base64. Retourne None
+    si le fichier a été évincé du cache d'images entre-temps. La vignette doit être
+    enregistrée à chaque exécution du script qui l'affiche.
+    """
+    try:
+        with open(chemin, 'rb') as f:
+            donnees = f.read()
+    except OSError:
+        return None
+    return _servir_media(donnees) or 'data:image/jpeg;base64,' + base64.b64encode(donnees).decode('ascii')
+
+def rendre_carte(vehicule, url_image=None):
+    """
+    Retourne le HTML de la carte d'un véhicule (avec son Score_Match). La vignette
+    de sa photo est référencée par son URL (voir url_vignette) ; sans elle, la
+    carte affiche un emplacement vide.
+    """
+    points = _points(vehicule.get('Points_Forts'), 'points-forts', '✓') + _points(vehicule.get('Points_Faibles'), 'points-faibles', '✗')
+    lien = vehicule.get('Lien_Annonce')
+    return _MODELE_CARTE.format(
+        classe="car-card premium-card" if vehicule['Score_Match'] >= 80 else "car-card",
+        score=vehicule['Score_Match'],
+        coup_de_coeur=_MODELE_COUP_DE_COEUR if vehicule.get('Coup_de_Coeur', False) else '',
+        marque=escape(str(vehicule['Marque'])),
+        modele=escape(str(vehicule['Modele'])),
+        image=_MODELE_IMAGE.format(url=escape(url_image)) if url_image else _MODELE_SANS_IMAGE,
+        annee=vehicule['Annee'],
+        prix=vehicule['Prix'],
+        fiabilite=vehicule.get('Fiabilite', '–'),
+        consommation=vehicule.get('Consommation', '–'),
+        assurance=vehicule.get('Cout_Assurance', '–'),
+        points=f'<div class="points-container">{points}</div>' if points else '',
+        annonce=_MODELE_ANNONCE.format(lien=escape(lien)) if isinstance(lien, str) and lien else ''
+    )
+
+def _carte(idx, vehicule, url_image):
+    """Retourne le HTML de la carte d'un véhicule, rendu une seule fois par révision, score et vignette."""
+    cle = (idx, vehicule.get('Revision', 0), float(vehicule['Score_Match']), url_image)
+    with _verrou_cartes:
+        html = _cartes.get(cle)
+        if html is not None:
+            _cartes.move_to_end(cle)
+            return html
+    html = rendre_carte(vehicule, url_image)
+    with _verrou_cartes:
+        _cartes[cle] = html
+        while len(_cartes) > TAILLE_CACHE_CARTES:
+            _cartes.popitem(last=False)
+    return html
+
+def afficher_grille_vehicules(df_affiche, premier_rang=1):
+    """
+    Affiche une page de véhicules en grille : les cartes sont assemblées en une
+    seule passe et envoyées comme un seul élément, suivies d'une barre d'actions
+    (détails, coup de cœur) portant sur la carte choisie par son numéro.
+    """
+    images = obtenir_cache_images()
+    emplacements = []
+    libelles = {}
+    for rang, (idx, vehicule) in enumerate(df_affiche.iterrows(), start=premier_rang):
+        # Les vignettes sont servies par URL : seules les balises <img> passent dans le HTML
+        vignette = images.vignette(vehicule['Image_URL'], 'carte')
+        url_image = url_vignette(vignette) if vignette else None
+        carte = _carte(idx, vehicule, url_image)
+        emplacements.append(_MODELE_EMPLACEMENT.format(rang=rang, carte=carte))
+        libelles[f"#{rang} · {vehicule['Marque']} {vehicule['Modele']} ({vehicule['Annee']})"] = idx
+    st.markdown(f'<div class="car-grid">{"".join(emplacements)}</div>', unsafe_allow_html=True)
     
-    # Ajout des points forts/faibles s'ils existent
-    if vehicule.get('Points_Forts') or vehicule.get('Points_Faibles'):
-        html += '<div class="points-container">'
-        if vehicule.get('Points_Forts'):
-            points = [p.strip() for p in vehicule['Points_Forts'].split('\n') if p.strip()][:2]
-            if points:
-                html += '<div class="points-forts">'
-                for point in points:
-                    html += f'<div>✓ {point}</div>'
-                html += '</div>'
-        
-        if vehicule.get('Points_Faibles'):
-            points = [p.strip() for p in vehicule['Points_Faibles'].split('\n') if p.strip()][:2]
-            if points:
-                html += '<div class="points-faibles">'
-                for point in points:
-                    html += f'<div>✗ {point}</div>'
-                html += '</div>'
-        html += '</div>'
-    
-    html += "</div>"
-    st.markdown(html, unsafe_allow_html=True)
-    
-    # Affichage de l'image si disponible
-    if vehicule['Image_URL']:
-        st.image(vehicule['Image_URL'], use_column_width=True)
-    
-    # Boutons d'action
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        if vehicule['Lien_Annonce']:
-            st.markdown(f"<a href='{vehicule['Lien_Annonce']}' target='_blank' class='action-button'>🔗 Annonce</a>", unsafe_allow_html=True)
-    with col2:
-        if st.button("📊 Détails", key=f"details_{idx}"):
-            st.session_state.page = "details"
-            st.session_state.selected_car = idx
-    with col3:
-        if st.button("❤️", key=f"favorite_{idx}"):
-            df.at[idx, 'Coup_de_Coeur'] = not df.at[idx, 'Coup_de_Coeur']
-            sauvegarder_donnees(df)
-            st.rerun()
+    # Barre d'actions de la page : les boutons portent sur la carte choisie
+    col_choix, col_details, col_favori = st.columns([3, 1, 1])
+    with col_choix:
+        st.selectbox("Véhicule", list(libelles), key="carte_choisie", label_visibility="collapsed")
+    with col_details:
+        st.button(
+            "📊 Détails", key="details_carte", use_container_width=True,
+            on_click=_ouvrir_details, args=(libelles,)
+        )
+    with col_favori:
+        st.button(
+            "❤️ Coup de cœur", key="favori_carte", use_container_width=True,
+            on_click=_basculer_coup_de_coeur, args=(libelles,)
+        )
+
+def _ouvrir_details(libelles):
+    st.session_state.page = "details"
+    st.session_state.selected_car = libelles[st.session_state.carte_choisie]
+
+def _basculer_coup_de_coeur(libelles):
+    # Véhicules relus au clic : le DataFrame de l'exécution précédente peut être périmé
+    idx = libelles[st.session_state.carte_choisie]
+    df, _ = charger_donnees()
+    if idx in df.index:
+        mettre_a_jour_vehicule(df, idx, {'Coup_de_Coeur': not df.at[idx, 'Coup_de_Coeur']})
 
-def afficher_liste_vehicule(vehicule, idx, df, sauvegarder_donnees):
+def afficher_liste_vehicule(vehicule, idx, df, mettre_a_jour_vehicule):
     """
     Affiche un véhicule au format liste.
     """
@@ -103,6 +198,5 @@ def afficher_liste_vehicule(vehicule, idx, df, sauvegarder_donnees):
             st.session_state.selected_car = idx
     with col2:
         if st.button("❤️", key=f"favorite_list_{idx}"):
-            df.at[idx, 'Coup_de_Coeur'] = not df.at[idx, 'Coup_de_Coeur']
-            sauvegarder_donnees(df)
+            mettre_a_jour_vehicule(df, idx, {'Coup_de_Coeur': not df.at[idx, 'Coup_de_Coeur']})
             st.rerun() 
\ No newline at end of file
@@ -1,125 +1,28 @@
 import streamlit as st
 import json
-import base64
-from fpdf import FPDF
-from utils.data import sauvegarder_donnees
+from utils.data import mettre_a_jour_vehicule, charger_matrice_scores
+from utils.equipements import liste_equipements
+from utils.images import obtenir_cache_images
+from utils.pdf import generer_pdf_vehicule, get_download_link, lignes_detail_score
 
-class VehiculePDF(FPDF):
-    """Classe personnalisée pour générer un PDF de fiche véhicule."""
-    def header(self):
-        self.set_font('Arial', 'B', 15)
-        self.cell(0, 10, 'Fiche Véhicule', 0, 1, 'C')
-        self.ln(10)
-    
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
-
-def generer_pdf_vehicule(vehicule):
+def afficher_details_vehicule(vehicule, idx, df, detail_score=None):
     """
-    Génère un PDF contenant les informations détaillées d'un véhicule.
-    """
-    pdf = VehiculePDF()
-    pdf.add_page()
-    
-    # En-tête avec les informations principales
-    pdf.set_font('Arial', 'B', 16)
-    pdf.cell(0, 10, f"{vehicule['Marque']} {vehicule['Modele']} ({vehicule['Annee']})", 0, 1)
-    
-    pdf.set_font('Arial', '', 12)
-    pdf.cell(0, 10, f"Prix: {vehicule['Prix']:,.0f} €", 0, 1)
-    
-    # Score de correspondance
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, f"Score de correspondance: {vehicule['Score_Match']:.1f}%", 0, 1)
-    
-    # Caractéristiques techniques
-    pdf.ln(5)
-    pdf.set_font('Arial', 'B', 14)
-    pdf.cell(0, 10, "Caractéristiques", 0, 1)
-    pdf.set_font('Arial', '', 12)
-    pdf.cell(0, 10, f"Consommation: {vehicule['Consommation']} L/100km", 0, 1)
-    pdf.cell(0, 10, f"Fiabilité: {vehicule['Fiabilite']}/10", 0, 1)
-    pdf.cell(0, 10, f"Coût assurance: {vehicule['Cout_Assurance']} €/an", 0, 1)
-    
-    # Équipements
-    if vehicule['Equipements']:
-        pdf.ln(5)
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, "Équipements", 0, 1)
-        pdf.set_font('Arial', '', 12)
-        for equip in vehicule['Equipements'].split(','):
-            if equip.strip():
-                pdf.cell(0, 10, f"• {equip.strip()}", 0, 1)
-    
-    # Points forts et points faibles
-    if vehicule.get('Points_Forts'):
-        pdf.ln(5)
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, "Points forts", 0, 1)
-        pdf.set_font('Arial', '', 12)
-        for point in vehicule['Points_Forts'].split('\n'):
-            if point.strip():
-                pdf.cell(0, 10, f"✓ {point.strip()}", 0, 1)
-    
-    if vehicule.get('Points_Faibles'):
-        pdf.ln(5)
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, "Points faibles", 0, 1)
-        pdf.set_font('Arial', '', 12)
-        for point in vehicule['Points_Faibles'].split('\n'):
-            if point.strip():
-                pdf.cell(0, 10, f"✗ {point.strip()}", 0, 1)
-    
-    # Notes détaillées
-    if vehicule.get('Notes_Detaillees'):
-        pdf.ln(5)
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, "Évaluation détaillée", 0, 1)
-        pdf.set_font('Arial', '', 12)
-        notes = json.loads(vehicule['Notes_Detaillees'])
-        for critere, note in notes.items():
-            pdf.cell(0, 10, f"{critere}: {note}/5", 0, 1)
-    
-    # Red flags
-    if vehicule.get('Red_Flags'):
-        pdf.ln(5)
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, "Points d'attention", 0, 1)
-        pdf.set_font('Arial', '', 12)
-        for flag in vehicule['Red_Flags'].split(','):
-            if flag.strip():
-                pdf.cell(0, 10, f"• {flag.strip()}", 0, 1)
-    
-    # Tags
-    if vehicule.get('Tags'):
-        pdf.ln(5)
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, "Tags", 0, 1)
-        pdf.set_font('Arial', '', 12)
-        pdf.cell(0, 10, vehicule['Tags'], 0, 1)
-    
-    return pdf.output(dest='S').encode('latin1')
-
-def get_download_link(pdf_bytes, filename):
-    """
-    Crée un lien de téléchargement pour un fichier PDF.
-    """
-    b64 = base64.b64encode(pdf_bytes).decode()
-    return f'<a href="data:application/pdf;base64,{b64}" download="{filename}">Télécharger le PDF</a>'
-
-def afficher_details_vehicule(vehicule, idx, df):
-    """
-    Affiche la page de détails d'un véhicule.
+    Affiche la page de détails d'un véhicule, avec le détail de son score
+    pour la recherche active s'il est fourni.
     """
     st.title(f"{vehicule['Marque']} {vehicule['Modele']}")
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        if vehicule['Image_URL']:
-            st.image(vehicule['Image_URL'], use_column_width=True)
+        vignette = obtenir_cache_images().vignette(vehicule['Image_URL'], 'detail')
+        if vignette:
+            try:
+                with open(vignette, 'rb') as f:
+                    st.image(f.read(), use_column_width=True)
+            except OSError:
+                # Vignette évincée du cache d'images entre-temps
+                st.info("📷 Photo indisponible")
         
         # Points forts et points faibles
         st.subheader("💪 Points forts et points faibles")
@@ -134,8 +37,7 @@ def afficher_details_vehicule(vehicule, idx, df):
                 height=150
             )
             if points_forts != vehicule.get('Points_Forts', ""):
-                df.at[idx, 'Points_Forts'] = points_forts
-                sauvegarder_donnees(df)
+                mettre_a_jour_vehicule(df, idx, {'Points_Forts': points_forts})
         
         with col_moins:
             st.markdown("#### ❌ Points faibles")
@@ -146,8 +48,7 @@ def afficher_details_vehicule(vehicule, idx, df):
                 height=150
             )
             if points_faibles != vehicule.get('Points_Faibles', ""):
-                df.at[idx, 'Points_Faibles'] = points_faibles
-                sauvegarder_donnees(df)
+                mettre_a_jour_vehicule(df, idx, {'Points_Faibles': points_faibles})
         
         st.markdown("---")
         
@@ -184,26 +85,44 @@ def afficher_details_vehicule(vehicule, idx, df):
                     notes_modifiees = True
         
         if notes_modifiees:
-            df.at[idx, 'Notes_Detaillees'] = json.dumps(notes)
-            sauvegarder_donnees(df)
+            mettre_a_jour_vehicule(df, idx, {'Notes_Detaillees': json.dumps(notes)})
     
     with col2:
         st.markdown(f"""
         ### Informations
         - **Année** : {vehicule['Annee']}
         - **Prix** : {vehicule['Prix']:,.0f} €
-        - **Consommation** : {vehicule['Consommation']} L/100km
-        - **Coût assurance** : {vehicule['Cout_Assurance']} €/an
-        - **Fiabilité** : {vehicule['Fiabilite']}/10
+        - **Consommation** : {vehicule.get('Consommation', '–')} L/100km
+        - **Coût assurance** : {vehicule.get('Cout_Assurance', '–')} €/an
+        - **Fiabilité** : {vehicule.get('Fiabilite', '–')}/10
         - **Score** : {vehicule['Score_Match']:.1f}%
         
         ### Équipements
-        {vehicule['Equipements']}
+        {', '.join(liste_equipements(vehicule))}
         
         ### Liens
-        [Voir l'annonce]({vehicule['Lien_Annonce']})
+        [Voir l'annonce]({vehicule.get('Lien_Annonce', '')})
         """)
         
+        # Détail du score pour la recherche active
+        if detail_score:
+            with st.expander("🧮 Détail du score"):
+                for ligne in lignes_detail_score(detail_score):
+                    st.write(ligne)
+        
+        # Correspondance avec les recherches sauvegardées, lue dans la matrice des scores
+        matrice = charger_matrice_scores()
+        if matrice.recherches and idx in matrice.vehicules:
+            st.subheader("🎯 Recherches")
+            meilleure = matrice.meilleure_recherche(idx)
+            if meilleure:
+                st.markdown(f"Meilleure correspondance : **{meilleure[0]}** ({meilleure[1]:.1f}%)")
+            else:
+                st.markdown("Ne correspond à aucune recherche sauvegardée")
+            with st.expander("Score pour chaque recherche"):
+                for nom, score in matrice.scores_vehicule(idx).items():
+                    st.write(f"{nom} : {score:.1f}%")
+        
         # Red flags
         st.subheader("⚠️ Points d'attention")
         red_flags = st.text_area(
@@ -212,8 +131,7 @@ def afficher_details_vehicule(vehicule, idx, df):
             help="Ex: Kilométrage suspect, Traces de rouille..."
         )
         if red_flags != vehicule.get('Red_Flags', ""):
-            df.at[idx, 'Red_Flags'] = red_flags
-            sauvegarder_donnees(df)
+            mettre_a_jour_vehicule(df, idx, {'Red_Flags': red_flags})
         
         # Tags personnalisés
         st.subheader("🏷️ Tags")
@@ -223,13 +141,12 @@ def afficher_details_vehicule(vehicule, idx, df):
             help="Ex: première main, faible kilométrage, sport..."
         )
         if tags != vehicule.get('Tags', ""):
-            df.at[idx, 'Tags'] = tags
-            sauvegarder_donnees(df)
+            mettre_a_jour_vehicule(df, idx, {'Tags': tags})
         
         # Export PDF
         st.markdown("### 📄 Export")
         if st.button("Générer la fiche PDF"):
-            pdf_bytes = generer_pdf_vehicule(vehicule)
+            pdf_bytes = generer_pdf_vehicule(vehicule, detail_score)
             st.markdown(
                 get_download_link(pdf_bytes, f"fiche_{vehicule['Marque']}_{vehicule['Modele']}.pdf"),
                 unsafe_allow_html=True
@@ -1,9 +1,10 @@
 import streamlit as st
 from datetime import datetime
-from utils.data import sauvegarder_donnees, charger_references, sauvegarder_recherche
-import pandas as pd
+from utils.data import ajouter_vehicule, charger_catalogue, charger_contributions, charger_donnees, charger_matrice_scores, sauvegarder_recherche
+from utils.import_annonces import importer_annonces, lire_urls
+from utils.scoring import compiler_criteres
 
-def afficher_formulaire_ajout(df, marques_df, equipements_df, infos_annonce=None):
+def afficher_formulaire_ajout(df, catalogue, infos_annonce=None):
     """
     Affiche le formulaire d'ajout d'un véhicule.
     Retourne le DataFrame mis à jour si un véhicule est ajouté.
@@ -14,17 +15,17 @@ def afficher_formulaire_ajout(df, marques_df, equipements_df, infos_annonce=None
         with col1:
             # Sélection de la marque
             marque_index = 0
-            if infos_annonce and infos_annonce.get('marque') in marques_df['marque'].unique():
-                marque_index = list(marques_df['marque'].unique()).index(infos_annonce['marque'])
+            if infos_annonce and infos_annonce.get('marque') in catalogue.marques:
+                marque_index = catalogue.marques.index(infos_annonce['marque'])
             
             marque = st.selectbox(
                 "Marque",
-                options=sorted(marques_df['marque'].unique()),
+                options=catalogue.marques,
                 index=marque_index
             )
             
             # Sélection du modèle
-            modeles_disponibles = sorted(marques_df[marques_df['marque'] == marque]['modele'].unique())
+            modeles_disponibles = catalogue.modeles(marque)
             modele_index = 0
             if infos_annonce and infos_annonce.get('modele'):
                 # Recherche du modèle le plus proche dans la liste
@@ -40,11 +41,13 @@ def afficher_formulaire_ajout(df, marques_df, equipements_df, infos_annonce=None
                 index=modele_index
             )
             
+            plage_annees = catalogue.plage_annees(marque, modele)
             annee = st.number_input(
                 "Année",
                 min_value=1990,
                 max_value=datetime.now().year,
-                value=infos_annonce.get('annee', 2020) if infos_annonce else 2020
+                value=infos_annonce.get('annee', 2020) if infos_annonce else 2020,
+                help=f"Modèle produit de {plage_annees[0]} à {plage_annees[1]}" if plage_annees else None
             )
             
             prix = st.number_input(
@@ -77,14 +80,13 @@ def afficher_formulaire_ajout(df, marques_df, equipements_df, infos_annonce=None
         st.subheader("Équipements")
         equipements_selectionnes = []
         
-        for categorie in equipements_df['categorie'].unique():
+        for categorie in catalogue.categories_equipements:
             col1, col2 = st.columns(2)
             with col1:
                 st.write(f"**{categorie}**")
             with col2:
-                equips = equipements_df[equipements_df['categorie'] == categorie]['equipement'].tolist()
-                for equip in equips:
-                    if st.checkbox(equip, help=equipements_df[equipements_df['equipement'] == equip]['description'].iloc[0]):
+                for equip in catalogue.equipements_par_categorie[categorie]:
+                    if st.checkbox(equip, help=catalogue.description(equip)):
                         equipements_selectionnes.append(equip)
         
         notes = st.text_area(
@@ -126,14 +128,48 @@ def afficher_formulaire_ajout(df, marques_df, equipements_df, infos_annonce=None
                     'Score_Match': 0,
                     'Coup_de_Coeur': False
                 }
-                df = pd.concat([df, pd.DataFrame([nouveau_vehicule])], ignore_index=True)
-                sauvegarder_donnees(df)
+                df = ajouter_vehicule(df, nouveau_vehicule)
                 st.success("✅ Véhicule ajouté avec succès!")
                 st.balloons()
                 st.session_state.page = "galerie"
     
     return df
 
+def afficher_import_masse(df):
+    """
+    Affiche l'import en masse d'annonces à partir d'une liste d'URL (saisie ou
+    fichier texte). Retourne le DataFrame mis à jour.
+    """
+    texte = st.text_area(
+        "URL des annonces (une par ligne)",
+        height=200,
+        help="Annonces AutoScout24 et LeBonCoin ; les annonces déjà importées sont ignorées"
+    )
+    fichier = st.file_uploader("... ou un fichier texte d'URL", type=['txt', 'csv'])
+    if fichier is not None:
+        texte += '\n' + fichier.getvalue().decode('utf-8', errors='ignore')
+    urls = lire_urls(texte)
+    st.caption(f"{len(urls)} annonce(s) à importer")
+    
+    if st.button("📥 Importer les annonces", disabled=not urls):
+        icones = {'ajoutee': '✅', 'deja_presente': '↩️', 'non_supportee': '⚠️', 'echec': '❌'}
+        barre = st.progress(0.0, text="Import en cours...")
+        journal = st.container()
+        
+        # Chaque annonce terminée est affichée aussitôt
+        def progression(resultat, termines, total):
+            barre.progress(termines / total, text=f"{termines}/{total} annonces traitées")
+            journal.markdown(f"{icones[resultat['statut']]} {resultat['url']} — {resultat['message']}")
+        
+        df, resultats = importer_annonces(df, urls, progression=progression)
+        ajoutees = sum(resultat['statut'] == 'ajoutee' for resultat in resultats)
+        if ajoutees:
+            st.success(f"✅ {ajoutees} véhicule(s) ajouté(s) sur {len(resultats)} annonce(s)")
+        else:
+            st.warning("Aucun véhicule ajouté")
+    
+    return df
+
 def afficher_formulaire_config(recherches):
     """
     Affiche le formulaire de configuration des critères de recherche.
@@ -141,7 +177,7 @@ def afficher_formulaire_config(recherches):
     st.title("⚙️ Configuration de la recherche")
     
     # Chargement des données de référence
-    marques_df, equipements_df = charger_references()
+    catalogue = charger_catalogue()
     
     # Nom de la recherche
     nom_recherche = st.text_input(
@@ -152,11 +188,19 @@ def afficher_formulaire_config(recherches):
     # Affichage des recherches existantes
     if recherches:
         st.subheader("Recherches sauvegardées")
+        df, _ = charger_donnees()
+        matrice = charger_matrice_scores()
         for nom, config in recherches.items():
             with st.expander(f"📋 {nom} ({config['date_creation']})"):
                 st.json(config['criteres'])
                 if config['vehicules_associes']:
                     st.write(f"🚗 {len(config['vehicules_associes'])} véhicules associés")
+                if nom in matrice.recherches:
+                    meilleurs = matrice.meilleurs_vehicules(nom, 5)
+                    if not meilleurs.empty:
+                        st.write("🏆 Meilleurs véhicules :")
+                        for identifiant, score in meilleurs.items():
+                            st.write(f"- {df.at[identifiant, 'Marque']} {df.at[identifiant, 'Modele']} : {score:.1f}%")
                 if st.button(f"Charger '{nom}'"):
                     st.session_state.config_criteres = config['criteres'].copy()
                     st.rerun()
@@ -295,7 +339,7 @@ def afficher_formulaire_config(recherches):
             st.markdown("##### 🏢 Marques")
             marques_selectionnees = st.multiselect(
                 "Marques préférées",
-                options=sorted(marques_df['marque'].unique()),
+                options=catalogue.marques,
                 default=st.session_state.config_criteres.get('marques', {'valeur': []})['valeur']
             )
             marques_poids = st.slider(
@@ -316,7 +360,7 @@ def afficher_formulaire_config(recherches):
             st.markdown("##### 🚗 Catégories")
             categories = st.multiselect(
                 "Catégories",
-                options=sorted(marques_df['categorie'].unique()),
+                options=catalogue.categories_vehicules,
                 default=st.session_state.config_criteres.get('categories', {'valeur': []})['valeur']
             )
             categories_poids = st.slider(
@@ -598,9 +642,9 @@ def afficher_formulaire_config(recherches):
         st.subheader("Équipements souhaités")
         
         # Sélection des équipements par catégorie avec importance individuelle
-        for categorie in equipements_df['categorie'].unique():
+        for categorie in catalogue.categories_equipements:
             st.markdown(f"#### {categorie}")
-            equips = equipements_df[equipements_df['categorie'] == categorie]['equipement'].tolist()
+            equips = catalogue.equipements_par_categorie[categorie]
             
             # Création d'un dictionnaire pour stocker les équipements et leurs poids
             equips_config = {}
@@ -608,7 +652,7 @@ def afficher_formulaire_config(recherches):
             for equip in equips:
                 col1, col2, col3 = st.columns([2, 1, 1])
                 with col1:
-                    selected = st.checkbox(equip, help=equipements_df[equipements_df['equipement'] == equip]['description'].iloc[0])
+                    selected = st.checkbox(equip, help=catalogue.description(equip))
                 with col2:
                     if selected:
                         poids = st.slider(
@@ -640,21 +684,59 @@ def afficher_formulaire_config(recherches):
     
     st.markdown("---")
     
+    # Aperçu en direct du classement : seuls les poids changent quand on déplace
+    # un curseur d'importance, les contributions des critères sont réutilisées
+    st.subheader("📈 Aperçu du classement")
+    df, _ = charger_donnees()
+    if df.empty:
+        st.info("Aucun véhicule à classer.")
+    else:
+        try:
+            scores = charger_contributions(st.session_state.config_criteres).scores(st.session_state.config_criteres)
+        except ValueError as e:
+            st.warning(f"Aperçu indisponible : {str(e)}")
+        except KeyError as e:
+            st.warning(f"Aperçu indisponible : colonne {e} absente des véhicules")
+        else:
+            top_10 = scores[scores > 0].nlargest(10)
+            classement_precedent = st.session_state.get('classement_apercu', {})
+            for rang, (identifiant, score) in enumerate(top_10.items(), start=1):
+                ancien_rang = classement_precedent.get(identifiant)
+                if ancien_rang is None:
+                    evolution = "🆕"
+                elif ancien_rang > rang:
+                    evolution = f"⬆️ {ancien_rang - rang}"
+                elif ancien_rang < rang:
+                    evolution = f"⬇️ {rang - ancien_rang}"
+                else:
+                    evolution = "➖"
+                st.write(f"{rang}. {df.at[identifiant, 'Marque']} {df.at[identifiant, 'Modele']} : {score:.1f}% {evolution}")
+            if top_10.empty:
+                st.info("Aucun véhicule ne respecte les critères obligatoires.")
+            st.session_state.classement_apercu = {identifiant: rang for rang, identifiant in enumerate(top_10.index, start=1)}
+    
+    st.markdown("---")
+    
     col1, col2 = st.columns(2)
     with col1:
         if st.button("💾 Sauvegarder cette configuration", use_container_width=True):
-            if nom_recherche:
-                if nom_recherche in recherches:
-                    if st.checkbox("Cette recherche existe déjà. Voulez-vous la remplacer ?"):
+            try:
+                compiler_criteres(st.session_state.config_criteres)
+            except ValueError as e:
+                st.error(f"❌ Critères invalides : {str(e)}")
+            else:
+                if nom_recherche:
+                    if nom_recherche in recherches:
+                        if st.checkbox("Cette recherche existe déjà. Voulez-vous la remplacer ?"):
+                            recherches = sauvegarder_recherche(nom_recherche, st.session_state.config_criteres, recherches)
+                            st.success(f"✅ Configuration '{nom_recherche}' mise à jour!")
+                            st.balloons()
+                    else:
                         recherches = sauvegarder_recherche(nom_recherche, st.session_state.config_criteres, recherches)
-                        st.success(f"✅ Configuration '{nom_recherche}' mise à jour!")
+                        st.success(f"✅ Configuration '{nom_recherche}' sauvegardée!")
                         st.balloons()
                 else:
-                    recherches = sauvegarder_recherche(nom_recherche, st.session_state.config_criteres, recherches)
-                    st.success(f"✅ Configuration '{nom_recherche}' sauvegardée!")
-                    st.balloons()
-            else:
-                st.error("❌ Veuillez donner un nom à cette configuration")
+                    st.error("❌ Veuillez donner un nom à cette configuration")
     
     with col2:
         if st.button("🔄 Réinitialiser", use_container_width=True):
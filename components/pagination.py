@@ -0,0 +1,45 @@
+import math
+import streamlit as st
+
+# Nombres de véhicules par page proposés (multiples de 3 pour la grille)
+TAILLES_PAGE = [12, 24, 48, 96]
+
+def _changer_page(numero):
+    st.session_state.numero_page = numero
+
+def afficher_pagination(total, cle_resultats):
+    """
+    Affiche la navigation entre les pages d'une liste de total véhicules et
+    retourne les bornes (début, fin) de la page courante.
+    Le numéro de page est gardé dans st.session_state ; il revient à la première
+    page quand cle_resultats change (autres filtres, autre tri...).
+    """
+    if st.session_state.get('pagination_resultats') != cle_resultats:
+        st.session_state.pagination_resultats = cle_resultats
+        st.session_state.numero_page = 1
+
+    taille = st.session_state.taille_page
+    nombre_pages = max(1, math.ceil(total / taille))
+    numero = min(max(st.session_state.get('numero_page', 1), 1), nombre_pages)
+
+    st.session_state.numero_page = numero
+
+    col_precedent, col_position, col_suivant = st.columns([1, 2, 1])
+    with col_precedent:
+        st.button(
+            "◀ Précédent", disabled=numero <= 1, key="page_precedente", use_container_width=True,
+            on_click=_changer_page, args=(numero - 1,)
+        )
+    with col_suivant:
+        st.button(
+            "Suivant ▶", disabled=numero >= nombre_pages, key="page_suivante", use_container_width=True,
+            on_click=_changer_page, args=(numero + 1,)
+        )
+    with col_position:
+        st.markdown(
+            f"<div style='text-align: center;'>Page {numero} / {nombre_pages} · {total} véhicules</div>",
+            unsafe_allow_html=True
+        )
+
+    debut = (numero - 1) * taille
+    return debut, min(debut + taille, total)
@@ -1,9 +1,18 @@
 import streamlit as st
-from utils.data import charger_donnees, charger_references, sauvegarder_donnees, filtrer_vehicules
+import numpy as np
+from utils.data import (
+    charger_donnees, charger_catalogue, charger_index_equipements, charger_index_texte, mettre_a_jour_vehicule,
+    positions_filtrees, ordre_tri, valeurs_tags, statistiques_cache
+)
 from utils.scraping import extraire_infos_annonce
-from utils.scoring import calculer_score_vehicule
-from components.cards import afficher_carte_vehicule, afficher_liste_vehicule
-from components.forms import afficher_formulaire_ajout, afficher_formulaire_config
+from utils.cache_scores import obtenir_cache_scores
+from utils.images import obtenir_cache_images
+from utils.client_http import obtenir_client
+from utils.stockage import obtenir_stockage
+from utils.scoring import calculer_score_vehicule, masque_obligatoires, meilleurs_scores
+from components.cards import afficher_grille_vehicules, afficher_liste_vehicule
+from components.pagination import TAILLES_PAGE, afficher_pagination
+from components.forms import afficher_formulaire_ajout, afficher_formulaire_config, afficher_import_masse
 from components.stats import afficher_statistiques
 from components.details import afficher_details_vehicule
 
@@ -56,6 +65,42 @@ st.markdown("""
         box-shadow: 0 12px 24px rgba(0, 0, 0, 0.15);
     }
     
+    /* Grille de la galerie, rendue en un seul bloc */
+    .car-grid {
+        display: grid;
+        grid-template-columns: repeat(3, minmax(0, 1fr));
+        gap: 1.5rem;
+    }
+    
+    .car-slot {
+        position: relative;
+    }
+    
+    .car-rank {
+        position: absolute;
+        top: 12px;
+        left: 16px;
+        z-index: 3;
+        color: #888;
+        font-size: 0.9em;
+        font-weight: 600;
+    }
+    
+    .car-image {
+        width: 100%;
+        border-radius: 12px;
+        margin-bottom: 1rem;
+    }
+    
+    .car-image-vide {
+        aspect-ratio: 4 / 3;
+        display: flex;
+        align-items: center;
+        justify-content: center;
+        background: #f0f2f6;
+        font-size: 3em;
+    }
+    
     .premium-card {
         background: linear-gradient(145deg, #fff9e6, #fff2cc);
         border: 2px solid #ffd700;
@@ -234,6 +279,10 @@ st.markdown("""
     
     /* Responsive design */
     @media (max-width: 768px) {
+        .car-grid {
+            grid-template-columns: 1fr;
+        }
+        
         .car-card {
             padding: 1.2rem;
         }
@@ -256,6 +305,10 @@ if 'page' not in st.session_state:
     st.session_state.page = "galerie"
 if 'search_query' not in st.session_state:
     st.session_state.search_query = ""
+if 'taille_page' not in st.session_state:
+    st.session_state.taille_page = TAILLES_PAGE[0]
+if 'numero_page' not in st.session_state:
+    st.session_state.numero_page = 1
 if 'selected_car' not in st.session_state:
     st.session_state.selected_car = None
 if 'recherche_active' not in st.session_state:
@@ -276,7 +329,19 @@ if 'config_criteres' not in st.session_state:
 
 # Chargement des données
 df, recherches = charger_donnees()
-marques_df, equipements_df = charger_references()
+catalogue = charger_catalogue()
+
+def curseur_plage(df, libelle, colonne):
+    """
+    Affiche un curseur de plage sur une colonne numérique et retourne la plage
+    choisie, ou None si elle couvre toutes les valeurs.
+    """
+    valeurs = df[colonne].dropna() if colonne in df.columns else []
+    if len(valeurs) == 0 or valeurs.min() == valeurs.max():
+        return None
+    bornes = (int(valeurs.min()), int(valeurs.max()))
+    choix = st.slider(libelle, min_value=bornes[0], max_value=bornes[1], value=bornes)
+    return choix if choix != bornes else None
 
 # Barre latérale
 with st.sidebar:
@@ -304,7 +369,7 @@ with st.sidebar:
     search = st.text_input(
         "🔍 Rechercher un modèle",
         value=st.session_state.search_query,
-        help="Ex: BMW E46, Mercedes C200..."
+        help="Recherche dans la marque, le modèle et les tags (fautes de frappe tolérées à partir de 4 caractères) et, telle quelle, dans les notes. Ex: BMW E46, Mercedes C200..."
     )
     
     # Filtres
@@ -316,7 +381,13 @@ with st.sidebar:
     
     marques = st.multiselect(
         "Marque",
-        sorted(marques_df['marque'].unique())
+        catalogue.marques
+    )
+    
+    equipements = st.multiselect(
+        "Équipements (contient tous)",
+        [equip for categorie in catalogue.categories_equipements for equip in catalogue.equipements_par_categorie[categorie]],
+        help="N'afficher que les véhicules possédant tous ces équipements"
     )
     
     # Filtres de prix
@@ -329,6 +400,21 @@ with st.sidebar:
         value=(min_prix, max_prix)
     )
     
+    # Filtres complémentaires : une plage laissée entière n'est pas appliquée,
+    # pour ne pas exclure les véhicules dont la valeur est inconnue
+    with st.expander("Plus de filtres"):
+        annee_range = curseur_plage(df, "Année", 'Annee')
+        puissance_range = curseur_plage(df, "Puissance (ch)", 'Puissance')
+        motorisations = st.multiselect("Motorisation", ["Essence", "Diesel", "Hybride", "Électrique"])
+        transmissions = st.multiselect("Transmission", ["Manuelle", "Automatique"])
+        types_vendeur = st.multiselect("Type de vendeur", ["Particulier", "Professionnel"])
+        tags = st.multiselect("Tags (contient tous)", valeurs_tags(df))
+        score_range = None
+        if st.session_state.recherche_active in recherches:
+            score_range = st.slider("Score de correspondance (%)", min_value=0, max_value=100, value=(0, 100))
+            if score_range == (0, 100):
+                score_range = None
+    
     # Navigation
     st.markdown("---")
     if st.button("🖼️ Galerie", use_container_width=True):
@@ -339,41 +425,64 @@ with st.sidebar:
         st.session_state.page = "stats"
     if st.button("⚙️ Configuration recherche", use_container_width=True):
         st.session_state.page = "config"
+    
+    # Compaction du journal des modifications en échec : le journal grossit sans être reporté
+    etat_stockage = obtenir_stockage().statistiques()
+    if etat_stockage.get('erreur'):
+        st.warning(
+            f"⚠️ Les modifications ne sont plus reportées dans la base ({etat_stockage['echecs']} échec(s), "
+            f"journal de {etat_stockage['taille_journal'] / 1024:.0f} Ko) : {etat_stockage['erreur']}"
+        )
 
-# Filtrage des données
+    # Efficacité du cache de données
+    with st.expander("⚡ Cache des données"):
+        for cle, stats in statistiques_cache().items():
+            revalidations = f", dont {stats['revalidations']} revalidations" if 'revalidations' in stats else ""
+            st.caption(f"{cle} : {stats['hits']} hits / {stats['misses']} misses ({stats['taux']:.0%}{revalidations})")
+    
+    # Latences des sites d'annonces et des photos
+    statistiques_http = obtenir_client().statistiques()
+    if statistiques_http:
+        with st.expander("🌐 Requêtes HTTP"):
+            for domaine, stats in statistiques_http.items():
+                p95 = f"≤ {stats['p95_ms']} ms" if stats['p95_ms'] is not None else "> 30 s"
+                st.caption(f"{domaine} : {stats['requetes']} requêtes, {stats['erreurs']} erreurs, moyenne {stats['moyenne_ms']:.0f} ms, p95 {p95}")
+
+# Filtrage des données : positions des véhicules retenus dans le DataFrame partagé,
+# qui n'est jamais copié en entier
+recherche_active = st.session_state.recherche_active != "Toutes les annonces" and st.session_state.recherche_active in recherches
 filtres = {
-    'recherche_active': st.session_state.recherche_active,
+    'vehicules': recherches[st.session_state.recherche_active]['vehicules_associes'] if recherche_active else None,
     'search': search,
     'status': status,
     'marques': marques,
-    'prix_range': prix_range
+    'equipements': equipements,
+    'prix_range': prix_range,
+    'annee_range': annee_range,
+    'puissance_range': puissance_range,
+    'motorisations': motorisations,
+    'transmissions': transmissions,
+    'types_vendeur': types_vendeur,
+    'tags': tags,
+    'score_range': score_range
 }
-df_filtered = filtrer_vehicules(df, filtres)
+try:
+    positions = positions_filtrees(df, filtres, recherches[st.session_state.recherche_active]['criteres'] if score_range else None)
+except (ValueError, KeyError) as e:
+    # Critères de la recherche active invalides : filtre de score ignoré
+    st.error(f"❌ Critères de la recherche invalides : {str(e)}")
+    positions = positions_filtrees(df, dict(filtres, score_range=None))
 
 # Affichage de la page principale
 if st.session_state.page == "galerie":
     st.title("🖼️ Galerie des véhicules")
     
-    # Calcul des scores pour tous les véhicules si une recherche est active
-    if st.session_state.recherche_active != "Toutes les annonces" and st.session_state.recherche_active in recherches:
-        criteres = recherches[st.session_state.recherche_active]['criteres']
-        indices_associes = recherches[st.session_state.recherche_active]['vehicules_associes']
-        df_filtered = df.iloc[indices_associes].copy()
-        
-        # Calcul des scores pour les véhicules filtrés
-        for idx in df_filtered.index:
-            score = calculer_score_vehicule(df_filtered.iloc[idx], criteres)
-            df_filtered.at[idx, 'Score_Match'] = score
-    else:
-        df_filtered = df.copy()
-        if not df_filtered.empty:
-            df_filtered['Score_Match'] = 0.0
-    
     # Barre de tri et filtres
-    col_tri, col_vue = st.columns([2, 1])
+    col_tri, col_vue, col_taille = st.columns([2, 1, 1])
     with col_tri:
         tri = st.selectbox(
             "Trier par",
+            (["Pertinence ↓"] if search.strip() else []) +
             ["Date d'ajout ↓", "Prix ↑", "Prix ↓", "Année ↓"] + 
             (["Score de correspondance ↓"] if st.session_state.recherche_active != "Toutes les annonces" else []),
             help="Choisissez comment trier les véhicules"
@@ -387,57 +496,118 @@ if st.session_state.page == "galerie":
             help="Choisissez le mode d'affichage"
         )
     
-    # Tri des véhicules
-    if tri == "Score de correspondance ↓" and 'Score_Match' in df_filtered.columns:
-        df_filtered = df_filtered.sort_values('Score_Match', ascending=False)
-    elif tri == "Date d'ajout ↓":
-        df_filtered = df_filtered.sort_values('Date_Ajout', ascending=False)
-    elif tri == "Prix ↑":
-        df_filtered = df_filtered.sort_values('Prix')
-    elif tri == "Prix ↓":
-        df_filtered = df_filtered.sort_values('Prix', ascending=False)
-    elif tri == "Année ↓":
-        df_filtered = df_filtered.sort_values('Annee', ascending=False)
-    
-    # Affichage des véhicules
-    if not df_filtered.empty:
+    with col_taille:
+        st.selectbox("Véhicules par page", TAILLES_PAGE, key="taille_page")
+    
+    # Ordre des positions retenues, puis page courante : seules les positions sont
+    # triées, les scores et les lignes ne sont extraits que pour la page affichée
+    cle_resultats = (repr(filtres), tri, st.session_state.taille_page)
+    criteres = recherches[st.session_state.recherche_active]['criteres'] if recherche_active else None
+    page_positions, page_scores = positions[:0], np.zeros(0)
+    positions_suivantes = positions[:0]
+    try:
+        if tri == "Score de correspondance ↓" and recherche_active:
+            # Classement des seuls véhicules respectant les critères obligatoires,
+            # sans tri complet : seuls les véhicules jusqu'à la page courante sont triés
+            survivants = positions[np.asarray(masque_obligatoires(df, criteres, charger_index_equipements()))[positions]]
+            debut, fin = afficher_pagination(len(survivants), cle_resultats)
+            scores = obtenir_cache_scores().scores(df, criteres, charger_index_equipements(), survivants)
+            classement = meilleurs_scores(scores, fin + st.session_state.taille_page)
+            page_positions, page_scores = df.index.get_indexer(classement.index[debut:fin]), classement.iloc[debut:fin].to_numpy()
+            positions_suivantes = df.index.get_indexer(classement.index[fin:])
+        else:
+            colonnes_tri = {
+                "Date d'ajout ↓": ('Date_Ajout', False),
+                "Prix ↑": ('Prix', True),
+                "Prix ↓": ('Prix', False),
+                "Année ↓": ('Annee', False)
+            }
+            if tri in colonnes_tri:
+                positions = positions[ordre_tri(df, positions, *colonnes_tri[tri])]
+            elif tri == "Pertinence ↓":
+                # Similarité de chaque véhicule avec la recherche texte, la plus forte d'abord
+                similarites = charger_index_texte().rechercher(search).reindex(df.index[positions]).to_numpy()
+                positions = positions[np.argsort(-similarites, kind='stable')]
+            debut, fin = afficher_pagination(len(positions), cle_resultats)
+            page_positions = positions[debut:fin]
+            positions_suivantes = positions[fin:fin + st.session_state.taille_page]
+            page_scores = np.zeros(len(page_positions))
+            if recherche_active:
+                # Scores de la recherche active pour la seule page affichée
+                page_scores = obtenir_cache_scores().scores(df, criteres, charger_index_equipements(), page_positions).to_numpy()
+    except (ValueError, KeyError) as e:
+        st.error(f"❌ Critères de la recherche invalides : {str(e)}")
+    
+    # Affichage des véhicules de la page : seules ces lignes sont extraites
+    if len(page_positions):
+        df_affiche = df.iloc[page_positions].assign(Score_Match=page_scores)
         if vue == "Grille":
-            cols = st.columns(3)
-            for idx, row in df_filtered.iterrows():
-                with cols[idx % 3]:
-                    afficher_carte_vehicule(row, idx, df, sauvegarder_donnees)
+            afficher_grille_vehicules(df_affiche, debut + 1)
         else:
-            for idx, row in df_filtered.iterrows():
-                afficher_liste_vehicule(row, idx, df, sauvegarder_donnees)
+            for idx, row in df_affiche.iterrows():
+                afficher_liste_vehicule(row, idx, df, mettre_a_jour_vehicule)
     else:
         st.info("Aucun véhicule trouvé")
+    
+    # Images de la page suivante téléchargées en arrière-plan
+    if len(positions_suivantes):
+        obtenir_cache_images().precharger(df['Image_URL'].iloc[positions_suivantes].tolist())
 
 elif st.session_state.page == "ajouter":
     st.title("📝 Ajouter un véhicule")
     
-    # Option pour ajouter via URL
-    url_annonce = st.text_input(
-        "URL de l'annonce (AutoScout24, LeBonCoin)", 
-        help="Collez l'URL de l'annonce pour remplir automatiquement les informations"
-    )
-    
-    infos_annonce = None
-    if url_annonce:
-        infos_annonce = extraire_infos_annonce(url_annonce)
-        if infos_annonce:
-            st.success("✅ Informations extraites avec succès!")
+    mode_ajout = st.radio("Mode d'ajout", ["Une annonce", "Import en masse"], horizontal=True)
     
-    df = afficher_formulaire_ajout(df, marques_df, equipements_df, infos_annonce)
+    if mode_ajout == "Import en masse":
+        df = afficher_import_masse(df)
+    else:
+        # Option pour ajouter via URL
+        url_annonce = st.text_input(
+            "URL de l'annonce (AutoScout24, LeBonCoin)", 
+            help="Collez l'URL de l'annonce pour remplir automatiquement les informations"
+        )
+        
+        infos_annonce = None
+        if url_annonce:
+            infos_annonce = extraire_infos_annonce(url_annonce)
+            if infos_annonce:
+                st.success("✅ Informations extraites avec succès!")
+                obtenir_cache_images().precharger([infos_annonce.get('image_url', '')], ('carte', 'detail'))
+        
+        df = afficher_formulaire_ajout(df, catalogue, infos_annonce)
 
 elif st.session_state.page == "stats":
     st.title("📊 Statistiques")
-    afficher_statistiques(df_filtered)
+    # Scores de la recherche active pour les véhicules filtrés (la colonne
+    # Score_Match enregistrée n'est plus tenue à jour)
+    scores_stats = None
+    if recherche_active:
+        try:
+            scores_stats = obtenir_cache_scores().scores(
+                df, recherches[st.session_state.recherche_active]['criteres'], charger_index_equipements(), positions
+            )
+        except (ValueError, KeyError) as e:
+            st.error(f"❌ Critères de la recherche invalides : {str(e)}")
+    afficher_statistiques(df.iloc[positions], scores_stats)
 
 elif st.session_state.page == "config":
     afficher_formulaire_config(st.session_state.recherches_validees)
 
 elif st.session_state.page == "details" and st.session_state.selected_car is not None:
-    afficher_details_vehicule(df_filtered.iloc[st.session_state.selected_car], st.session_state.selected_car, df)
+    vehicule = df.loc[st.session_state.selected_car].copy()
+    # Score et détail du score pour la recherche active, en une passe et sans
+    # toucher au DataFrame partagé
+    detail_score = None
+    if st.session_state.recherche_active in recherches:
+        try:
+            vehicule['Score_Match'], detail_score = calculer_score_vehicule(
+                vehicule,
+                recherches[st.session_state.recherche_active]['criteres'],
+                detail=True
+            )
+        except (ValueError, KeyError) as e:
+            st.warning(f"⚠️ Score indisponible pour la recherche active : {str(e)}")
+    afficher_details_vehicule(vehicule, st.session_state.selected_car, df, detail_score)
 
 # Affichage de la recherche active
 if st.session_state.recherche_active != "Toutes les annonces":
@@ -0,0 +1,34 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+@pytest.fixture(autouse=True)
+def racine_du_depot(monkeypatch):
+    """Les données de référence (data/*.csv) sont lues depuis la racine du dépôt."""
+    monkeypatch.chdir(RACINE)
+
+@pytest.fixture
+def donnees_temporaires(tmp_path, monkeypatch):
+    """
+    Dossier de travail temporaire (data/ avec les fichiers de référence du dépôt),
+    stockage SQLite et caches neufs : les tests n'écrivent pas dans data/saved.
+    """
+    from utils import cache_annonces, cache_scores, data, stockage
+    from utils.cache import CacheFichiers
+    from utils.requetes import MoteurRequetes
+
+    os.makedirs(tmp_path / 'data' / 'saved')
+    for nom in ('equipements.csv', 'marques.csv'):
+        shutil.copy(os.path.join(RACINE, 'data', nom), tmp_path / 'data' / nom)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(data, '_cache', CacheFichiers())
+    monkeypatch.setattr(data, '_requetes', MoteurRequetes())
+    monkeypatch.setattr(cache_scores, '_cache_scores', None)
+    monkeypatch.setattr(cache_annonces, '_cache_annonces', None)
+    monkeypatch.setattr(stockage, '_stockage', stockage.StockageSQLite())
+    yield tmp_path
@@ -0,0 +1,54 @@
+"""
+Pages de l'application (streamlit_app.py) exécutées avec AppTest sur des données
+temporaires.
+"""
+import os
+import sys
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from conftest import RACINE
+from utils.data import ajouter_vehicules, associer_vehicule_recherche, charger_donnees, sauvegarder_recherche
+
+CRITERES = {
+    'budget': {'valeur': 15000, 'poids': 5},
+    'conso_max': {'valeur': 6.0, 'poids': 4},
+    'assurance_max': {'valeur': 800, 'poids': 3}
+}
+
+@pytest.fixture(autouse=True)
+def module_principal(monkeypatch):
+    """AppTest remplace sys.modules['__main__'] (relu par les processus de calcul des scores)."""
+    monkeypatch.setitem(sys.modules, '__main__', sys.modules['__main__'])
+
+def application(page):
+    at = AppTest.from_file(os.path.join(RACINE, 'streamlit_app.py'), default_timeout=60)
+    at.session_state['page'] = page
+    at.session_state['selected_car'] = 0
+    return at
+
+@pytest.fixture
+def sans_colonnes_requises(donnees_temporaires):
+    """Un véhicule saisi sans consommation ni coût d'assurance, associé à une recherche."""
+    ajouter_vehicules(None, [
+        {'Marque': 'Peugeot', 'Modele': '208', 'Annee': 2018, 'Prix': 9000, 'Coup_de_Coeur': False}
+    ])
+    _, recherches = charger_donnees()
+    sauvegarder_recherche('citadine', CRITERES, recherches)
+    associer_vehicule_recherche('citadine', 0, recherches)
+
+def test_galerie_sans_colonnes_requises(sans_colonnes_requises):
+    at = application('galerie')
+    at.run()
+    at.sidebar.selectbox[0].set_value('citadine').run()
+    assert not at.exception
+    assert any("Critères de la recherche invalides" in e.value for e in at.error)
+
+def test_details_sans_colonnes_requises(sans_colonnes_requises):
+    at = application('details')
+    at.run()
+    at.sidebar.selectbox[0].set_value('citadine').run()
+    assert not at.exception
+    # Le score n'est pas calculable : la page le signale au lieu de l'omettre
+    assert any("Score indisponible" in w.value for w in at.warning)
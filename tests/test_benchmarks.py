@@ -0,0 +1,35 @@
+"""
+Suite de mesures (voir benchmarks.suite) : chaque taille de flotte travaille dans
+son propre dossier, avec son stockage et ses caches.
+"""
+import sqlite3
+
+import pytest
+
+from benchmarks import suite
+from utils import cache_annonces, cache_scores, stockage
+from utils.cache_scores import obtenir_cache_scores
+from utils.stockage import obtenir_stockage
+
+def test_stockages_fermes_entre_les_tailles(monkeypatch):
+    monkeypatch.setattr(stockage, '_stockage', None)
+    monkeypatch.setattr(cache_scores, '_cache_scores', None)
+    monkeypatch.setattr(cache_annonces, '_cache_annonces', None)
+    ouverts = []
+    mesurer_taille = suite.mesurer_taille
+    def mesurer(*args):
+        resultats = mesurer_taille(*args)
+        ouverts.append((obtenir_stockage(), obtenir_cache_scores()))
+        return resultats
+    monkeypatch.setattr(suite, 'mesurer_taille', mesurer)
+
+    resultats = suite.executer([200, 300], repetitions=1, journal=lambda message: None)
+
+    assert list(resultats['tailles']) == ['200', '300']
+    (stockage_1, scores_1), (stockage_2, scores_2) = ouverts
+    assert stockage_1 is not stockage_2 and scores_1 is not scores_2
+    # Les bases de chaque taille sont fermées avant la suppression de leur dossier
+    for base in (stockage_1.stockage._connexion, stockage_2.stockage._connexion, scores_1._connexion, scores_2._connexion):
+        with pytest.raises(sqlite3.ProgrammingError):
+            base.execute("SELECT 1")
+    assert stockage._stockage is None and cache_scores._cache_scores is None
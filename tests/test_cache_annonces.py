@@ -0,0 +1,89 @@
+"""
+Cache des extractions d'annonces (voir utils.cache_annonces) : revalidation sous
+condition et échecs retenus pour une durée limitée.
+"""
+import pytest
+
+from utils import cache_annonces
+from utils.cache_annonces import CacheAnnonces, normaliser_url
+
+URL = 'https://www.autoscout24.fr/offres/peugeot-308?utm_source=mail'
+INFOS = {'marque': 'Peugeot', 'modele': '308', 'prix': 12000}
+
+class Horloge:
+    """Remplace le module time de utils.cache_annonces : le test fait avancer le temps."""
+    def __init__(self):
+        self.maintenant = 1000.0
+
+    def time(self):
+        return self.maintenant
+
+class Site:
+    """recuperer(entetes) scripté : chaque appel retourne la réponse suivante et note ses entêtes."""
+    def __init__(self, *reponses):
+        self.reponses = list(reponses)
+        self.entetes = []
+
+    def __call__(self, entetes):
+        self.entetes.append(entetes)
+        reponse = self.reponses.pop(0)
+        if isinstance(reponse, Exception):
+            raise reponse
+        return reponse
+
+@pytest.fixture
+def horloge(monkeypatch):
+    horloge = Horloge()
+    monkeypatch.setattr(cache_annonces, 'time', horloge)
+    return horloge
+
+def test_304_reutilise_l_extraction(tmp_path, horloge):
+    cache = CacheAnnonces(str(tmp_path / 'annonces.db'), duree=60)
+    site = Site(
+        (False, INFOS, '"v1"', 'Mon, 01 Jan 2024 00:00:00 GMT'),
+        (True, None, None, None),
+        (True, None, '"v2"', None)
+    )
+    assert cache.obtenir(URL, site) == INFOS
+    # Dans la durée de validité : servie sans contacter le site
+    assert cache.obtenir(URL.replace('utm_source=mail', ''), site) == dict(INFOS, url=URL.replace('utm_source=mail', ''))
+    assert len(site.entetes) == 1
+
+    horloge.maintenant += 61
+    assert cache.obtenir(URL, site) == dict(INFOS, url=URL)
+    assert site.entetes[1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+    # La revalidation repart pour une durée complète
+    horloge.maintenant += 30
+    assert cache.obtenir(URL, site) == dict(INFOS, url=URL)
+    assert len(site.entetes) == 2
+
+    # Le nouvel ETag d'une réponse 304 est retenu, l'extraction reste celle d'origine,
+    # y compris après réouverture de la base
+    horloge.maintenant += 61
+    assert cache.obtenir(URL, site) == dict(INFOS, url=URL)
+    relue = CacheAnnonces(str(tmp_path / 'annonces.db'), duree=60)
+    assert relue._lire(normaliser_url(URL))[:3] == (INFOS, '"v2"', 'Mon, 01 Jan 2024 00:00:00 GMT')
+    assert cache.statistiques()['revalidations'] == 2
+
+def test_echec_expire_apres_sa_duree(tmp_path, horloge):
+    cache = CacheAnnonces(str(tmp_path / 'annonces.db'), duree_echec=300)
+    site = Site((False, None, None, None), ConnectionError("site injoignable"), (False, INFOS, None, None))
+    assert cache.obtenir(URL, site) is None
+    # Échec récent : rien n'est téléchargé
+    horloge.maintenant += 299
+    assert cache.obtenir(URL, site) is None
+    assert len(site.entetes) == 1
+    assert cache.statistiques()['echecs'] == 1
+
+    # Échec expiré : nouvel essai, dont l'exception est propagée et retenue à son tour
+    horloge.maintenant += 1
+    with pytest.raises(ConnectionError):
+        cache.obtenir(URL, site)
+    horloge.maintenant += 100
+    assert cache.obtenir(URL, site) is None
+    assert len(site.entetes) == 2
+
+    horloge.maintenant += 200
+    assert cache.obtenir(URL, site) == INFOS
+    assert len(site.entetes) == 3
+    assert not cache._echecs
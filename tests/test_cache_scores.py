@@ -0,0 +1,76 @@
+"""
+Cache persistant des scores (voir utils.cache_scores) partagé par les sessions.
+"""
+import threading
+
+import pandas as pd
+
+from utils import cache_scores
+from utils.cache_scores import CacheScores
+
+CRITERES = {'budget_min': {'valeur': 5000, 'poids': 5}, 'budget_max': {'valeur': 10000, 'poids': 5}}
+AUTRES_CRITERES = {'budget_max': {'valeur': 8000, 'poids': 5}}
+
+def flotte(nombre):
+    return pd.DataFrame({
+        'Marque': ['Peugeot'] * nombre, 'Modele': ['208'] * nombre, 'Annee': [2015] * nombre,
+        'Prix': [6000 + 100 * i for i in range(nombre)], 'Consommation': [5.5] * nombre,
+        'Cout_Assurance': [600] * nombre, 'Equipements': ['GPS'] * nombre, 'Revision': [0] * nombre
+    })
+
+def calcul_bloque(monkeypatch):
+    """Remplace le calcul des scores par un calcul qui attend le feu vert du test."""
+    demarre, feu_vert = threading.Event(), threading.Event()
+    original = cache_scores.calculer_scores_paralleles
+    def calcul(*args):
+        demarre.set()
+        assert feu_vert.wait(10)
+        return original(*args)
+    monkeypatch.setattr(cache_scores, 'calculer_scores_paralleles', calcul)
+    return original, demarre, feu_vert
+
+def test_calcul_hors_verrou(tmp_path, monkeypatch):
+    cache = CacheScores(str(tmp_path / 'scores.db'))
+    df = flotte(5)
+    attendus = cache.scores(df, CRITERES)
+
+    original, demarre, feu_vert = calcul_bloque(monkeypatch)
+    resultats = {}
+    fil = threading.Thread(target=lambda: resultats.setdefault('autres', cache.scores(df, AUTRES_CRITERES)))
+    fil.start()
+    assert demarre.wait(10)
+    # Pendant le calcul d'une autre session, les scores connus restent servis
+    monkeypatch.setattr(cache_scores, 'calculer_scores_paralleles', original)
+    assert cache.scores(df, CRITERES).equals(attendus)
+    feu_vert.set()
+    fil.join()
+
+    assert resultats['autres'].equals(cache.scores(df, AUTRES_CRITERES))
+    assert cache._connexion.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 10
+
+def test_invalidation_pendant_le_calcul(tmp_path, monkeypatch):
+    cache = CacheScores(str(tmp_path / 'scores.db'))
+    df = flotte(3)
+    _, demarre, feu_vert = calcul_bloque(monkeypatch)
+    fil = threading.Thread(target=cache.scores, args=(df, CRITERES))
+    fil.start()
+    assert demarre.wait(10)
+    cache.invalider()
+    feu_vert.set()
+    fil.join()
+    # Les scores calculés sur les véhicules d'avant l'invalidation ne sont pas enregistrés
+    assert cache._connexion.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 0
+
+def test_revision_plus_recente_conservee(tmp_path):
+    cache = CacheScores(str(tmp_path / 'scores.db'))
+    df = flotte(2)
+    recent = df.assign(Revision=[1, 0], Prix=[50000, 6100])
+    cache.scores(recent, CRITERES)
+    # Un calcul sur des véhicules relus avant la modification se termine après
+    cache._enregistrer(
+        cache._version() + cache_scores.compiler_criteres(CRITERES).empreinte,
+        cache._generation, df.index, df['Revision'].to_numpy(), cache_scores.calculer_scores_paralleles(df, CRITERES).to_numpy()
+    )
+    assert cache.scores(recent, CRITERES).tolist() == [0.0, 50.0]
+    lignes = cache._connexion.execute("SELECT vehicule_id, revision FROM scores ORDER BY vehicule_id").fetchall()
+    assert lignes == [(0, 1), (1, 0)]
@@ -0,0 +1,142 @@
+"""
+Client HTTP partagé (voir utils.client_http) contre un serveur HTTP local : nouvelles
+tentatives, entête Retry-After, débit limité et histogramme des latences.
+"""
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils.client_http import ClientHTTP, SeauJetons
+
+class Serveur(ThreadingHTTPServer):
+    """
+    Serveur de test : chaque chemin répond successivement les réponses prévues
+    (statut, entêtes, délai en secondes), la dernière étant répétée. Les dates
+    d'arrivée des requêtes sont notées par chemin.
+    """
+    daemon_threads = True
+
+    def __init__(self, reponses):
+        super().__init__(('127.0.0.1', 0), Gestionnaire)
+        self.reponses = reponses
+        self.arrivees = {}
+        self._verrou = threading.Lock()
+
+    def reponse(self, chemin):
+        with self._verrou:
+            arrivees = self.arrivees.setdefault(chemin, [])
+            arrivees.append(time.monotonic())
+            prevues = self.reponses[chemin]
+            return prevues[min(len(arrivees), len(prevues)) - 1]
+
+    def url(self, chemin):
+        return f"http://127.0.0.1:{self.server_address[1]}{chemin}"
+
+class Gestionnaire(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        statut, entetes, delai = self.server.reponse(self.path)
+        time.sleep(delai)
+        corps = str(statut).encode()
+        self.send_response(statut)
+        for cle, valeur in entetes.items():
+            self.send_header(cle, valeur)
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def serveur():
+    serveur = Serveur({
+        '/instable': [(503, {}, 0), (500, {}, 0), (200, {}, 0)],
+        '/surcharge': [(429, {'Retry-After': '1'}, 0), (200, {}, 0)],
+        '/panne': [(502, {}, 0)],
+        '/absente': [(404, {}, 0)],
+        '/lente': [(200, {}, 0.06)],
+        '/rapide': [(200, {}, 0)]
+    })
+    fil = threading.Thread(target=serveur.serve_forever, daemon=True)
+    fil.start()
+    yield serveur
+    serveur.shutdown()
+    serveur.server_close()
+
+def ecarts(dates):
+    return [apres - avant for avant, apres in zip(dates, dates[1:])]
+
+def test_nouvelles_tentatives_espacees(serveur):
+    client = ClientHTTP(attente_initiale=0.05, debits={})
+    reponse = client.get(serveur.url('/instable'))
+    assert reponse.status_code == 200
+    # 0,05 s puis 0,1 s (plus un aléa d'au plus 50 %) entre les tentatives
+    premier, second = ecarts(serveur.arrivees['/instable'])
+    assert 0.05 <= premier < 0.1
+    assert 0.1 <= second < 0.2
+    compteurs = client.statistiques()['127.0.0.1']
+    assert compteurs['tentatives'] == 3
+    assert (compteurs['statut_503'], compteurs['statut_500'], compteurs['statut_200']) == (1, 1, 1)
+
+def test_tentatives_epuisees(serveur):
+    client = ClientHTTP(attente_initiale=0.01, tentatives=2, debits={})
+    # La dernière réponse est retournée quel que soit son statut
+    assert client.get(serveur.url('/panne')).status_code == 502
+    assert len(serveur.arrivees['/panne']) == 3
+    # Un statut définitif n'est pas retenté
+    assert client.get(serveur.url('/absente')).status_code == 404
+    assert len(serveur.arrivees['/absente']) == 1
+
+def test_retry_after_respecte(serveur):
+    client = ClientHTTP(attente_initiale=0.01, debits={})
+    assert client.get(serveur.url('/surcharge')).status_code == 200
+    # Le délai demandé par le site l'emporte sur l'attente exponentielle, plus courte
+    assert ecarts(serveur.arrivees['/surcharge'])[0] >= 1.0
+
+def test_erreur_reseau_propagee():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    client = ClientHTTP(attente_initiale=0.01, tentatives=1, debits={})
+    with pytest.raises(requests.ConnectionError):
+        client.get(f"http://127.0.0.1:{port}/")
+    assert client.statistiques()['127.0.0.1']['erreurs'] == 2
+
+def test_debit_limite(serveur):
+    # 20 requêtes par seconde, rafale de 2
+    client = ClientHTTP(debits={'127.0.0.1': (20.0, 2)})
+    for _ in range(6):
+        client.get(serveur.url('/rapide'))
+    arrivees = serveur.arrivees['/rapide']
+    # La rafale passe aussitôt, les requêtes suivantes sont espacées de 50 ms
+    assert arrivees[1] - arrivees[0] < 0.04
+    assert arrivees[-1] - arrivees[0] >= 4 * 0.05 - 0.01
+    assert client.statistiques()['127.0.0.1']['attente_s'] > 0.15
+
+def test_seau_jetons_sous_domaines():
+    client = ClientHTTP(debits={'exemple.fr': (1.0, 1)})
+    assert client._seau('www.exemple.fr') is client._seau('exemple.fr')
+    assert client._seau('autre-exemple.fr') is None
+    seau = SeauJetons(10.0, 1)
+    assert seau.attendre() == 0.0
+    assert 0.05 < seau.attendre() <= 0.1
+
+def test_histogramme_latences(serveur):
+    client = ClientHTTP(debits={})
+    for _ in range(3):
+        client.get(serveur.url('/lente'))
+    client.get(serveur.url('/rapide'))
+    resume = client.statistiques()['127.0.0.1']
+    assert resume['requetes'] == 4
+    assert sum(resume['classes'].values()) == 4
+    # Les trois requêtes lentes (60 ms) sont dans la classe 50-100 ms
+    assert resume['classes']['<=100'] == 3
+    assert resume['classes']['<=50'] == 1
+    assert resume['p95_ms'] == 100
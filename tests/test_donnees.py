@@ -0,0 +1,89 @@
+"""
+Écritures dans les véhicules partagés par les sessions (voir utils.data) : chaque
+écriture s'applique, véhicule par véhicule, au DataFrame en cache et au stockage.
+"""
+import threading
+
+from utils import cache_scores
+from utils.cache_scores import obtenir_cache_scores
+from utils.data import ajouter_vehicule, ajouter_vehicules, charger_donnees, mettre_a_jour_vehicule, sauvegarder_donnees
+from utils.scoring import VERSION_SCORING
+from utils.stockage import obtenir_stockage
+
+def vehicule(numero):
+    return {
+        'Marque': 'Peugeot', 'Modele': str(numero), 'Annee': 2015, 'Prix': 9000 + numero,
+        'Consommation': 5.5, 'Cout_Assurance': 600, 'Equipements': 'GPS', 'Coup_de_Coeur': False
+    }
+
+def test_dataframe_perime_non_recopie(donnees_temporaires):
+    ajouter_vehicules(None, [vehicule(i) for i in range(3)])
+    # Deux sessions ont lu les véhicules ; la seconde garde une copie de la première lecture
+    df_session, _ = charger_donnees()
+    perime = df_session.copy()
+
+    ajouter_vehicule(df_session, vehicule(3))
+    mettre_a_jour_vehicule(df_session, 0, {'Prix': 1000})
+    # Écriture depuis le DataFrame périmé : les écritures de l'autre session sont conservées
+    mettre_a_jour_vehicule(perime, 1, {'Notes': 'vu'})
+
+    df, _ = charger_donnees()
+    assert len(df) == 4
+    assert df.at[0, 'Prix'] == 1000
+    assert df.at[1, 'Notes'] == 'vu'
+    assert df.at[1, 'Revision'] == 1
+    assert perime.at[1, 'Notes'] == 'vu'
+
+    stocke = obtenir_stockage().charger()
+    assert len(stocke) == 4
+    assert stocke.at[0, 'Prix'] == 1000
+
+def test_mises_a_jour_concurrentes(donnees_temporaires):
+    ajouter_vehicules(None, [vehicule(i) for i in range(4)])
+    df_initial, _ = charger_donnees()
+
+    def session(identifiant):
+        for _ in range(25):
+            # Chaque session travaille sur sa propre copie des véhicules
+            mettre_a_jour_vehicule(df_initial.copy(), identifiant, {'Coup_de_Coeur': True})
+
+    sessions = [threading.Thread(target=session, args=(identifiant,)) for identifiant in range(4)]
+    for fil in sessions:
+        fil.start()
+    for fil in sessions:
+        fil.join()
+
+    df, _ = charger_donnees()
+    assert df['Revision'].tolist() == [25] * 4
+    assert obtenir_stockage().charger()['Revision'].tolist() == [25] * 4
+
+CRITERES = {'budget_min': {'valeur': 5000, 'poids': 5}, 'budget_max': {'valeur': 10000, 'poids': 5}}
+
+def test_sauvegarde_complete_invalide_les_scores(donnees_temporaires):
+    ajouter_vehicules(None, [vehicule(i) for i in range(3)])
+    df, _ = charger_donnees()
+    cache = obtenir_cache_scores()
+    assert cache.scores(df, CRITERES).tolist() == [50.0] * 3
+
+    # Même identifiants et mêmes révisions, prix hors budget
+    remplace = df.copy()
+    remplace['Prix'] = 50000
+    sauvegarder_donnees(remplace)
+    df, _ = charger_donnees()
+    assert cache.scores(df, CRITERES).tolist() == [0.0] * 3
+
+def test_scores_d_une_autre_version_ignores(donnees_temporaires, monkeypatch):
+    ajouter_vehicules(None, [vehicule(0)])
+    df, _ = charger_donnees()
+    obtenir_cache_scores().scores(df, CRITERES)
+    chemin = obtenir_cache_scores().chemin
+
+    monkeypatch.setattr(cache_scores, 'VERSION_SCORING', VERSION_SCORING + 1)
+    calcules = []
+    nouveau = cache_scores.CacheScores(chemin)
+    # Les scores de la version précédente sont supprimés à l'ouverture
+    assert nouveau._connexion.execute("SELECT COUNT(*) FROM scores").fetchone()[0] == 0
+    original = cache_scores.calculer_scores_paralleles
+    monkeypatch.setattr(cache_scores, 'calculer_scores_paralleles', lambda *a: calcules.append(1) or original(*a))
+    assert nouveau.scores(df, CRITERES).tolist() == [50.0]
+    assert calcules
@@ -0,0 +1,27 @@
+"""
+Import en masse d'annonces (voir utils.import_annonces).
+"""
+from utils import import_annonces
+from utils.data import ajouter_vehicules, charger_donnees
+from utils.import_annonces import importer_annonces
+from utils.stockage import StockageSQLite
+
+def annonce(url):
+    return {'marque': 'Peugeot', 'modele': url.rsplit('/', 1)[-1], 'annee': 2016, 'prix': 8000}
+
+def test_import_pendant_un_autre_import(donnees_temporaires, monkeypatch):
+    monkeypatch.setattr(import_annonces, 'extraire_infos_annonce', annonce)
+    ajouter_vehicules(None, [{'Marque': 'Renault', 'Modele': 'Clio', 'Prix': 5000}])
+    df, _ = charger_donnees()
+
+    # Import en ligne de commande, dans un autre processus, sur la même base
+    autre_processus = StockageSQLite()
+    assert autre_processus.ajouter_lot([{'Marque': 'Audi', 'Modele': 'A3', 'Prix': 12000}]) == [1]
+
+    urls = ['https://www.leboncoin.fr/voitures/208', 'https://www.leboncoin.fr/voitures/308']
+    df, resultats = importer_annonces(df, urls)
+    assert [resultat['statut'] for resultat in resultats] == ['ajoutee', 'ajoutee']
+    # Les annonces prennent les identifiants suivants et le véhicule de l'autre import est relu
+    assert df['Modele'].tolist() == ['Clio', 'A3', '208', '308']
+    assert df.index.tolist() == [0, 1, 2, 3]
+    assert charger_donnees()[0] is df
@@ -0,0 +1,67 @@
+"""
+Recherche texte de la barre latérale (voir utils.recherche_texte) : correspondances
+exactes, fautes de frappe, recherches courtes et notes.
+"""
+import pandas as pd
+import pytest
+
+from utils.recherche_texte import (
+    PERTINENCE_APPROCHEE, PERTINENCE_EXACTE, PERTINENCE_NOTES, IndexTrigrammes, seuil_similarite
+)
+
+@pytest.fixture
+def index():
+    df = pd.DataFrame({
+        'Marque': ['Audi', 'Audi', 'Renault', 'BMW', 'Mercedes', 'Peugeot', 'Volkswagen'],
+        'Modele': ['A4', 'A3', 'Clio', 'Série 3', 'C200', '308', 'Golf'],
+        'Tags': [None, '', 'citadine', '', 'amg', None, 'gti'],
+        'Notes': ['', 'propre', 'à voir samedi', '', None, 'vendeur pressé, proche de la a4', '']
+    }, index=[10, 11, 12, 13, 14, 15, 16])
+    return IndexTrigrammes(df)
+
+def test_correspondances_exactes(index):
+    assert index.rechercher('Mercedes C200').to_dict() == {14: PERTINENCE_EXACTE}
+    assert index.rechercher('mercedes c 200').to_dict() == {14: PERTINENCE_EXACTE}
+    # Le dernier mot peut n'être qu'un début de mot
+    assert index.rechercher('golf g').to_dict() == {16: PERTINENCE_EXACTE}
+    assert index.rechercher('serie').to_dict() == {13: PERTINENCE_EXACTE}
+
+def test_recherche_courte(index):
+    # "a4" ne trouve ni l'A3 ni la Clio "à voir" ; la mention dans des notes passe après
+    resultats = index.rechercher('a4')
+    assert resultats.index.tolist() == [10, 15]
+    assert resultats.tolist() == [PERTINENCE_EXACTE, PERTINENCE_NOTES]
+    assert index.rechercher('clo').empty
+
+def test_fautes_de_frappe(index):
+    resultats = index.rechercher('peugot')
+    assert resultats.index.tolist() == [15]
+    assert 0 < resultats.iloc[0] < PERTINENCE_APPROCHEE
+    assert index.rechercher('renaul clio').index.tolist() == [12]
+    # Code de génération absent du véhicule : la marque suffit pour une recherche longue
+    assert index.rechercher('BMW E46').index.tolist() == [13]
+
+def test_exactes_avant_approchees(index):
+    resultats = index.rechercher('audi a3')
+    assert resultats.index[0] == 11
+    assert resultats.iloc[0] == PERTINENCE_EXACTE
+    assert (resultats.iloc[1:] < PERTINENCE_APPROCHEE + 1e-9).all()
+    assert resultats.is_monotonic_decreasing
+
+def test_notes_sans_correspondance_approchee(index):
+    # "voir" n'est que dans des notes : correspondance exacte seulement
+    assert index.rechercher('voir').to_dict() == {12: PERTINENCE_NOTES}
+    assert index.rechercher('voire samedy').empty
+
+def test_seuil_selon_longueur():
+    assert seuil_similarite(4) > seuil_similarite(9) >= seuil_similarite(30)
+
+def test_mise_a_jour_incrementale(index):
+    index.ajouter(20, {'Marque': 'Toyota', 'Modele': 'Yaris', 'Notes': None})
+    assert index.rechercher('yaris').index.tolist() == [20]
+    index.ajouter(20, {'Marque': 'Toyota', 'Modele': 'Corolla', 'Notes': None})
+    assert index.rechercher('yaris').empty
+    assert index.rechercher('corolla').index.tolist() == [20]
+    index.retirer(20)
+    assert index.rechercher('corolla').empty
+    assert len(index) == 7
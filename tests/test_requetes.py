@@ -0,0 +1,99 @@
+"""
+Moteur de requêtes des filtres (voir utils.requetes) : une requête affinée à partir
+d'un résultat en cache donne les mêmes véhicules qu'une évaluation complète.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from test_scoring import generer_flotte
+from utils.equipements import obtenir_vocabulaire
+from utils.requetes import Condition, MoteurRequetes, _affine, _implique, evaluer, normaliser_filtres
+
+EQUIPEMENTS = ['ABS', 'ESP', 'Airbags', 'Climatisation automatique', 'Extra Truc']
+
+@pytest.fixture(scope='module')
+def flotte():
+    df = generer_flotte(2000, graine=7)
+    generateur = np.random.default_rng(7)
+    df['Status'] = generateur.choice(['Nouveau', 'En attente', 'Vu', 'Écarté'], len(df))
+    df['Tags'] = generateur.choice(['', 'citadine', 'citadine, diesel', 'familiale, diesel'], len(df))
+    df['Equipements_Bits'], df['Equipements_Extras'] = obtenir_vocabulaire().encoder_serie(df['Equipements'])
+    # Identifiants non contigus
+    df.index = np.arange(len(df)) * 3 + 10
+    return df
+
+def scores_flotte(df):
+    scores = np.linspace(0, 100, len(df))
+    return lambda positions: scores[positions]
+
+def filtres_aleatoires(generateur, df):
+    """Filtres de la barre latérale tirés au hasard, chacun présent une fois sur deux."""
+    filtres = {}
+    if generateur.random() < 0.5:
+        filtres['marques'] = generateur.sample(sorted(df['Marque'].unique()), generateur.randint(1, 4))
+    if generateur.random() < 0.5:
+        filtres['status'] = generateur.sample(['Nouveau', 'En attente', 'Vu', 'Écarté'], generateur.randint(1, 3))
+    if generateur.random() < 0.5:
+        minimum = generateur.randint(1000, 30000)
+        filtres['prix_range'] = (minimum, minimum + generateur.randint(0, 20000))
+    if generateur.random() < 0.5:
+        filtres['annee_range'] = (generateur.randint(1995, 2010), generateur.randint(2010, 2025))
+    if generateur.random() < 0.5:
+        filtres['equipements'] = generateur.sample(EQUIPEMENTS, generateur.randint(1, 2))
+    if generateur.random() < 0.5:
+        filtres['tags'] = generateur.sample(['citadine', 'diesel'], 1)
+    if generateur.random() < 0.5:
+        filtres['score_range'] = (generateur.randint(0, 50), generateur.randint(50, 100))
+    return filtres
+
+def affiner(generateur, df, filtres):
+    """Filtres plus restrictifs : un filtre ajouté, une liste réduite ou un intervalle resserré."""
+    filtres = dict(filtres)
+    cle = generateur.choice(['marques', 'status', 'prix_range', 'annee_range', 'equipements', 'tags', 'score_range'])
+    valeur = filtres.get(cle)
+    if valeur is None:
+        ajout = filtres_aleatoires(random.Random(generateur.random()), df).get(cle)
+        if ajout is not None:
+            filtres[cle] = ajout
+    elif cle.endswith('_range'):
+        minimum, maximum = valeur
+        filtres[cle] = (minimum + (maximum - minimum) // 4, maximum - (maximum - minimum) // 4)
+    elif cle in ('equipements', 'tags'):
+        filtres[cle] = list(valeur) + generateur.sample(EQUIPEMENTS if cle == 'equipements' else ['citadine', 'diesel'], 1)
+    elif len(valeur) > 1:
+        filtres[cle] = valeur[:-1]
+    return filtres
+
+@pytest.mark.parametrize('graine', range(5))
+def test_affinage_identique_a_une_evaluation_complete(flotte, graine):
+    generateur = random.Random(graine)
+    moteur = MoteurRequetes()
+    scores = scores_flotte(flotte)
+    for _ in range(10):
+        filtres = filtres_aleatoires(generateur, flotte)
+        for _ in range(4):
+            requete = normaliser_filtres(filtres, 'criteres')
+            attendues = evaluer(flotte, requete, scores=scores)
+            assert np.array_equal(moteur.positions(flotte, requete, 0, scores), attendues)
+            filtres = affiner(generateur, flotte, filtres)
+    assert moteur.statistiques()['affinages'] > 0
+
+def test_implication_des_conditions():
+    assert _implique(Condition('Prix', 'entre', (5.0, 8.0)), Condition('Prix', 'entre', (1.0, 10.0)))
+    assert not _implique(Condition('Prix', 'entre', (0.0, 8.0)), Condition('Prix', 'entre', (1.0, 10.0)))
+    assert _implique(Condition('Marque', 'dans', ('Audi',)), Condition('Marque', 'dans', ('Audi', 'BMW')))
+    assert not _implique(Condition('Marque', 'dans', ('Audi', 'BMW')), Condition('Marque', 'dans', ('Audi',)))
+    assert _implique(Condition('Tags', 'tous', ('citadine', 'diesel')), Condition('Tags', 'tous', ('diesel',)))
+    # Recherche approchée : un texte plus long n'affine pas un texte plus court
+    assert not _implique(Condition('Marque/Modele', 'texte', 'peugeot 3'), Condition('Marque/Modele', 'texte', 'peugeot'))
+
+def test_affinage_et_filtre_de_score():
+    large = normaliser_filtres({'prix_range': (0, 10000), 'score_range': (0, 50)}, 'recherche A')
+    requete = normaliser_filtres({'prix_range': (0, 5000), 'score_range': (10, 50)}, 'recherche A')
+    assert _affine(requete, large)
+    # Les scores d'une autre recherche ne filtrent pas les mêmes véhicules
+    assert not _affine(normaliser_filtres({'prix_range': (0, 5000), 'score_range': (10, 50)}, 'recherche B'), large)
+    # Un filtre retiré élargit la requête
+    assert not _affine(normaliser_filtres({'prix_range': (0, 5000)}), large)
@@ -0,0 +1,404 @@
+"""
+Équivalence des chemins de calcul des scores (unitaire, vectorisé, top-k, index des
+équipements, contributions, multi-processus) avec le calcul d'origine, recopié
+ci-dessous tel qu'il était avant leur introduction.
+"""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.equipements import IndexEquipements, obtenir_vocabulaire
+from utils.scoring import (
+    ContributionsScoring, calculer_score_vehicule, calculer_scores_paralleles,
+    calculer_scores_vehicules, classer_vehicules, masque_obligatoires, meilleurs_scores
+)
+
+MARQUES = ['Audi', 'BMW', 'Peugeot', 'Renault', 'Toyota']
+
+def score_reference(vehicule, criteres):
+    """Calcul d'origine du score d'un véhicule, une ligne à la fois."""
+    score = 0
+    poids_total = sum(critere['poids'] for critere in criteres.values() if isinstance(critere, dict) and 'poids' in critere)
+
+    for nom, critere in criteres.items():
+        if isinstance(critere, dict) and critere.get('obligatoire', False):
+            if nom == 'budget_min' and vehicule['Prix'] < critere['valeur']:
+                return 0
+            elif nom == 'budget_max' and vehicule['Prix'] > critere['valeur']:
+                return 0
+            elif nom == 'annee_min' and vehicule['Annee'] < critere['valeur']:
+                return 0
+            elif nom == 'annee_max' and vehicule['Annee'] > critere['valeur']:
+                return 0
+            elif nom == 'marques' and critere['valeur'] and vehicule['Marque'] not in critere['valeur']:
+                return 0
+            elif nom == 'categories' and critere['valeur'] and vehicule.get('Categorie') not in critere['valeur']:
+                return 0
+            elif nom == 'motorisations' and critere['valeur'] and vehicule.get('Motorisation') not in critere['valeur']:
+                return 0
+            elif nom == 'puissance_min' and vehicule.get('Puissance', 0) < critere['valeur']:
+                return 0
+            elif nom == 'puissance_max' and vehicule.get('Puissance', 0) > critere['valeur']:
+                return 0
+            elif nom == 'transmissions' and critere['valeur'] and vehicule.get('Transmission') not in critere['valeur']:
+                return 0
+            elif nom == 'conso_max' and vehicule['Consommation'] > critere['valeur']:
+                return 0
+            elif nom == 'assurance_max' and vehicule['Cout_Assurance'] > critere['valeur']:
+                return 0
+            elif nom == 'type_vendeur' and critere['valeur'] and vehicule.get('Type_Vendeur') not in critere['valeur']:
+                return 0
+            elif nom == 'note_vendeur' and vehicule.get('Note_Vendeur', 0) < critere['valeur']:
+                return 0
+            elif nom == 'distance_max' and vehicule.get('Distance', 0) > critere['valeur']:
+                return 0
+
+    if 'budget_min' in criteres and 'budget_max' in criteres:
+        if criteres['budget_min']['valeur'] <= vehicule['Prix'] <= criteres['budget_max']['valeur']:
+            score += (criteres['budget_min']['poids'] + criteres['budget_max']['poids']) / 2
+        else:
+            if vehicule['Prix'] < criteres['budget_min']['valeur']:
+                ecart = (criteres['budget_min']['valeur'] - vehicule['Prix']) / criteres['budget_min']['valeur']
+                if ecart <= 0.2:
+                    score += (criteres['budget_min']['poids'] + criteres['budget_max']['poids']) / 2 * (1 - ecart)
+            else:
+                ecart = (vehicule['Prix'] - criteres['budget_max']['valeur']) / criteres['budget_max']['valeur']
+                if ecart <= 0.2:
+                    score += (criteres['budget_min']['poids'] + criteres['budget_max']['poids']) / 2 * (1 - ecart)
+
+    if 'annee_min' in criteres and 'annee_max' in criteres:
+        if criteres['annee_min']['valeur'] <= vehicule['Annee'] <= criteres['annee_max']['valeur']:
+            score += (criteres['annee_min']['poids'] + criteres['annee_max']['poids']) / 2
+        else:
+            if vehicule['Annee'] < criteres['annee_min']['valeur']:
+                diff = criteres['annee_min']['valeur'] - vehicule['Annee']
+                if diff <= 2:
+                    score += (criteres['annee_min']['poids'] + criteres['annee_max']['poids']) / 2 * (1 - diff/2)
+            else:
+                diff = vehicule['Annee'] - criteres['annee_max']['valeur']
+                if diff <= 2:
+                    score += (criteres['annee_min']['poids'] + criteres['annee_max']['poids']) / 2 * (1 - diff/2)
+
+    if 'marques' in criteres and criteres['marques']['valeur']:
+        if vehicule['Marque'] in criteres['marques']['valeur']:
+            score += criteres['marques']['poids']
+
+    if 'categories' in criteres and criteres['categories']['valeur']:
+        if vehicule.get('Categorie') in criteres['categories']['valeur']:
+            score += criteres['categories']['poids']
+
+    if 'motorisations' in criteres and criteres['motorisations']['valeur']:
+        if vehicule.get('Motorisation') in criteres['motorisations']['valeur']:
+            score += criteres['motorisations']['poids']
+
+    if 'puissance_min' in criteres and 'puissance_max' in criteres and vehicule.get('Puissance'):
+        if criteres['puissance_min']['valeur'] <= vehicule['Puissance'] <= criteres['puissance_max']['valeur']:
+            score += (criteres['puissance_min']['poids'] + criteres['puissance_max']['poids']) / 2
+
+    if 'transmissions' in criteres and criteres['transmissions']['valeur']:
+        if vehicule.get('Transmission') in criteres['transmissions']['valeur']:
+            score += criteres['transmissions']['poids']
+
+    if 'conso_max' in criteres:
+        if vehicule['Consommation'] <= criteres['conso_max']['valeur']:
+            score += criteres['conso_max']['poids']
+        else:
+            depassement = (vehicule['Consommation'] - criteres['conso_max']['valeur']) / criteres['conso_max']['valeur']
+            if depassement <= 0.2:
+                score += criteres['conso_max']['poids'] * (1 - depassement)
+
+    if 'assurance_max' in criteres:
+        if vehicule['Cout_Assurance'] <= criteres['assurance_max']['valeur']:
+            score += criteres['assurance_max']['poids']
+        else:
+            depassement = (vehicule['Cout_Assurance'] - criteres['assurance_max']['valeur']) / criteres['assurance_max']['valeur']
+            if depassement <= 0.2:
+                score += criteres['assurance_max']['poids'] * (1 - depassement)
+
+    if 'type_vendeur' in criteres and criteres['type_vendeur']['valeur']:
+        if vehicule.get('Type_Vendeur') in criteres['type_vendeur']['valeur']:
+            score += criteres['type_vendeur']['poids']
+
+    if 'note_vendeur' in criteres and vehicule.get('Note_Vendeur'):
+        if vehicule['Note_Vendeur'] >= criteres['note_vendeur']['valeur']:
+            score += criteres['note_vendeur']['poids']
+        else:
+            diff = criteres['note_vendeur']['valeur'] - vehicule['Note_Vendeur']
+            if diff <= 1:
+                score += criteres['note_vendeur']['poids'] * (1 - diff)
+
+    if 'distance_max' in criteres and vehicule.get('Distance'):
+        if vehicule['Distance'] <= criteres['distance_max']['valeur']:
+            score += criteres['distance_max']['poids']
+        else:
+            depassement = (vehicule['Distance'] - criteres['distance_max']['valeur']) / criteres['distance_max']['valeur']
+            if depassement <= 0.2:
+                score += criteres['distance_max']['poids'] * (1 - depassement)
+
+    equips_vehicule = set(map(str.strip, vehicule['Equipements'].lower().split(',')))
+    for categorie in ['securite', 'confort', 'multimedia', 'exterieur', 'pratique']:
+        critere_key = f'equipements_{categorie}'
+        if critere_key in criteres and criteres[critere_key]['valeur']:
+            score_equipements = 0
+            poids_total_equipements = 0
+            for equip, config in criteres[critere_key]['poids_individuels'].items():
+                if config.get('obligatoire', False) and equip.lower() not in equips_vehicule:
+                    return 0
+            for equip, config in criteres[critere_key]['poids_individuels'].items():
+                if not config.get('obligatoire', False):
+                    poids = config['poids']
+                    poids_total_equipements += poids
+                    if equip.lower() in equips_vehicule:
+                        score_equipements += poids
+            if poids_total_equipements > 0:
+                score += (score_equipements / poids_total_equipements) * 2
+
+    score_final = (score / poids_total) * 100
+    if vehicule.get('Coup_de_Coeur', False):
+        score_final = min(100, score_final * 1.1)
+    return round(score_final, 1)
+
+def generer_flotte(n, graine=0):
+    """
+    Flotte aléatoire avec des valeurs manquantes (NaN, None), des équipements hors
+    vocabulaire et des identifiants non contigus.
+    """
+    generateur = np.random.default_rng(graine)
+    vocabulaire = list(pd.read_csv('data/equipements.csv')['equipement'])
+
+    def manquants(valeurs, proportion=0.05):
+        valeurs = valeurs.astype(float)
+        valeurs[generateur.random(n) < proportion] = np.nan
+        return valeurs
+
+    equipements = [
+        ', '.join(generateur.choice(vocabulaire + ['Extra Truc', ' toit ouvrant '], size=generateur.integers(0, 8), replace=False))
+        for _ in range(n)
+    ]
+    return pd.DataFrame({
+        'Marque': generateur.choice(MARQUES, n),
+        'Modele': 'X',
+        'Prix': manquants(generateur.integers(1000, 40000, n)),
+        'Annee': generateur.integers(1995, 2025, n),
+        'Consommation': manquants(np.round(generateur.uniform(3, 14, n), 1)),
+        'Cout_Assurance': generateur.integers(200, 2000, n),
+        'Puissance': manquants(generateur.choice([0, 90, 110, 150, 200, 320], n)),
+        'Transmission': generateur.choice(['Manuelle', 'Automatique', None], n),
+        'Categorie': generateur.choice(['Berline', 'SUV', 'Compacte'], n),
+        'Motorisation': generateur.choice(['Essence', 'Diesel', 'Hybride'], n),
+        'Type_Vendeur': generateur.choice(['Particulier', 'Professionnel'], n),
+        'Note_Vendeur': manquants(generateur.choice([0, 3.0, 3.5, 4.2, 5.0], n)),
+        'Distance': manquants(generateur.choice([0, 20, 90, 110, 130, 400], n)),
+        'Equipements': equipements,
+        'Coup_de_Coeur': generateur.choice(np.array([True, False, np.nan, None], dtype=object), n, p=[.2, .6, .1, .1])
+    }, index=np.arange(n) * 2 + 5)
+
+def generer_criteres(graine, poids_entiers=True):
+    """Critères aléatoires : critères obligatoires, équipements obligatoires et pondérés, critères absents."""
+    generateur = random.Random(graine)
+    vocabulaire = list(pd.read_csv('data/equipements.csv')['equipement'])
+
+    def poids():
+        return generateur.randint(0, 10) if poids_entiers else round(generateur.uniform(0, 10), 2)
+
+    def critere(valeur):
+        return {'valeur': valeur, 'poids': poids(), 'obligatoire': generateur.random() < 0.25}
+
+    criteres = {
+        'budget_min': critere(generateur.choice([0, 5000, 8000])),
+        'budget_max': critere(generateur.choice([15000, 20000])),
+        'annee_min': critere(generateur.randint(2000, 2015)),
+        'annee_max': critere(generateur.randint(2015, 2024)),
+        'marques': critere(generateur.sample(MARQUES, generateur.randint(0, 3))),
+        'categories': critere(generateur.sample(['Berline', 'SUV'], generateur.randint(0, 2))),
+        'motorisations': critere(generateur.sample(['Essence', 'Diesel'], generateur.randint(0, 2))),
+        'puissance_min': critere(100),
+        'puissance_max': critere(250),
+        'transmissions': critere(generateur.sample(['Manuelle', 'Automatique'], generateur.randint(0, 1))),
+        'conso_max': critere(generateur.choice([6.0, 8.0])),
+        'assurance_max': critere(1000),
+        'type_vendeur': critere(['Professionnel'] if generateur.random() < .5 else []),
+        'note_vendeur': critere(4.0),
+        'distance_max': critere(100)
+    }
+    for categorie in ['confort', 'pratique', 'securite']:
+        choisis = generateur.sample(vocabulaire + ['Extra Truc'], 3)
+        individuels = {
+            equip if generateur.random() < .7 else equip.upper(): {'poids': poids(), 'obligatoire': generateur.random() < 0.1}
+            for equip in choisis
+        }
+        criteres[f'equipements_{categorie}'] = {'valeur': list(individuels), 'poids_individuels': individuels}
+    for nom in list(criteres):
+        if generateur.random() < 0.1:
+            del criteres[nom]
+    if not any(isinstance(c, dict) and c.get('poids') for c in criteres.values()):
+        criteres['conso_max'] = {'valeur': 8.0, 'poids': 5}
+    return criteres
+
+@pytest.fixture(scope='module')
+def flotte():
+    df = generer_flotte(1500)
+    # Colonnes dérivées calculées au chargement de l'application
+    df['Equipements_Bits'], df['Equipements_Extras'] = obtenir_vocabulaire().encoder_serie(df['Equipements'])
+    return df
+
+def scores_reference(df, criteres):
+    return np.array([score_reference(vehicule, criteres) for vehicule in df.to_dict('records')])
+
+@pytest.mark.parametrize('graine', range(12))
+@pytest.mark.parametrize('poids_entiers', [True, False])
+def test_scores_vectorises_identiques(flotte, graine, poids_entiers):
+    criteres = generer_criteres(graine, poids_entiers)
+    attendus = scores_reference(flotte, criteres)
+    assert (calculer_scores_vehicules(flotte, criteres).to_numpy() == attendus).all()
+
+@pytest.mark.parametrize('graine', range(4))
+def test_score_unitaire_identique(flotte, graine):
+    criteres = generer_criteres(graine)
+    echantillon = flotte.iloc[:300]
+    attendus = scores_reference(echantillon, criteres)
+    obtenus = [calculer_score_vehicule(vehicule, criteres) for _, vehicule in echantillon.iterrows()]
+    assert obtenus == attendus.tolist()
+
+def test_sans_colonnes_derivees(flotte):
+    # Équipements encodés depuis le texte quand le DataFrame n'a pas de masques
+    criteres = generer_criteres(3)
+    df = flotte.drop(columns=['Equipements_Bits', 'Equipements_Extras'])
+    assert (calculer_scores_vehicules(df, criteres).to_numpy() == scores_reference(df, criteres)).all()
+
+def test_valeurs_manquantes():
+    df = pd.DataFrame({
+        'Marque': ['Audi', 'BMW', 'Audi'],
+        'Prix': [np.nan, 12000.0, 12000.0],
+        'Annee': [2018, 2018, 2018],
+        'Consommation': [6.0, np.nan, 6.0],
+        'Cout_Assurance': [800, 800, 800],
+        'Puissance': [np.nan, 150.0, 0.0],
+        'Transmission': [None, 'Manuelle', np.nan],
+        'Categorie': [None, 'SUV', 'SUV'],
+        'Note_Vendeur': [np.nan, 4.5, 0.0],
+        'Distance': [np.nan, 50.0, 0.0],
+        'Equipements': ['', 'GPS', 'gps, Extra Truc'],
+        'Coup_de_Coeur': [None, np.nan, True]
+    }, index=[3, 8, 9])
+    criteres = {
+        'budget_min': {'valeur': 5000, 'poids': 3, 'obligatoire': True},
+        'budget_max': {'valeur': 20000, 'poids': 3},
+        'puissance_min': {'valeur': 100, 'poids': 2},
+        'puissance_max': {'valeur': 200, 'poids': 2},
+        'transmissions': {'valeur': ['Manuelle'], 'poids': 4},
+        'categories': {'valeur': ['SUV'], 'poids': 1},
+        'conso_max': {'valeur': 7.0, 'poids': 2},
+        'note_vendeur': {'valeur': 4.0, 'poids': 1},
+        'distance_max': {'valeur': 100, 'poids': 1},
+        'equipements_confort': {'valeur': ['GPS', 'Extra Truc'], 'poids_individuels': {
+            'GPS': {'poids': 2}, 'Extra Truc': {'poids': 1}
+        }}
+    }
+    attendus = scores_reference(df, criteres)
+    assert (calculer_scores_vehicules(df, criteres).to_numpy() == attendus).all()
+    assert [calculer_score_vehicule(vehicule, criteres) for _, vehicule in df.iterrows()] == attendus.tolist()
+
+@pytest.mark.parametrize('graine', range(6))
+def test_criteres_obligatoires(flotte, graine):
+    criteres = generer_criteres(graine)
+    attendus = scores_reference(flotte, criteres)
+    survivants = masque_obligatoires(flotte, criteres)
+    # Un véhicule exclu par les critères obligatoires a un score nul
+    assert (attendus[~survivants] == 0).all()
+
+    index = IndexEquipements(obtenir_vocabulaire(), flotte.index, flotte['Equipements_Bits'])
+    assert (masque_obligatoires(flotte, criteres, index) == survivants).all()
+    assert (calculer_scores_vehicules(flotte, criteres, index).to_numpy() == attendus).all()
+
+def test_equipement_obligatoire_par_index(flotte):
+    criteres = {
+        'conso_max': {'valeur': 8.0, 'poids': 2},
+        'equipements_securite': {'valeur': ['ABS', 'ESP'], 'poids_individuels': {
+            'ABS': {'obligatoire': True}, 'ESP': {'poids': 3}
+        }}
+    }
+    index = IndexEquipements(obtenir_vocabulaire(), flotte.index, flotte['Equipements_Bits'])
+    attendus = scores_reference(flotte, criteres)
+    assert (calculer_scores_vehicules(flotte, criteres, index).to_numpy() == attendus).all()
+    assert (attendus > 0).any() and (attendus == 0).any()
+
+@pytest.mark.parametrize('graine', range(4))
+def test_meilleurs_vehicules(flotte, graine):
+    criteres = generer_criteres(graine)
+    attendus = pd.Series(scores_reference(flotte, criteres), index=flotte.index)
+    # Tri stable : à score égal, l'ordre de la flotte est conservé
+    ordre = attendus.sort_values(ascending=False, kind='stable')
+    assert meilleurs_scores(attendus, 25).index.tolist() == ordre.index[:25].tolist()
+
+    # Classement limité aux véhicules qui respectent les critères obligatoires
+    survivants = attendus[masque_obligatoires(flotte, criteres)]
+    ordre = survivants.sort_values(ascending=False, kind='stable')[:25]
+    classement = classer_vehicules(flotte, criteres, 25)
+    assert classement.index.tolist() == ordre.index.tolist()
+    assert classement.tolist() == ordre.tolist()
+
+def test_contributions_changement_de_poids(flotte):
+    criteres = generer_criteres(5)
+    contributions = ContributionsScoring(flotte, criteres)
+    for graine in range(3):
+        generateur = random.Random(graine)
+        nouveaux = {
+            nom: dict(critere, poids=generateur.randint(1, 10)) if isinstance(critere, dict) and 'poids' in critere else critere
+            for nom, critere in criteres.items()
+        }
+        assert (contributions.scores(nouveaux).to_numpy() == scores_reference(flotte, nouveaux)).all()
+
+    # Un changement de structure (valeur d'un critère) impose un nouveau calcul
+    autres = dict(criteres, conso_max={'valeur': 5.0, 'poids': 3})
+    with pytest.raises(ValueError):
+        contributions.scores(autres)
+
+def test_contributions_poids_des_equipements(flotte):
+    def reponderer(criteres, poids):
+        return {
+            nom: dict(critere, poids_individuels={
+                equip: dict(config, poids=poids()) for equip, config in critere['poids_individuels'].items()
+            }) if nom.startswith('equipements_') else critere
+            for nom, critere in criteres.items()
+        }
+
+    generateur = random.Random(0)
+    criteres = reponderer(generer_criteres(7), lambda: generateur.randint(1, 10))
+    contributions = ContributionsScoring(flotte, criteres)
+    assert contributions.presences
+    for poids in (lambda: generateur.randint(1, 10), lambda: round(generateur.uniform(0.1, 10), 2)):
+        nouveaux = reponderer(criteres, poids)
+        assert (contributions.scores(nouveaux).to_numpy() == scores_reference(flotte, nouveaux)).all()
+    assert (contributions.scores(criteres).to_numpy() == scores_reference(flotte, criteres)).all()
+
+    # Tous les poids d'une catégorie à zéro retirent son terme du score
+    with pytest.raises(ValueError):
+        contributions.scores(reponderer(criteres, lambda: 0))
+
+def test_contributions_actualisees_par_revision():
+    df = generer_flotte(400, graine=3)
+    df['Revision'] = 0
+    criteres = generer_criteres(2)
+    contributions = ContributionsScoring(df, criteres)
+
+    # Véhicules modifiés en place, révision incrémentée : seules leurs lignes changent
+    modifies = df.index[[0, 17, 250]]
+    df.loc[modifies, 'Prix'] = [1500.0, 39000.0, np.nan]
+    df.loc[modifies, 'Equipements'] = ['GPS, Climatisation', '', 'Toit ouvrant']
+    df.loc[modifies, 'Revision'] += 1
+    assert contributions.actualiser(df)
+    assert (contributions.scores(criteres).to_numpy() == scores_reference(df, criteres)).all()
+
+    # Un autre DataFrame impose une reconstruction
+    assert not contributions.actualiser(df.copy())
+
+@pytest.mark.parametrize('graine', range(3))
+def test_calcul_parallele(flotte, graine):
+    criteres = generer_criteres(graine)
+    attendus = scores_reference(flotte, criteres)
+    scores = calculer_scores_paralleles(flotte, criteres, processus=2, taille_bloc=400, seuil=0)
+    assert scores.index.equals(flotte.index)
+    assert (scores.to_numpy() == attendus).all()
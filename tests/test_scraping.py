@@ -0,0 +1,20 @@
+"""
+Extraction des annonces (voir utils.scraping).
+"""
+import logging
+
+from utils import scraping
+from utils.scraping import extraire_infos_annonce
+
+def test_erreur_d_extraction_journalisee(monkeypatch, caplog, capsys):
+    def page_illisible(url, site, entetes):
+        raise AttributeError("'NoneType' object has no attribute 'text'")
+    monkeypatch.setattr(scraping, '_recuperer', page_illisible)
+
+    with caplog.at_level(logging.WARNING, logger='utils.scraping'):
+        assert extraire_infos_annonce('https://www.autoscout24.fr/offres/x', cache=False) is None
+
+    [trace] = caplog.records
+    assert 'https://www.autoscout24.fr/offres/x' in trace.getMessage()
+    assert trace.exc_info is not None
+    assert capsys.readouterr().out == ''
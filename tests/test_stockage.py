@@ -0,0 +1,119 @@
+"""
+Moteurs de stockage des véhicules (voir utils.stockage).
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from utils import stockage as module_stockage
+from utils.stockage import StockageJournalise, StockageJSON, StockageSQLite
+
+def enregistrement(numero):
+    return {'Marque': 'Renault', 'Modele': 'Clio', 'Prix': 5000 + numero}
+
+def test_identifiants_attribues_par_la_base(tmp_path):
+    chemin = str(tmp_path / 'vehicules.db')
+    # Deux connexions à la même base, comme l'application et l'import en ligne de commande
+    connexions = [StockageSQLite(chemin, None), StockageSQLite(chemin, None)]
+    attribues = []
+
+    def importer(stockage):
+        for numero in range(20):
+            attribues.extend(stockage.ajouter_lot([enregistrement(numero), enregistrement(numero)]))
+
+    fils = [threading.Thread(target=importer, args=(stockage,)) for stockage in connexions]
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+
+    assert sorted(attribues) == list(range(80))
+    assert connexions[0].charger().index.tolist() == list(range(80))
+
+def test_identifiants_json(tmp_path):
+    stockage = StockageJSON(str(tmp_path / 'vehicules.json'))
+    assert stockage.ajouter_lot([enregistrement(0)]) == [0]
+    assert stockage.ajouter_lot([enregistrement(1), enregistrement(2)]) == [1, 2]
+    assert stockage.charger()['Prix'].tolist() == [5000, 5001, 5002]
+
+def journalise(tmp_path, delai=3600):
+    """Journal devant une base SQLite ; le délai par défaut tient le thread de compaction à l'écart."""
+    principal = StockageSQLite(str(tmp_path / 'vehicules.db'), None)
+    principal.ajouter_lot([enregistrement(0), enregistrement(1)])
+    return StockageJournalise(principal, delai=delai)
+
+def test_journal_rejoue_apres_arret_brutal(tmp_path):
+    stockage = journalise(tmp_path)
+    stockage.mettre_a_jour(0, {'Prix': 100})
+    stockage.mettre_a_jour(1, {'Notes': 'vu'})
+    stockage.mettre_a_jour(0, {'Prix': 200})
+    stockage._fermer_fichier()
+    # Arrêt pendant l'écriture d'une ligne : la ligne tronquée est ignorée
+    with open(stockage.chemin, 'a', encoding='utf-8') as f:
+        f.write('{"id": 1, "champs": {"Pri')
+
+    # Redémarrage sans compaction : le journal est rejoué sur l'instantané
+    relance = StockageJournalise(StockageSQLite(str(tmp_path / 'vehicules.db'), None), delai=3600)
+    df = relance.charger()
+    assert df['Prix'].tolist() == [200, 5001]
+    assert df.at[1, 'Notes'] == 'vu'
+    assert relance.stockage.charger()['Prix'].tolist() == [5000, 5001]
+
+    relance.compacter()
+    assert relance.stockage.charger()['Prix'].tolist() == [200, 5001]
+    assert not os.path.exists(relance.chemin)
+
+def test_reprise_apres_compaction_en_echec(tmp_path, monkeypatch):
+    stockage = journalise(tmp_path)
+    stockage.mettre_a_jour(0, {'Prix': 100})
+
+    original = stockage.stockage.mettre_a_jour_lot
+    def base_verrouillee(modifications):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(stockage.stockage, 'mettre_a_jour_lot', base_verrouillee)
+    try:
+        stockage.compacter()
+    except sqlite3.OperationalError:
+        pass
+    assert os.path.exists(stockage.chemin_compaction)
+
+    # Écriture pendant la panne : elle part dans un nouveau journal courant
+    stockage.mettre_a_jour(1, {'Prix': 300})
+    assert stockage.charger()['Prix'].tolist() == [100, 300]
+
+    monkeypatch.setattr(stockage.stockage, 'mettre_a_jour_lot', original)
+    stockage.compacter()
+    # Le journal renommé et le journal courant sont reportés dans la même passe
+    assert stockage.stockage.charger()['Prix'].tolist() == [100, 300]
+    assert stockage.statistiques()['taille_journal'] == 0
+
+def test_attente_croissante_puis_retablissement(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(module_stockage, 'ATTENTE_ECHEC_INITIALE', 0.01)
+    stockage = journalise(tmp_path, delai=0.01)
+
+    original = stockage.stockage.mettre_a_jour_lot
+    appels = []
+    def instable(modifications):
+        appels.append(time.monotonic())
+        if len(appels) <= 3:
+            raise sqlite3.OperationalError("database is locked")
+        original(modifications)
+    monkeypatch.setattr(stockage.stockage, 'mettre_a_jour_lot', instable)
+
+    with caplog.at_level(logging.INFO, logger='utils.stockage'):
+        stockage.mettre_a_jour(0, {'Prix': 100})
+        limite = time.monotonic() + 10
+        while (len(appels) < 4 or stockage.echecs) and time.monotonic() < limite:
+            time.sleep(0.01)
+
+    assert len(appels) == 4
+    # Attentes de 10, 20 puis 40 ms (plus le délai de regroupement) entre les essais
+    ecarts = [apres - avant for avant, apres in zip(appels, appels[1:])]
+    assert ecarts[0] >= 0.01 and ecarts[1] >= 0.02 and ecarts[2] >= 0.04
+    assert stockage.statistiques() == {'taille_journal': 0, 'echecs': 0, 'erreur': None}
+    assert stockage.stockage.charger().at[0, 'Prix'] == 100
+    messages = [trace.getMessage() for trace in caplog.records]
+    assert any('(3 fois)' in message for message in messages)
+    assert any('rétablie après 3 échec(s)' in message for message in messages)
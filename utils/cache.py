@@ -0,0 +1,92 @@
+import os
+import threading
+
+def signature_fichiers(chemins):
+    """
+    Retourne la signature (date de modification, taille) d'une liste de fichiers.
+    Un fichier absent a une signature vide.
+    """
+    signature = []
+    for chemin in chemins:
+        try:
+            infos = os.stat(chemin)
+            signature.append((chemin, infos.st_mtime_ns, infos.st_size))
+        except FileNotFoundError:
+            signature.append((chemin, None, None))
+    return tuple(signature)
+
+class CacheFichiers:
+    """
+    Cache partagé par toutes les sessions du processus, pour des objets
+    chargés depuis des fichiers. Une entrée n'est rechargée que si la date de
+    modification ou la taille d'un de ses fichiers a changé.
+    """
+    def __init__(self):
+        self._entrees = {}
+        self._compteurs = {}
+        self._verrou = threading.RLock()
+
+    def obtenir(self, cle, chemins, chargeur):
+        """
+        Retourne l'objet en cache pour cette clé, ou le (re)charge avec chargeur()
+        si les fichiers ont changé depuis le dernier chargement.
+        """
+        with self._verrou:
+            compteurs = self._compteurs.setdefault(cle, {'hits': 0, 'misses': 0})
+            signature = signature_fichiers(chemins)
+            entree = self._entrees.get(cle)
+            if entree is not None and entree[0] == signature:
+                compteurs['hits'] += 1
+                return entree[1]
+
+            compteurs['misses'] += 1
+            valeur = chargeur()
+            self._entrees[cle] = (signature, valeur)
+            return valeur
+
+    def mettre_a_jour(self, cle, chemins, valeur):
+        """
+        Remplace l'objet en cache après une écriture faite par l'application,
+        et enregistre la nouvelle signature des fichiers.
+        """
+        with self._verrou:
+            self._entrees[cle] = (signature_fichiers(chemins), valeur)
+
+    def valeur(self, cle):
+        """
+        Retourne l'objet en cache pour cette clé, même si ses fichiers ont changé
+        depuis (pour le mettre à jour après une écriture), ou None.
+        """
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            return None if entree is None else entree[1]
+
+    def invalider(self, cle):
+        """Oublie l'objet en cache pour cette clé : il sera rechargé au prochain accès."""
+        with self._verrou:
+            self._entrees.pop(cle, None)
+
+    def resigner(self, cle, chemins):
+        """
+        Enregistre la nouvelle signature des fichiers d'une entrée dont le contenu
+        en mémoire est resté à jour (objet modifié en place, compaction...).
+        """
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                self._entrees[cle] = (signature_fichiers(chemins), entree[1])
+
+    def statistiques(self):
+        """
+        Retourne, pour chaque clé, le nombre de hits et de misses et le taux de hits.
+        """
+        with self._verrou:
+            statistiques = {}
+            for cle, compteurs in self._compteurs.items():
+                total = compteurs['hits'] + compteurs['misses']
+                statistiques[cle] = {
+                    'hits': compteurs['hits'],
+                    'misses': compteurs['misses'],
+                    'taux': compteurs['hits'] / total if total else 0.0
+                }
+            return statistiques
@@ -0,0 +1,198 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from utils.stockage import obtenir_stockage
+
+# Durée pendant laquelle une annonce extraite est servie sans contacter le site (secondes)
+DUREE_ANNONCES = 24 * 3600
+# Durée pendant laquelle une annonce dont l'extraction a échoué n'est pas retéléchargée (secondes)
+DUREE_ECHEC = 300
+
+# Paramètres d'URL sans effet sur l'annonce (suivi des campagnes, provenance du clic)
+PARAMETRES_IGNORES = {'gclid', 'fbclid', 'xtor', 'ref', 'source'}
+
+def normaliser_url(url):
+    """
+    Retourne la forme canonique d'une URL d'annonce, pour que ses variantes
+    (majuscules dans le domaine, fragment, paramètres de suivi, ordre des
+    paramètres, barre finale) désignent la même entrée du cache.
+    """
+    parties = urlsplit(url.strip())
+    parametres = sorted(
+        (nom, valeur) for nom, valeur in parse_qsl(parties.query, keep_blank_values=True)
+        if nom.lower() not in PARAMETRES_IGNORES and not nom.lower().startswith('utm_')
+    )
+    chemin = parties.path.rstrip('/') or '/'
+    return urlunsplit((parties.scheme.lower(), parties.netloc.lower(), chemin, urlencode(parametres), ''))
+
+class CacheAnnonces:
+    """
+    Cache persistant des informations extraites des annonces, indexé par URL
+    normalisée. Une extraction de moins de duree secondes est servie telle quelle ;
+    au-delà, la page est redemandée sous condition (ETag, Last-Modified) et
+    l'extraction n'est refaite que si le site indique que la page a changé.
+
+    Une URL dont l'extraction a échoué (page d'erreur, page illisible, site
+    injoignable) n'est pas retéléchargée avant duree_echec secondes. Ces échecs
+    ne sont gardés qu'en mémoire : un redémarrage réessaie toutes les URL.
+    """
+    def __init__(self, chemin, duree=DUREE_ANNONCES, taille_memoire=256, duree_echec=DUREE_ECHEC):
+        self.chemin = chemin
+        self.duree = duree
+        self.taille_memoire = taille_memoire
+        self.duree_echec = duree_echec
+        self._verrou = threading.Lock()
+        self._memoire = {}
+        # URL normalisée → date du dernier échec d'extraction
+        self._echecs = {}
+        self._compteurs = {'hits': 0, 'revalidations': 0, 'misses': 0, 'echecs': 0}
+        os.makedirs(os.path.dirname(chemin) or '.', exist_ok=True)
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False)
+        with self._connexion:
+            self._connexion.execute("""
+                CREATE TABLE IF NOT EXISTS annonces (
+                    url TEXT PRIMARY KEY,
+                    infos TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    date REAL NOT NULL
+                )
+            """)
+
+    def _lire(self, cle):
+        """Retourne l'entrée (infos, etag, last_modified, date) d'une URL normalisée, ou None."""
+        entree = self._memoire.get(cle)
+        if entree is None:
+            ligne = self._connexion.execute(
+                "SELECT infos, etag, last_modified, date FROM annonces WHERE url = ?", (cle,)
+            ).fetchone()
+            if ligne is None:
+                return None
+            entree = (json.loads(ligne[0]),) + tuple(ligne[1:])
+            self._memoriser(cle, entree)
+        return entree
+
+    def _memoriser(self, cle, entree):
+        self._memoire.pop(cle, None)
+        self._memoire[cle] = entree
+        if len(self._memoire) > self.taille_memoire:
+            self._memoire.pop(next(iter(self._memoire)))
+
+    def _enregistrer(self, cle, infos, etag, last_modified, date):
+        with self._verrou:
+            self._memoriser(cle, (infos, etag, last_modified, date))
+            with self._connexion:
+                self._connexion.execute(
+                    "INSERT OR REPLACE INTO annonces (url, infos, etag, last_modified, date) VALUES (?, ?, ?, ?, ?)",
+                    (cle, json.dumps(infos, ensure_ascii=False), etag, last_modified, date)
+                )
+
+    def _noter_echec(self, cle):
+        maintenant = time.time()
+        with self._verrou:
+            self._echecs.pop(cle, None)
+            self._echecs[cle] = maintenant
+            # Les échecs sont notés par date croissante : les plus anciens expirent en premier
+            while self._echecs and maintenant - next(iter(self._echecs.values())) >= self.duree_echec:
+                self._echecs.pop(next(iter(self._echecs)))
+
+    def obtenir(self, url, recuperer):
+        """
+        Retourne les informations extraites de l'annonce à cette URL.
+        recuperer(entetes) télécharge et analyse la page, les entêtes donnés rendant
+        la requête conditionnelle, et retourne (non_modifiee, infos, etag, last_modified) :
+        non_modifiee si le site a répondu 304, infos None si l'extraction a échoué.
+        Un échec (infos None ou exception de recuperer) est retenu duree_echec
+        secondes, pendant lesquelles obtenir retourne None sans rien télécharger.
+        """
+        cle = normaliser_url(url)
+        with self._verrou:
+            echec = self._echecs.get(cle)
+            if echec is not None and time.time() - echec < self.duree_echec:
+                self._compteurs['echecs'] += 1
+                return None
+            entree = self._lire(cle)
+            if entree is not None and time.time() - entree[3] < self.duree:
+                self._compteurs['hits'] += 1
+                return dict(entree[0], url=url)
+
+        entetes = {}
+        if entree is not None:
+            if entree[1]:
+                entetes['If-None-Match'] = entree[1]
+            if entree[2]:
+                entetes['If-Modified-Since'] = entree[2]
+        try:
+            non_modifiee, infos, etag, last_modified = recuperer(entetes)
+        except Exception:
+            self._noter_echec(cle)
+            raise
+
+        if non_modifiee and entree is not None:
+            with self._verrou:
+                self._compteurs['revalidations'] += 1
+            self._enregistrer(cle, entree[0], etag or entree[1], last_modified or entree[2], time.time())
+            return dict(entree[0], url=url)
+
+        with self._verrou:
+            self._compteurs['misses'] += 1
+        if infos is None:
+            self._noter_echec(cle)
+        else:
+            self._enregistrer(cle, infos, etag, last_modified, time.time())
+            with self._verrou:
+                self._echecs.pop(cle, None)
+        return infos
+
+    def invalider(self, url):
+        """Oublie l'extraction d'une annonce : elle sera refaite à la prochaine demande."""
+        cle = normaliser_url(url)
+        with self._verrou:
+            self._memoire.pop(cle, None)
+            self._echecs.pop(cle, None)
+            with self._connexion:
+                self._connexion.execute("DELETE FROM annonces WHERE url = ?", (cle,))
+
+    def statistiques(self):
+        """
+        Retourne les compteurs d'annonces servies par le cache (hits, y compris
+        les revalidations auprès du site) ou téléchargées (misses), et celui des
+        demandes écartées sans téléchargement après un échec récent (echecs).
+        """
+        with self._verrou:
+            statistiques = dict(self._compteurs)
+        statistiques['hits'] += statistiques['revalidations']
+        total = statistiques['hits'] + statistiques['misses']
+        statistiques['taux'] = statistiques['hits'] / total if total else 0.0
+        return statistiques
+
+    def fermer(self):
+        """Ferme la base du cache ; il n'est plus utilisable ensuite."""
+        with self._verrou:
+            self._connexion.close()
+
+_cache_annonces = None
+
+def obtenir_cache_annonces():
+    """
+    Retourne le cache des annonces, enregistré à côté du stockage des véhicules.
+    """
+    global _cache_annonces
+    if _cache_annonces is None:
+        dossier = os.path.dirname(obtenir_stockage().chemin)
+        _cache_annonces = CacheAnnonces(os.path.join(dossier, 'annonces.db'))
+    return _cache_annonces
+
+def fermer_cache_annonces():
+    """
+    Ferme le cache des annonces ouvert et l'oublie : le prochain appel à obtenir_cache_annonces
+    le rouvre à côté du stockage actif (après definir_stockage, par exemple).
+    """
+    global _cache_annonces
+    if _cache_annonces is not None:
+        _cache_annonces.fermer()
+        _cache_annonces = None
@@ -0,0 +1,180 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.equipements import obtenir_vocabulaire
+from utils.scoring import (
+    VERSION_SCORING, calculer_scores_paralleles, compiler_criteres, masque_obligatoires, meilleurs_scores,
+    revisions_vehicules
+)
+from utils.stockage import obtenir_stockage
+
+class CacheScores:
+    """
+    Cache persistant des scores de correspondance, indexé par
+    (identifiant du véhicule, révision du véhicule, empreinte des critères).
+    L'empreinte enregistrée inclut la version du calcul (VERSION_SCORING) et celle
+    du vocabulaire des équipements : les scores d'une version précédente du code
+    ou de data/equipements.csv ne sont jamais servis, et sont supprimés à l'ouverture.
+
+    Seule la dernière révision scorée de chaque véhicule est conservée pour
+    une empreinte donnée : un véhicule modifié (révision incrémentée) ou des
+    critères modifiés (nouvelle empreinte) sont recalculés, les autres scores
+    sont réutilisés, y compris d'une session ou d'un redémarrage à l'autre.
+    """
+    def __init__(self, chemin, taille_memoire=32):
+        self.chemin = chemin
+        self.taille_memoire = taille_memoire
+        self._verrou = threading.Lock()
+        self._memoire = OrderedDict()
+        # Incrémenté à chaque invalidation : les scores calculés avant ne sont pas enregistrés
+        self._generation = 0
+        os.makedirs(os.path.dirname(chemin) or '.', exist_ok=True)
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False)
+        with self._connexion:
+            self._connexion.execute("""
+                CREATE TABLE IF NOT EXISTS scores (
+                    empreinte TEXT NOT NULL,
+                    vehicule_id INTEGER NOT NULL,
+                    revision INTEGER NOT NULL,
+                    score REAL NOT NULL,
+                    PRIMARY KEY (empreinte, vehicule_id)
+                )
+            """)
+            self._connexion.execute(
+                "DELETE FROM scores WHERE substr(empreinte, 1, ?) != ?", (len(self._version()), self._version())
+            )
+
+    @staticmethod
+    def _version():
+        """Préfixe des empreintes enregistrées : version du calcul et du vocabulaire."""
+        return f"{VERSION_SCORING}:{obtenir_vocabulaire().empreinte}:"
+
+    def invalider(self, identifiants=None):
+        """
+        Oublie les scores enregistrés des véhicules donnés (tous si None), par exemple
+        après une sauvegarde complète qui remplace les véhicules sans changer leur révision.
+        """
+        with self._verrou:
+            self._generation += 1
+            self._memoire.clear()
+            with self._connexion:
+                if identifiants is None:
+                    self._connexion.execute("DELETE FROM scores")
+                else:
+                    self._connexion.executemany(
+                        "DELETE FROM scores WHERE vehicule_id = ?", ((int(i),) for i in identifiants)
+                    )
+
+    def _entree(self, empreinte):
+        """
+        Retourne les scores connus pour une empreinte, sous forme de DataFrame
+        (revision, score) indexé par identifiant de véhicule.
+        """
+        entree = self._memoire.get(empreinte)
+        if entree is None:
+            lignes = self._connexion.execute(
+                "SELECT vehicule_id, revision, score FROM scores WHERE empreinte = ?",
+                (empreinte,)
+            ).fetchall()
+            entree = pd.DataFrame(lignes, columns=['vehicule_id', 'revision', 'score']).set_index('vehicule_id')
+            self._memoire[empreinte] = entree
+            if len(self._memoire) > self.taille_memoire:
+                self._memoire.popitem(last=False)
+        else:
+            self._memoire.move_to_end(empreinte)
+        return entree
+
+    def _enregistrer(self, empreinte, generation, identifiants, revisions, scores):
+        """
+        Enregistre des scores calculés hors verrou. Ils sont ignorés si le cache a été
+        invalidé entre-temps, et un score déjà enregistré pour une révision plus récente
+        (calculé en même temps par une autre session) est conservé.
+        """
+        with self._verrou:
+            if generation != self._generation:
+                return
+            with self._connexion:
+                self._connexion.executemany(
+                    "INSERT INTO scores (empreinte, vehicule_id, revision, score) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (empreinte, vehicule_id) DO UPDATE SET revision = excluded.revision, score = excluded.score "
+                    "WHERE excluded.revision >= scores.revision",
+                    zip([empreinte] * len(identifiants), map(int, identifiants), map(int, revisions), scores.tolist())
+                )
+            entree = self._entree(empreinte)
+            mises_a_jour = pd.DataFrame({'revision': revisions, 'score': scores}, index=identifiants)
+            precedentes = entree['revision'].reindex(identifiants).to_numpy()
+            mises_a_jour = mises_a_jour[~(precedentes > revisions)]
+            self._memoire[empreinte] = pd.concat([entree.drop(mises_a_jour.index, errors='ignore'), mises_a_jour])
+
+    def scores(self, df, criteres, index_equipements=None, positions=None):
+        """
+        Retourne la Series des scores des véhicules de df pour ces critères.
+        Seuls les véhicules absents du cache ou modifiés depuis sont scorés, sur
+        plusieurs processus pour une grande flotte (voir calculer_scores_paralleles).
+        Si positions (tableau de positions dans df) est fourni, seuls ces véhicules
+        sont scorés, dans cet ordre, sans copier df.
+        """
+        plan = compiler_criteres(criteres)
+        empreinte = self._version() + plan.empreinte
+        positions = np.arange(len(df)) if positions is None else np.asarray(positions)
+        identifiants = df.index[positions]
+        revisions = revisions_vehicules(df, positions)
+
+        # Le verrou ne protège que la lecture et l'écriture des scores connus : les
+        # véhicules à scorer sont calculés hors verrou, sans bloquer les autres sessions
+        with self._verrou:
+            generation = self._generation
+            connus = self._entree(empreinte).reindex(identifiants)
+        a_jour = (connus['revision'].to_numpy() == revisions)
+        valeurs = connus['score'].to_numpy(dtype=float, na_value=np.nan).copy()
+
+        a_calculer = ~a_jour
+        if a_calculer.any():
+            # Seules les lignes à scorer sont extraites du DataFrame
+            nouveaux = calculer_scores_paralleles(df.iloc[positions[a_calculer]], plan, index_equipements)
+            valeurs[a_calculer] = nouveaux.to_numpy()
+            self._enregistrer(empreinte, generation, identifiants[a_calculer], revisions[a_calculer], nouveaux.to_numpy())
+
+        return pd.Series(valeurs, index=identifiants, name='Score_Match')
+
+    def classer(self, df, criteres, k, index_equipements=None, positions=None):
+        """
+        Retourne la Series des scores des k meilleurs véhicules de df (ou des seules
+        positions données), triée par score décroissant. Seuls les véhicules respectant
+        les critères obligatoires sont scorés (ou lus dans le cache) puis classés.
+        """
+        survivants = np.asarray(masque_obligatoires(df, criteres, index_equipements), dtype=bool)
+        positions = np.flatnonzero(survivants) if positions is None else positions[survivants[positions]]
+        return meilleurs_scores(self.scores(df, criteres, index_equipements, positions), k)
+
+    def fermer(self):
+        """Ferme la base du cache ; il n'est plus utilisable ensuite."""
+        with self._verrou:
+            self._connexion.close()
+
+_cache_scores = None
+
+def obtenir_cache_scores():
+    """
+    Retourne le cache de scores, enregistré à côté du stockage des véhicules.
+    """
+    global _cache_scores
+    if _cache_scores is None:
+        dossier = os.path.dirname(obtenir_stockage().chemin)
+        _cache_scores = CacheScores(os.path.join(dossier, 'scores.db'))
+    return _cache_scores
+
+def fermer_cache_scores():
+    """
+    Ferme le cache des scores ouvert et l'oublie : le prochain appel à obtenir_cache_scores
+    le rouvre à côté du stockage actif (après definir_stockage, par exemple).
+    """
+    global _cache_scores
+    if _cache_scores is not None:
+        _cache_scores.fermer()
+        _cache_scores = None
@@ -0,0 +1,55 @@
+class CatalogueReferences:
+    """
+    Index des données de référence (marques, modèles, équipements), construit
+    une seule fois à partir des fichiers CSV pour éviter de refiltrer les
+    DataFrames à chaque affichage des formulaires.
+    """
+    def __init__(self, marques_df, equipements_df):
+        # Marques et modèles
+        self.marques = sorted(marques_df['marque'].unique())
+        self.categories_vehicules = sorted(marques_df['categorie'].unique())
+        self.modeles_par_marque = {
+            marque: sorted(groupe['modele'].unique())
+            for marque, groupe in marques_df.groupby('marque')
+        }
+
+        # Plages d'années et de puissance par modèle
+        plages = marques_df.groupby(['marque', 'modele']).agg(
+            annee_debut=('annee_debut', 'min'),
+            annee_fin=('annee_fin', 'max'),
+            puissance_min=('puissance_min', 'min'),
+            puissance_max=('puissance_max', 'max')
+        )
+        self.annees_par_modele = {
+            cle: (int(ligne.annee_debut), int(ligne.annee_fin))
+            for cle, ligne in zip(plages.index, plages.itertuples())
+        }
+        self.puissances_par_modele = {
+            cle: (int(ligne.puissance_min), int(ligne.puissance_max))
+            for cle, ligne in zip(plages.index, plages.itertuples())
+        }
+
+        # Équipements, dans l'ordre du fichier
+        self.categories_equipements = list(equipements_df['categorie'].unique())
+        self.equipements_par_categorie = {
+            categorie: groupe['equipement'].tolist()
+            for categorie, groupe in equipements_df.groupby('categorie', sort=False)
+        }
+        premiers = equipements_df.drop_duplicates('equipement')
+        self.description_equipement = dict(zip(premiers['equipement'], premiers['description']))
+
+    def modeles(self, marque):
+        """Retourne la liste triée des modèles d'une marque."""
+        return self.modeles_par_marque.get(marque, [])
+
+    def plage_annees(self, marque, modele):
+        """Retourne les années (début, fin) de production d'un modèle, ou None."""
+        return self.annees_par_modele.get((marque, modele))
+
+    def plage_puissance(self, marque, modele):
+        """Retourne la puissance (min, max) en ch d'un modèle, ou None."""
+        return self.puissances_par_modele.get((marque, modele))
+
+    def description(self, equipement):
+        """Retourne la description d'un équipement."""
+        return self.description_equipement.get(equipement, "")
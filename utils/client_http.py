@@ -0,0 +1,215 @@
+import bisect
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Délais de connexion et de lecture d'une requête (secondes)
+DELAI_CONNEXION = 5
+DELAI_LECTURE = 15
+
+# Nouvelles tentatives après une erreur réseau ou un statut temporaire, espacées
+# de ATTENTE_INITIALE × 2^n secondes (plus un aléa), sans dépasser ATTENTE_MAX
+TENTATIVES = 3
+ATTENTE_INITIALE = 0.5
+ATTENTE_MAX = 30
+STATUTS_TEMPORAIRES = {429, 500, 502, 503, 504}
+
+# Débit autorisé par site : (requêtes par seconde, rafale maximale). Les autres
+# domaines (images des annonces...) ne sont pas limités
+DEBITS = {
+    'autoscout24.fr': (1.0, 3),
+    'leboncoin.fr': (0.5, 2)
+}
+
+# Connexions gardées ouvertes par domaine
+TAILLE_POOL = 10
+
+# Bornes supérieures (millisecondes) des classes de l'histogramme des latences
+BORNES_LATENCES = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+ENTETES = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+class SeauJetons:
+    """
+    Limiteur de débit à seau de jetons : chaque requête consomme un jeton, le seau
+    se remplit de debit jetons par seconde jusqu'à capacite (rafale autorisée).
+    """
+    def __init__(self, debit, capacite):
+        self.debit = debit
+        self.capacite = capacite
+        self._jetons = float(capacite)
+        self._date = time.monotonic()
+        self._verrou = threading.Lock()
+
+    def attendre(self):
+        """Prend un jeton, en attendant qu'il y en ait un. Retourne la durée d'attente (secondes)."""
+        with self._verrou:
+            maintenant = time.monotonic()
+            self._jetons = min(self.capacite, self._jetons + (maintenant - self._date) * self.debit)
+            self._date = maintenant
+            # Le jeton est réservé tout de suite : les appels concurrents attendent chacun leur tour
+            self._jetons -= 1
+            attente = -self._jetons / self.debit if self._jetons < 0 else 0.0
+        if attente:
+            time.sleep(attente)
+        return attente
+
+class HistogrammeLatences:
+    """Histogramme des durées des requêtes, par classes (voir BORNES_LATENCES)."""
+    def __init__(self, bornes=BORNES_LATENCES):
+        self.bornes = list(bornes)
+        self.effectifs = [0] * (len(self.bornes) + 1)
+        self.total = 0.0
+
+    def ajouter(self, duree):
+        self.effectifs[bisect.bisect_left(self.bornes, duree * 1000)] += 1
+        self.total += duree
+
+    def quantile(self, q):
+        """Borne supérieure (ms) de la classe contenant le quantile q, None au-delà de la dernière borne."""
+        nombre = sum(self.effectifs)
+        if not nombre:
+            return None
+        cumul = 0
+        for borne, effectif in zip(self.bornes + [None], self.effectifs):
+            cumul += effectif
+            if cumul >= q * nombre:
+                return borne
+        return None
+
+    def resume(self):
+        nombre = sum(self.effectifs)
+        return {
+            'requetes': nombre,
+            'moyenne_ms': self.total * 1000 / nombre if nombre else 0.0,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'classes': {
+                (f"<={borne}" if borne is not None else f">{self.bornes[-1]}"): effectif
+                for borne, effectif in zip(self.bornes + [None], self.effectifs)
+            }
+        }
+
+def _domaine(url):
+    return (urlparse(url).hostname or '').lower()
+
+def _attente_demandee(reponse):
+    """Délai (secondes) demandé par l'entête Retry-After d'une réponse, ou None."""
+    valeur = reponse.headers.get('Retry-After')
+    if not valeur:
+        return None
+    try:
+        return max(0.0, float(valeur))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valeur).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class ClientHTTP:
+    """
+    Client HTTP partagé pour le téléchargement des annonces et de leurs photos :
+    connexions réutilisées (keep-alive) par domaine, délais de connexion et de
+    lecture, nouvelles tentatives espacées exponentiellement après une erreur
+    réseau ou un statut temporaire, débit limité par site (seau de jetons) et
+    histogramme des latences par domaine.
+    """
+    def __init__(self, delai_connexion=DELAI_CONNEXION, delai_lecture=DELAI_LECTURE, tentatives=TENTATIVES,
+                 attente_initiale=ATTENTE_INITIALE, debits=None, taille_pool=TAILLE_POOL):
+        self.delais = (delai_connexion, delai_lecture)
+        self.tentatives = tentatives
+        self.attente_initiale = attente_initiale
+        self.debits = DEBITS if debits is None else debits
+        self._session = requests.Session()
+        self._session.headers.update(ENTETES)
+        adaptateur = HTTPAdapter(pool_connections=taille_pool, pool_maxsize=taille_pool)
+        self._session.mount('http://', adaptateur)
+        self._session.mount('https://', adaptateur)
+        self._verrou = threading.Lock()
+        self._seaux = {}
+        self._latences = {}
+        self._compteurs = {}
+
+    def _seau(self, domaine):
+        """
+        Retourne le limiteur du site d'un domaine (www.autoscout24.fr → autoscout24.fr),
+        partagé par tous ses sous-domaines, ou None si le site n'est pas limité.
+        """
+        site = next((site for site in self.debits if domaine == site or domaine.endswith('.' + site)), None)
+        if site is None:
+            return None
+        with self._verrou:
+            if site not in self._seaux:
+                self._seaux[site] = SeauJetons(*self.debits[site])
+            return self._seaux[site]
+
+    def _compteurs_domaine(self, domaine):
+        # Appelé sous le verrou
+        return self._compteurs.setdefault(domaine, {'tentatives': 0, 'erreurs': 0, 'attente_s': 0.0})
+
+    def _noter(self, domaine, duree, compteur):
+        with self._verrou:
+            self._latences.setdefault(domaine, HistogrammeLatences()).ajouter(duree)
+            compteurs = self._compteurs_domaine(domaine)
+            compteurs['tentatives'] += 1
+            compteurs[compteur] = compteurs.get(compteur, 0) + 1
+
+    def get(self, url, headers=None, tentatives=None):
+        """
+        Envoie une requête GET et retourne la réponse, après au plus `tentatives`
+        (par défaut celles du client) nouvelles tentatives si le réseau échoue ou si
+        le site répond par un statut temporaire (429, 5xx ; l'entête Retry-After est
+        respecté). L'exception de la dernière tentative est propagée ; la dernière
+        réponse est retournée quel que soit son statut.
+        """
+        tentatives = self.tentatives if tentatives is None else tentatives
+        domaine = _domaine(url)
+        seau = self._seau(domaine)
+        for tentative in range(tentatives + 1):
+            if seau is not None:
+                attente = seau.attendre()
+                with self._verrou:
+                    self._compteurs_domaine(domaine)['attente_s'] += attente
+            debut = time.perf_counter()
+            try:
+                reponse = self._session.get(url, headers=headers, timeout=self.delais)
+            except (requests.ConnectionError, requests.Timeout):
+                self._noter(domaine, time.perf_counter() - debut, 'erreurs')
+                if tentative == tentatives:
+                    raise
+                demandee = None
+            else:
+                self._noter(domaine, time.perf_counter() - debut, f"statut_{reponse.status_code}")
+                if reponse.status_code not in STATUTS_TEMPORAIRES or tentative == tentatives:
+                    return reponse
+                demandee = _attente_demandee(reponse)
+                reponse.close()
+            attente = self.attente_initiale * 2 ** tentative * (1 + random.random() / 2)
+            time.sleep(min(ATTENTE_MAX, attente if demandee is None else max(attente, demandee)))
+
+    def statistiques(self):
+        """Retourne, par domaine, les compteurs de tentatives et le résumé de l'histogramme des latences."""
+        with self._verrou:
+            return {
+                domaine: dict(self._compteurs.get(domaine, {}), **histogramme.resume())
+                for domaine, histogramme in self._latences.items()
+            }
+
+_client = None
+_verrou_client = threading.Lock()
+
+def obtenir_client():
+    """Retourne le client HTTP partagé par toute l'application."""
+    global _client
+    with _verrou_client:
+        if _client is None:
+            _client = ClientHTTP()
+        return _client
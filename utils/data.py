@@ -1,39 +1,139 @@
+import numpy as np
 import pandas as pd
 import os
 from datetime import datetime
 import json
+import threading
+from utils.cache import CacheFichiers, signature_fichiers
+from utils.cache_annonces import obtenir_cache_annonces
+from utils.cache_scores import obtenir_cache_scores
+from utils.equipements import IndexEquipements, obtenir_vocabulaire
+from utils.images import obtenir_cache_images
+from utils.catalogue import CatalogueReferences
+from utils.matrice_scores import MatriceScores
+from utils.recherche_texte import COLONNES_TEXTE, IndexTrigrammes
+from utils.requetes import MoteurRequetes, evaluer, normaliser_filtres
+from utils.scoring import ContributionsScoring, compiler_criteres, empreinte_structure
+from utils.stockage import obtenir_stockage
 
-def charger_donnees():
+CHEMIN_RECHERCHES = 'data/saved/recherches.json'
+CHEMINS_REFERENCES = ['data/marques.csv', 'data/equipements.csv']
+
+# Colonnes calculées au chargement, jamais enregistrées : masque des équipements
+# connus et texte des équipements hors vocabulaire
+COLONNES_DERIVEES = ['Equipements_Bits', 'Equipements_Extras']
+
+# Cache partagé par toutes les sessions Streamlit du processus
+_cache = CacheFichiers()
+# Écritures dans le DataFrame des véhicules en cache, partagé par toutes les sessions
+_verrou_vehicules = threading.RLock()
+# Résultats des filtres de la barre latérale, par version des données et requête
+_requetes = MoteurRequetes()
+
+def _charger_vehicules():
     """
-    Charge les données des véhicules et des recherches depuis les fichiers JSON.
+    Lit les véhicules depuis le stockage.
     """
-    # Création des dossiers si nécessaire
-    os.makedirs('data/saved', exist_ok=True)
-    
-    # Chargement des véhicules
-    try:
-        with open('data/saved/vehicules.json', 'r', encoding='utf-8') as f:
-            vehicules = json.load(f)
-            df = pd.DataFrame(vehicules)
-    except (FileNotFoundError, json.JSONDecodeError):
+    df = obtenir_stockage().charger()
+    if df is None:
         df = pd.DataFrame(columns=[
             'Prix', 'Marque', 'Modele', 'Annee', 'Image_URL', 'Motorisation',
             'Puissance', 'Transmission', 'Categorie', 'Type_Vendeur', 'Note_Vendeur',
             'Distance', 'Equipements', 'URL', 'Date_Ajout', 'Status', 'Selection_Franck',
             'Points_Forts', 'Points_Faibles', 'Red_Flags', 'Tags', 'Notes', 'Score_Match',
-            'Coup_de_Coeur'
+            'Coup_de_Coeur', 'Revision'
         ])
         
     # Initialisation de la colonne Score_Match si elle n'existe pas
     if 'Score_Match' not in df.columns:
         df['Score_Match'] = 0.0
     
-    # Chargement des recherches
+    # Révision de chaque véhicule, incrémentée à chaque modification
+    if 'Revision' not in df.columns:
+        df['Revision'] = 0
+    df['Revision'] = df['Revision'].fillna(0).astype(int)
+    
+    _encoder_equipements(df)
+    
+    return df
+
+def _encoder_equipements(df):
+    """
+    Calcule les colonnes dérivées des équipements (masque de bits et extras).
+    """
+    if 'Equipements' not in df.columns:
+        df['Equipements'] = ''
+    df['Equipements_Bits'], df['Equipements_Extras'] = obtenir_vocabulaire().encoder_serie(df['Equipements'])
+
+def _charger_recherches():
+    """
+    Lit les recherches depuis le fichier JSON.
+    """
     try:
-        with open('data/saved/recherches.json', 'r', encoding='utf-8') as f:
-            recherches = json.load(f)
+        with open(CHEMIN_RECHERCHES, 'r', encoding='utf-8') as f:
+            return json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
-        recherches = {}
+        return {}
+
+def _ecrire_recherches(recherches):
+    """
+    Écrit les recherches dans le fichier JSON et met à jour le cache.
+    """
+    with open(CHEMIN_RECHERCHES, 'w', encoding='utf-8') as f:
+        json.dump(recherches, f, ensure_ascii=False, indent=2)
+    _cache.mettre_a_jour('recherches', [CHEMIN_RECHERCHES], recherches)
+
+def _mettre_a_jour_cache_vehicules(df):
+    """
+    Enregistre le DataFrame venant d'être écrit comme version en cache des véhicules.
+    """
+    _cache.mettre_a_jour('vehicules', obtenir_stockage().fichiers(), df)
+
+def _resigner_vehicules():
+    """
+    Après une compaction du journal, le contenu en cache reste à jour :
+    seule la signature des fichiers change.
+    """
+    _cache.resigner('vehicules', obtenir_stockage().fichiers())
+    _cache.resigner('index_equipements', obtenir_stockage().fichiers())
+    _cache.resigner('index_texte', obtenir_stockage().fichiers())
+
+def _mettre_a_jour_index_equipements(identifiant, ancien_masque, nouveau_masque):
+    """
+    Reporte dans l'index inversé des équipements, s'il a déjà été construit, le
+    changement d'équipements d'un véhicule venant d'être écrit.
+    """
+    index = _cache.valeur('index_equipements')
+    if index is not None:
+        index.mettre_a_jour(identifiant, ancien_masque, nouveau_masque)
+        _cache.mettre_a_jour('index_equipements', obtenir_stockage().fichiers(), index)
+
+def _mettre_a_jour_index_texte(identifiant, vehicule):
+    """
+    Réindexe dans l'index de recherche texte, s'il a déjà été construit, un véhicule
+    venant d'être écrit.
+    """
+    index = _cache.valeur('index_texte')
+    if index is not None:
+        index.ajouter(identifiant, vehicule)
+        _cache.mettre_a_jour('index_texte', obtenir_stockage().fichiers(), index)
+
+def charger_donnees():
+    """
+    Charge les données des véhicules depuis le stockage et les recherches depuis le fichier JSON.
+    Les données sont partagées entre les sessions et ne sont relues que si les fichiers
+    ont changé : le DataFrame retourné ne doit être modifié qu'à travers ce module.
+    """
+    # Création des dossiers si nécessaire
+    os.makedirs('data/saved', exist_ok=True)
+    
+    stockage = obtenir_stockage()
+    rappels = getattr(stockage, 'apres_compaction', None)
+    if rappels is not None and _resigner_vehicules not in rappels:
+        rappels.append(_resigner_vehicules)
+    
+    df = _cache.obtenir('vehicules', stockage.fichiers(), _charger_vehicules)
+    recherches = _cache.obtenir('recherches', [CHEMIN_RECHERCHES], _charger_recherches)
     
     return df, recherches
 
@@ -41,53 +141,198 @@ def charger_references():
     """
     Charge les données de référence depuis les fichiers CSV.
     """
-    marques_df = pd.read_csv('data/marques.csv')
-    equipements_df = pd.read_csv('data/equipements.csv')
-    return marques_df, equipements_df
+    return _cache.obtenir(
+        'references',
+        CHEMINS_REFERENCES,
+        lambda: (pd.read_csv(CHEMINS_REFERENCES[0]), pd.read_csv(CHEMINS_REFERENCES[1]))
+    )
+
+def charger_catalogue():
+    """
+    Retourne le catalogue indexé des données de référence, construit une seule fois
+    à partir de charger_references et reconstruit seulement si les CSV changent.
+    """
+    return _cache.obtenir(
+        'catalogue',
+        CHEMINS_REFERENCES,
+        lambda: CatalogueReferences(*charger_references())
+    )
+
+def charger_index_equipements():
+    """
+    Retourne l'index inversé des équipements des véhicules (équipement → identifiants
+    triés). Construit au premier appel, il est ensuite tenu à jour à chaque ajout ou
+    modification de véhicule.
+    """
+    df, _ = charger_donnees()
+    return _cache.obtenir(
+        'index_equipements',
+        obtenir_stockage().fichiers(),
+        lambda: IndexEquipements(obtenir_vocabulaire(), df.index, df['Equipements_Bits'])
+    )
+
+def charger_index_texte():
+    """
+    Retourne l'index de trigrammes de la recherche texte (marque, modèle, tags et
+    notes). Construit au premier appel, il est ensuite tenu à jour à chaque ajout ou
+    modification de véhicule.
+    """
+    df, _ = charger_donnees()
+    return _cache.obtenir('index_texte', obtenir_stockage().fichiers(), lambda: IndexTrigrammes(df))
+
+def filtrer_equipements(df, equipements):
+    """
+    Retourne les véhicules de df possédant tous les équipements donnés,
+    d'après l'index inversé des équipements.
+    """
+    if not equipements:
+        return df
+    return df[df.index.isin(charger_index_equipements().vehicules(equipements))]
+
+def charger_matrice_scores():
+    """
+    Retourne la matrice des scores de tous les véhicules pour toutes les recherches
+    sauvegardées. Elle est reconstruite si les recherches ou l'ensemble des véhicules
+    changent ; une modification de véhicule ne recalcule que sa ligne (révision) et
+    une compaction du journal, qui ne change pas les données, ne recalcule rien.
+    """
+    df, recherches = charger_donnees()
+    construire = lambda: MatriceScores(df, recherches, charger_index_equipements())
+    matrice = _cache.obtenir('matrice_scores', [CHEMIN_RECHERCHES], construire)
+    if not matrice.actualiser(df, charger_index_equipements()):
+        matrice = construire()
+        _cache.mettre_a_jour('matrice_scores', [CHEMIN_RECHERCHES], matrice)
+    return matrice
+
+def charger_contributions(criteres):
+    """
+    Retourne les contributions de chaque critère au score des véhicules pour cette
+    recherche. Elles sont calculées une fois par structure de critères et réutilisées
+    tant que seuls les poids changent et que les véhicules ne sont pas modifiés.
+    Lève ValueError si les critères sont invalides.
+    """
+    df, _ = charger_donnees()
+    # Contributions par structure de critères, tenues à jour par révision des
+    # véhicules (voir ContributionsScoring.actualiser) et non par fichiers : une
+    # modification ou une compaction du journal ne recalcule pas toute la flotte
+    par_structure = _cache.obtenir('contributions', [], dict)
+    structure = empreinte_structure(criteres)
+    contributions = par_structure.get(structure)
+    if contributions is None or not contributions.actualiser(df):
+        contributions = ContributionsScoring(df, criteres)
+        if len(par_structure) >= 8:
+            par_structure.pop(next(iter(par_structure)))
+        par_structure[structure] = contributions
+    return contributions
+
+def statistiques_cache():
+    """
+    Retourne les compteurs de hits/misses du cache de données, par type de données,
+    ceux du cache des requêtes de filtrage (une requête resserrée à partir d'un
+    résultat en cache compte comme un hit), ceux du cache des images et ceux du
+    cache des annonces (une annonce revalidée auprès du site compte comme un hit).
+    """
+    statistiques = _cache.statistiques()
+    compteurs = _requetes.statistiques()
+    hits = compteurs['hits'] + compteurs['affinages']
+    total = hits + compteurs['misses']
+    statistiques['requetes'] = {'hits': hits, 'misses': compteurs['misses'], 'taux': hits / total if total else 0.0}
+    statistiques['images'] = obtenir_cache_images().statistiques()
+    statistiques['annonces'] = obtenir_cache_annonces().statistiques()
+    return statistiques
 
 def sauvegarder_donnees(df, recherches=None):
     """
-    Sauvegarde les données des véhicules et des recherches dans les fichiers JSON.
+    Sauvegarde l'ensemble des véhicules dans le stockage et les recherches dans le fichier JSON.
+    Pour modifier un seul véhicule, préférer mettre_a_jour_vehicule ou ajouter_vehicule.
     """
     # Création du dossier si nécessaire
     os.makedirs('data/saved', exist_ok=True)
     
-    # Sauvegarde des véhicules
-    vehicules = df.to_dict('records')
-    with open('data/saved/vehicules.json', 'w', encoding='utf-8') as f:
-        json.dump(vehicules, f, ensure_ascii=False, indent=2)
+    # Sauvegarde des véhicules : df remplace explicitement ceux de toutes les sessions
+    with _verrou_vehicules:
+        obtenir_stockage().remplacer(df.drop(columns=COLONNES_DERIVEES, errors='ignore'))
+        if 'Equipements_Bits' not in df.columns:
+            _encoder_equipements(df)
+        _mettre_a_jour_cache_vehicules(df)
+    _cache.invalider('index_equipements')
+    _cache.invalider('index_texte')
+    # Véhicules remplacés en bloc, sans changement de révision : tout est à recalculer,
+    # y compris les scores enregistrés (identifiants réutilisés, véhicules modifiés)
+    _cache.invalider('matrice_scores')
+    _cache.invalider('contributions')
+    obtenir_cache_scores().invalider()
     
     # Sauvegarde des recherches si fournies
     if recherches is not None:
-        with open('data/saved/recherches.json', 'w', encoding='utf-8') as f:
-            json.dump(recherches, f, ensure_ascii=False, indent=2)
+        _ecrire_recherches(recherches)
 
 def ajouter_vehicule(df, infos_vehicule):
     """
-    Ajoute un nouveau véhicule au DataFrame et sauvegarde les données.
-    """
-    # Ajout des champs supplémentaires
-    infos_vehicule.update({
-        'Date_Ajout': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'Status': 'Nouveau',
-        'Selection_Franck': False,
-        'Points_Forts': '',
-        'Points_Faibles': '',
-        'Red_Flags': '',
-        'Tags': '',
-        'Notes': ''
-    })
-    
-    # Conversion en DataFrame d'une seule ligne
-    nouvelle_ligne = pd.DataFrame([infos_vehicule])
-    
-    # Concaténation avec le DataFrame existant
-    df_maj = pd.concat([df, nouvelle_ligne], ignore_index=True)
+    Ajoute un nouveau véhicule au DataFrame et l'insère dans le stockage.
+    Les champs fournis sont prioritaires sur les valeurs par défaut.
+    """
+    return ajouter_vehicules(df, [infos_vehicule])
+
+def ajouter_vehicules(df, liste_infos):
+    """
+    Ajoute plusieurs véhicules au DataFrame et les insère dans le stockage en une
+    seule écriture (import en masse). Les champs fournis sont prioritaires sur les
+    valeurs par défaut. Les véhicules sont ajoutés, sous verrou, au DataFrame en cache
+    partagé par les sessions, et non à df : le DataFrame retourné est ce dernier.
+    """
+    if not liste_infos:
+        return df
     
-    # Sauvegarde des données
-    sauvegarder_donnees(df_maj)
+    # Champs par défaut
+    date_ajout = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    vehicules = []
+    for infos_vehicule in liste_infos:
+        vehicule = {
+            'Date_Ajout': date_ajout,
+            'Status': 'Nouveau',
+            'Selection_Franck': False,
+            'Points_Forts': '',
+            'Points_Faibles': '',
+            'Red_Flags': '',
+            'Tags': '',
+            'Notes': '',
+            'Revision': 0
+        }
+        vehicule.update(infos_vehicule)
+        vehicules.append(vehicule)
     
-    return df_maj
+    with _verrou_vehicules:
+        # Ajout au DataFrame en cache, à jour des écritures des autres sessions
+        df, _ = charger_donnees()
+        
+        # Identifiants des nouveaux véhicules attribués par le stockage, au moment de
+        # l'insertion des seules nouvelles lignes
+        identifiants = obtenir_stockage().ajouter_lot(vehicules)
+        if identifiants[0] != (int(df.index.max()) + 1 if not df.empty else 0):
+            # Véhicules ajoutés entre-temps par un autre processus (import en ligne
+            # de commande) : les véhicules et leurs index sont relus en entier
+            for cle in ('vehicules', 'index_equipements', 'index_texte'):
+                _cache.invalider(cle)
+            return charger_donnees()[0]
+        
+        # Concaténation avec le DataFrame existant
+        vocabulaire = obtenir_vocabulaire()
+        encodages = [vocabulaire.encoder(vehicule.get('Equipements', '')) for vehicule in vehicules]
+        nouvelles_lignes = pd.DataFrame(
+            [dict(vehicule, Equipements_Bits=bits, Equipements_Extras=extras) for vehicule, (bits, extras) in zip(vehicules, encodages)],
+            index=identifiants
+        )
+        df_maj = pd.concat([df, nouvelles_lignes])
+        if 'Equipements_Bits' in df.columns:
+            df_maj['Equipements_Bits'] = df_maj['Equipements_Bits'].astype('uint64')
+        
+        _mettre_a_jour_cache_vehicules(df_maj)
+        for identifiant, vehicule, (bits, _) in zip(identifiants, vehicules, encodages):
+            _mettre_a_jour_index_equipements(identifiant, 0, bits)
+            _mettre_a_jour_index_texte(identifiant, vehicule)
+        
+        return df_maj
 
 def sauvegarder_recherche(nom, criteres, recherches):
     """
@@ -100,8 +345,7 @@ def sauvegarder_recherche(nom, criteres, recherches):
     }
     
     # Sauvegarde dans le fichier JSON
-    with open('data/saved/recherches.json', 'w', encoding='utf-8') as f:
-        json.dump(recherches, f, ensure_ascii=False, indent=2)
+    _ecrire_recherches(recherches)
     
     return recherches
 
@@ -114,8 +358,7 @@ def associer_vehicule_recherche(nom_recherche, index_vehicule, recherches):
             recherches[nom_recherche]['vehicules_associes'].append(index_vehicule)
             
             # Sauvegarde dans le fichier JSON
-            with open('data/saved/recherches.json', 'w', encoding='utf-8') as f:
-                json.dump(recherches, f, ensure_ascii=False, indent=2)
+            _ecrire_recherches(recherches)
     
     return recherches
 
@@ -128,47 +371,107 @@ def dissocier_vehicule_recherche(nom_recherche, index_vehicule, recherches):
             recherches[nom_recherche]['vehicules_associes'].remove(index_vehicule)
             
             # Sauvegarde dans le fichier JSON
-            with open('data/saved/recherches.json', 'w', encoding='utf-8') as f:
-                json.dump(recherches, f, ensure_ascii=False, indent=2)
+            _ecrire_recherches(recherches)
     
     return recherches
 
+def _appliquer(df, index, updates):
+    """Écrit les champs modifiés d'un véhicule dans df, colonnes dérivées comprises."""
+    for key, value in updates.items():
+        df.at[index, key] = value
+    if 'Equipements' in updates:
+        df.at[index, 'Equipements_Bits'], df.at[index, 'Equipements_Extras'] = obtenir_vocabulaire().encoder(updates['Equipements'])
+
 def mettre_a_jour_vehicule(df, index, updates):
     """
     Met à jour les informations d'un véhicule existant.
+    Les champs modifiés sont appliqués, sous verrou, au DataFrame en cache partagé par
+    les sessions (véhicule désigné par son identifiant), puis journalisés et reportés
+    en arrière-plan dans le stockage. df, celui de l'appelant, n'est jamais recopié
+    dans le cache : s'il en est distinct, il reçoit seulement les mêmes modifications.
+    La révision du véhicule est incrémentée, ce qui invalide ses scores en cache.
     """
-    for key, value in updates.items():
-        df.at[index, key] = value
-    
-    # Sauvegarde des données
-    sauvegarder_donnees(df)
+    with _verrou_vehicules:
+        vehicules, _ = charger_donnees()
+        if index not in vehicules.index:
+            # Véhicule remplacé entre-temps par une sauvegarde complète
+            return df
+        revision = vehicules.at[index, 'Revision'] if 'Revision' in vehicules.columns else 0
+        updates = dict(updates, Revision=(0 if pd.isna(revision) else int(revision)) + 1)
+        
+        ancien_masque = vehicules.at[index, 'Equipements_Bits'] if 'Equipements_Bits' in vehicules.columns else 0
+        _appliquer(vehicules, index, updates)
+        
+        # Sauvegarde des seuls champs modifiés
+        obtenir_stockage().mettre_a_jour(index, updates)
+        _mettre_a_jour_cache_vehicules(vehicules)
+        if 'Equipements' in updates:
+            _mettre_a_jour_index_equipements(index, ancien_masque, vehicules.at[index, 'Equipements_Bits'])
+        if any(colonne in updates for colonne in COLONNES_TEXTE):
+            _mettre_a_jour_index_texte(index, vehicules.loc[index])
     
+    if df is not vehicules and index in df.index:
+        _appliquer(df, index, updates)
     return df
 
+def version_vehicules(df):
+    """
+    Identifie l'état des véhicules de df pour le cache des requêtes : toute écriture
+    dans le stockage (modification, ajout, sauvegarde) change la signature des fichiers.
+    """
+    return (id(df), len(df), signature_fichiers(obtenir_stockage().fichiers()))
+
+def _correspondances(texte):
+    """Identifiants des véhicules trouvés par la recherche texte approchée."""
+    return charger_index_texte().rechercher(texte).index
+
+def masque_filtres(df, filtres):
+    """
+    Retourne le masque booléen (tableau numpy) des véhicules de df respectant les
+    filtres (voir utils.requetes), sans copier le DataFrame.
+    """
+    masque = np.zeros(len(df), dtype=bool)
+    masque[evaluer(df, normaliser_filtres(filtres), correspondances=_correspondances)] = True
+    return masque
+
+def positions_filtrees(df, filtres, criteres=None):
+    """
+    Retourne le tableau trié (en lecture seule) des positions des véhicules de df
+    respectant les filtres. Les résultats sont gardés en cache par version des
+    données et requête normalisée : une requête répétée ou resserrée est immédiate.
+    La recherche texte ('search') est approchée (voir utils.recherche_texte).
+    Le filtre de score ('score_range') porte sur les scores pour les critères donnés.
+    """
+    empreinte = compiler_criteres(criteres).empreinte if criteres is not None else None
+    requete = normaliser_filtres(filtres, empreinte)
+    scores = lambda positions: obtenir_cache_scores().scores(
+        df, criteres, charger_index_equipements(), positions
+    ).to_numpy()
+    return _requetes.positions(df, requete, version_vehicules(df), scores, _correspondances)
+
+def valeurs_tags(df):
+    """
+    Retourne la liste triée des tags utilisés par les véhicules.
+    """
+    if 'Tags' not in df.columns:
+        return []
+    tags = set()
+    for texte in df['Tags'].dropna().unique():
+        tags.update(jeton.strip() for jeton in str(texte).split(',') if jeton.strip())
+    return sorted(tags, key=str.lower)
+
 def filtrer_vehicules(df, filtres):
-    """Filtre les véhicules selon les critères spécifiés."""
-    df_filtered = df.copy()
-    
-    if filtres.get('recherche_active') != "Toutes":
-        df_filtered = df_filtered[df_filtered['Notes'] == filtres['recherche_active']]
-    
-    if filtres.get('search'):
-        search = filtres['search'].lower()
-        df_filtered = df_filtered[
-            df_filtered['Marque'].str.lower().str.contains(search) |
-            df_filtered['Modele'].str.lower().str.contains(search)
-        ]
-    
-    if filtres.get('status'):
-        df_filtered = df_filtered[df_filtered['Status'].isin(filtres['status'])]
-    
-    if filtres.get('marques'):
-        df_filtered = df_filtered[df_filtered['Marque'].isin(filtres['marques'])]
-    
-    if filtres.get('prix_range'):
-        df_filtered = df_filtered[
-            (df_filtered['Prix'] >= filtres['prix_range'][0]) &
-            (df_filtered['Prix'] <= filtres['prix_range'][1])
-        ]
-    
-    return df_filtered 
\ No newline at end of file
+    """
+    Filtre les véhicules selon les critères spécifiés. Seules les lignes retenues
+    sont copiées ; pour ne pas copier du tout, utiliser positions_filtrees.
+    """
+    return df.iloc[positions_filtrees(df, filtres)]
+
+def ordre_tri(df, positions, colonne, croissant=True):
+    """
+    Retourne l'ordre (indices dans positions) des véhicules aux positions données
+    triés selon une colonne, les valeurs manquantes en dernier. Seule la colonne
+    triée est lue, pour ces positions.
+    """
+    valeurs = pd.Series(df[colonne].to_numpy()[positions])
+    return valeurs.sort_values(ascending=croissant, kind='stable', na_position='last').index.to_numpy()
@@ -0,0 +1,167 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+CHEMIN_EQUIPEMENTS = 'data/equipements.csv'
+
+# Nombre de bits à 1 de chaque octet, pour compter les équipements d'un masque
+_BITS_PAR_OCTET = np.array([bin(octet).count('1') for octet in range(256)], dtype=np.uint8)
+
+def _jetons(texte):
+    """Découpe une liste d'équipements séparés par des virgules."""
+    return [jeton.strip() for jeton in texte.split(',')]
+
+class VocabulaireEquipements:
+    """
+    Vocabulaire fixe des équipements connus (data/equipements.csv), chacun associé
+    à un bit d'un masque uint64. Les équipements d'un véhicule sont représentés par
+    ce masque, complété par un texte des seuls équipements hors vocabulaire.
+
+    Les comparaisons ignorent la casse, comme le calcul des scores.
+    """
+    def __init__(self, equipements):
+        self.equipements = list(dict.fromkeys(equipements))
+        if len(self.equipements) > 64:
+            raise ValueError(f"{len(self.equipements)} équipements : au plus 64 tiennent dans un masque uint64")
+        self.positions = {equip.lower(): position for position, equip in enumerate(self.equipements)}
+        # Empreinte du vocabulaire, qui change avec data/equipements.csv
+        self.empreinte = hashlib.sha1('\n'.join(self.equipements).encode('utf-8')).hexdigest()
+
+    def bit(self, equipement):
+        """Retourne le masque du seul bit d'un équipement, ou None s'il est hors vocabulaire."""
+        position = self.positions.get(equipement.lower())
+        return None if position is None else 1 << position
+
+    def masque(self, equipements):
+        """Retourne le masque des équipements connus parmi ceux donnés."""
+        masque = 0
+        for equip in equipements:
+            bit = self.bit(equip)
+            if bit is not None:
+                masque |= bit
+        return masque
+
+    def encoder(self, texte):
+        """
+        Encode une liste d'équipements séparés par des virgules en
+        (masque des équipements connus, texte des équipements hors vocabulaire).
+        """
+        if not isinstance(texte, str):
+            return 0, ''
+        masque = 0
+        extras = []
+        for jeton in _jetons(texte):
+            bit = self.bit(jeton)
+            if bit is not None:
+                masque |= bit
+            elif jeton:
+                extras.append(jeton)
+        return masque, ', '.join(extras)
+
+    def encoder_serie(self, textes):
+        """
+        Encode une Series de listes d'équipements. Retourne le tableau uint64 des
+        masques et la Series des extras ; chaque texte distinct n'est découpé qu'une fois.
+        """
+        codes, uniques = pd.factorize(textes)
+        masques = np.zeros(len(uniques) + 1, dtype=np.uint64)
+        extras = np.full(len(uniques) + 1, '', dtype=object)
+        for position, texte in enumerate(uniques):
+            masque, extras[position] = self.encoder(texte)
+            masques[position] = masque
+        # Le code -1 (valeur manquante) pointe sur la dernière case, vide
+        return masques[codes], pd.Series(extras[codes], index=textes.index)
+
+    def decoder(self, masque, extras=''):
+        """Retourne la liste des équipements d'un masque, suivis des extras."""
+        masque = int(masque)
+        equipements = [equip for position, equip in enumerate(self.equipements) if masque >> position & 1]
+        if isinstance(extras, str) and extras:
+            equipements.extend(jeton for jeton in _jetons(extras) if jeton)
+        return equipements
+
+class IndexEquipements:
+    """
+    Index inversé des équipements connus : pour chaque équipement du vocabulaire,
+    tableau trié des identifiants des véhicules qui le possèdent. Les véhicules
+    ayant tous les équipements d'une liste s'obtiennent par intersection de ces
+    listes, sans parcourir la flotte.
+    """
+    def __init__(self, vocabulaire, identifiants, masques):
+        self.vocabulaire = vocabulaire
+        identifiants = np.asarray(identifiants, dtype=np.int64)
+        masques = np.asarray(masques, dtype=np.uint64)
+        ordre = np.argsort(identifiants, kind='stable')
+        identifiants, masques = identifiants[ordre], masques[ordre]
+        self.listes = [
+            identifiants[(masques >> np.uint64(position)) & np.uint64(1) == 1]
+            for position in range(len(vocabulaire.equipements))
+        ]
+
+    def couvre(self, equipements):
+        """Indique si tous les équipements donnés font partie du vocabulaire indexé."""
+        return all(self.vocabulaire.bit(equip) is not None for equip in equipements)
+
+    def vehicules(self, equipements):
+        """
+        Retourne le tableau trié des identifiants des véhicules possédant tous les
+        équipements donnés (du vocabulaire), en commençant par la liste la plus courte.
+        """
+        listes = sorted(
+            (self.listes[self.vocabulaire.positions[equip.lower()]] for equip in equipements),
+            key=len
+        )
+        if not listes:
+            raise ValueError("Aucun équipement demandé")
+        resultat = listes[0]
+        for liste in listes[1:]:
+            if not len(resultat):
+                break
+            resultat = np.intersect1d(resultat, liste, assume_unique=True)
+        return resultat
+
+    def mettre_a_jour(self, identifiant, ancien_masque, nouveau_masque):
+        """
+        Reporte le changement d'équipements d'un véhicule (ancien masque à 0 pour
+        un véhicule ajouté). Seules les listes des équipements modifiés changent.
+        """
+        ancien_masque, nouveau_masque = int(ancien_masque), int(nouveau_masque)
+        differences = ancien_masque ^ nouveau_masque
+        for position in range(len(self.listes)):
+            if not differences >> position & 1:
+                continue
+            liste = self.listes[position]
+            rang = np.searchsorted(liste, identifiant)
+            if nouveau_masque >> position & 1:
+                if rang == len(liste) or liste[rang] != identifiant:
+                    self.listes[position] = np.insert(liste, rang, identifiant)
+            elif rang < len(liste) and liste[rang] == identifiant:
+                self.listes[position] = np.delete(liste, rang)
+
+def compter_bits(masques):
+    """Retourne, pour chaque masque d'un tableau uint64, le nombre de bits à 1."""
+    octets = np.ascontiguousarray(masques, dtype=np.uint64).view(np.uint8).reshape(-1, 8)
+    return _BITS_PAR_OCTET[octets].sum(axis=1, dtype=np.int64)
+
+_vocabulaire = None
+
+def obtenir_vocabulaire():
+    """
+    Retourne le vocabulaire des équipements, lu une fois par processus : les masques
+    ne sont jamais enregistrés, ils restent donc cohérents avec ce vocabulaire.
+    """
+    global _vocabulaire
+    if _vocabulaire is None:
+        _vocabulaire = VocabulaireEquipements(pd.read_csv(CHEMIN_EQUIPEMENTS)['equipement'])
+    return _vocabulaire
+
+def liste_equipements(vehicule):
+    """
+    Retourne la liste des équipements d'un véhicule, depuis son masque si la ligne
+    en possède un, sinon depuis son texte.
+    """
+    if 'Equipements_Bits' in vehicule and not pd.isna(vehicule['Equipements_Bits']):
+        return obtenir_vocabulaire().decoder(vehicule['Equipements_Bits'], vehicule.get('Equipements_Extras', ''))
+    texte = vehicule.get('Equipements', '')
+    return [jeton for jeton in _jetons(texte) if jeton] if isinstance(texte, str) else []
@@ -0,0 +1,274 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from utils.client_http import obtenir_client
+from utils.stockage import obtenir_stockage
+
+# Tailles maximales (largeur, hauteur) des vignettes, par format d'affichage
+FORMATS = {
+    'carte': (480, 360),
+    'detail': (1280, 960)
+}
+
+# Taille maximale du cache sur disque (images d'origine et vignettes)
+TAILLE_MAX = 200 * 1024 * 1024
+# Durée pendant laquelle une URL en échec n'est pas retéléchargée (secondes)
+DUREE_ECHEC = 3600
+# Intervalle minimal entre deux enregistrements du dernier accès à un fichier (secondes)
+RESOLUTION_ACCES = 60
+
+class CacheImages:
+    """
+    Cache sur disque des photos des annonces, adressé par contenu : chaque image
+    n'est téléchargée qu'une fois (une même photo publiée sous plusieurs URL n'est
+    stockée qu'une fois) et ses vignettes (voir FORMATS) sont générées à la demande.
+
+    La taille totale des fichiers est bornée : les fichiers les moins récemment
+    affichés sont supprimés en premier. Une URL injoignable ou qui ne contient pas
+    d'image n'est pas retéléchargée avant DUREE_ECHEC secondes.
+    """
+    def __init__(self, dossier, taille_max=TAILLE_MAX, duree_echec=DUREE_ECHEC):
+        self.dossier = dossier
+        self.taille_max = taille_max
+        self.duree_echec = duree_echec
+        self._verrou = threading.Lock()
+        self._compteurs = {'hits': 0, 'misses': 0, 'echecs': 0}
+        self._executeur = None
+        self._en_cours = set()
+        os.makedirs(dossier, exist_ok=True)
+        self._connexion = sqlite3.connect(os.path.join(dossier, 'index.db'), check_same_thread=False)
+        with self._connexion:
+            self._connexion.execute("""
+                CREATE TABLE IF NOT EXISTS urls (
+                    url TEXT PRIMARY KEY,
+                    empreinte TEXT,
+                    echec REAL
+                )
+            """)
+            self._connexion.execute("""
+                CREATE TABLE IF NOT EXISTS fichiers (
+                    empreinte TEXT NOT NULL,
+                    format TEXT NOT NULL,
+                    taille INTEGER NOT NULL,
+                    acces REAL NOT NULL,
+                    PRIMARY KEY (empreinte, format)
+                )
+            """)
+        # Index chargé en mémoire : url → (empreinte, date d'échec),
+        # (empreinte, format) → [taille, dernier accès]
+        self._urls = {
+            url: (empreinte, echec)
+            for url, empreinte, echec in self._connexion.execute("SELECT url, empreinte, echec FROM urls")
+        }
+        self._fichiers = {
+            (empreinte, format_): [taille, acces]
+            for empreinte, format_, taille, acces in self._connexion.execute(
+                "SELECT empreinte, format, taille, acces FROM fichiers"
+            )
+        }
+        self._taille_totale = sum(taille for taille, _ in self._fichiers.values())
+
+    def _chemin(self, empreinte, format_):
+        """Chemin d'un fichier du cache : l'image d'origine (format 'original') ou une vignette."""
+        extension = 'img' if format_ == 'original' else 'jpg'
+        return os.path.join(self.dossier, format_, empreinte[:2], f"{empreinte}.{extension}")
+
+    def _ecrire(self, empreinte, format_, contenu):
+        """Écrit un fichier du cache (via un fichier temporaire) et l'enregistre dans l'index."""
+        chemin = self._chemin(empreinte, format_)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        temporaire = f"{chemin}.{threading.get_ident()}.tmp"
+        with open(temporaire, 'wb') as f:
+            f.write(contenu)
+        os.replace(temporaire, chemin)
+
+        maintenant = time.time()
+        with self._verrou:
+            ancien = self._fichiers.get((empreinte, format_))
+            self._taille_totale += len(contenu) - (ancien[0] if ancien else 0)
+            self._fichiers[(empreinte, format_)] = [len(contenu), maintenant]
+            with self._connexion:
+                self._connexion.execute(
+                    "INSERT OR REPLACE INTO fichiers (empreinte, format, taille, acces) VALUES (?, ?, ?, ?)",
+                    (empreinte, format_, len(contenu), maintenant)
+                )
+            self._evincer(protege=(empreinte, format_))
+        return chemin
+
+    def _lire(self, empreinte, format_):
+        """Retourne le chemin d'un fichier présent dans le cache (et note son accès), ou None."""
+        with self._verrou:
+            fichier = self._fichiers.get((empreinte, format_))
+            if fichier is None:
+                return None
+            chemin = self._chemin(empreinte, format_)
+            if not os.path.exists(chemin):
+                # Fichier supprimé hors de l'application
+                self._oublier(empreinte, format_)
+                return None
+            maintenant = time.time()
+            if maintenant - fichier[1] >= RESOLUTION_ACCES:
+                fichier[1] = maintenant
+                with self._connexion:
+                    self._connexion.execute(
+                        "UPDATE fichiers SET acces = ? WHERE empreinte = ? AND format = ?",
+                        (maintenant, empreinte, format_)
+                    )
+            return chemin
+
+    def _oublier(self, empreinte, format_):
+        """Retire un fichier de l'index (appelé sous le verrou)."""
+        taille, _ = self._fichiers.pop((empreinte, format_))
+        self._taille_totale -= taille
+        with self._connexion:
+            self._connexion.execute(
+                "DELETE FROM fichiers WHERE empreinte = ? AND format = ?", (empreinte, format_)
+            )
+
+    def _evincer(self, protege=None):
+        """
+        Supprime les fichiers les moins récemment affichés tant que le cache dépasse
+        sa taille maximale (appelé sous le verrou). Le fichier protégé, qui vient
+        d'être écrit, est conservé.
+        """
+        if self._taille_totale <= self.taille_max:
+            return
+        for cle, _ in sorted(self._fichiers.items(), key=lambda entree: entree[1][1]):
+            if self._taille_totale <= self.taille_max:
+                break
+            if cle == protege:
+                continue
+            try:
+                os.remove(self._chemin(*cle))
+            except FileNotFoundError:
+                pass
+            self._oublier(*cle)
+
+    def _noter_url(self, url, empreinte, echec):
+        with self._verrou:
+            self._urls[url] = (empreinte, echec)
+            with self._connexion:
+                self._connexion.execute(
+                    "INSERT OR REPLACE INTO urls (url, empreinte, echec) VALUES (?, ?, ?)",
+                    (url, empreinte, echec)
+                )
+
+    def _telecharger(self, url):
+        """
+        Télécharge l'image d'une URL et l'enregistre sous l'empreinte de son contenu.
+        Retourne l'empreinte, ou None (échec noté) si l'URL ne donne pas d'image.
+        """
+        try:
+            # Une seule nouvelle tentative : une photo manquante ne doit pas retarder l'affichage
+            reponse = obtenir_client().get(url, tentatives=1)
+            reponse.raise_for_status()
+            contenu = reponse.content
+            with Image.open(io.BytesIO(contenu)) as image:
+                image.verify()
+        except Exception:
+            with self._verrou:
+                self._compteurs['echecs'] += 1
+            self._noter_url(url, None, time.time())
+            return None
+        empreinte = hashlib.sha256(contenu).hexdigest()
+        if self._lire(empreinte, 'original') is None:
+            self._ecrire(empreinte, 'original', contenu)
+        self._noter_url(url, empreinte, None)
+        return empreinte
+
+    def _generer_vignette(self, empreinte, format_):
+        """Réduit l'image d'origine aux dimensions du format, en JPEG."""
+        with Image.open(self._chemin(empreinte, 'original')) as image:
+            image = ImageOps.exif_transpose(image).convert('RGB')
+            image.thumbnail(FORMATS[format_])
+            sortie = io.BytesIO()
+            image.save(sortie, format='JPEG', quality=85, optimize=True)
+        return self._ecrire(empreinte, format_, sortie.getvalue())
+
+    def vignette(self, url, format_='carte'):
+        """
+        Retourne le chemin local de la vignette d'une image dans ce format
+        ('carte' ou 'detail'), en la téléchargeant et la générant si besoin,
+        ou None si l'image n'est pas disponible (URL vide ou en échec).
+        """
+        if not isinstance(url, str) or not url.strip():
+            return None
+        url = url.strip()
+        with self._verrou:
+            empreinte, echec = self._urls.get(url, (None, None))
+        if echec is not None and time.time() - echec < self.duree_echec:
+            return None
+
+        if empreinte is not None:
+            chemin = self._lire(empreinte, format_)
+            if chemin is not None:
+                with self._verrou:
+                    self._compteurs['hits'] += 1
+                return chemin
+
+        with self._verrou:
+            self._compteurs['misses'] += 1
+        # Image d'origine à (re)télécharger si elle a été évincée du cache
+        if empreinte is None or self._lire(empreinte, 'original') is None:
+            empreinte = self._telecharger(url)
+            if empreinte is None:
+                return None
+        try:
+            return self._generer_vignette(empreinte, format_)
+        except (OSError, ValueError):
+            # Image d'origine illisible : elle est retéléchargée au prochain essai
+            return None
+
+    def precharger(self, urls, formats=('carte',)):
+        """
+        Télécharge en arrière-plan les images des URL données et génère leurs
+        vignettes, pour qu'elles soient servies depuis le cache à leur affichage
+        (page suivante de la galerie, véhicule ajouté...). Ne bloque pas.
+        """
+        with self._verrou:
+            if self._executeur is None:
+                self._executeur = ThreadPoolExecutor(max_workers=4, thread_name_prefix='images')
+            executeur = self._executeur
+        for url in dict.fromkeys(urls):
+            for format_ in formats:
+                cle = (url, format_)
+                with self._verrou:
+                    # Une image déjà en cours de préchargement n'est pas redemandée
+                    if cle in self._en_cours:
+                        continue
+                    self._en_cours.add(cle)
+                executeur.submit(self._precharger, cle)
+
+    def _precharger(self, cle):
+        try:
+            self.vignette(*cle)
+        finally:
+            with self._verrou:
+                self._en_cours.discard(cle)
+
+    def statistiques(self):
+        """Retourne les compteurs de vignettes servies par le cache, générées ou en échec, et la taille du cache."""
+        with self._verrou:
+            statistiques = dict(self._compteurs, taille=self._taille_totale, fichiers=len(self._fichiers))
+        total = statistiques['hits'] + statistiques['misses']
+        statistiques['taux'] = statistiques['hits'] / total if total else 0.0
+        return statistiques
+
+_cache_images = None
+
+def obtenir_cache_images():
+    """
+    Retourne le cache d'images, enregistré à côté du stockage des véhicules.
+    """
+    global _cache_images
+    if _cache_images is None:
+        dossier = os.path.dirname(obtenir_stockage().chemin)
+        _cache_images = CacheImages(os.path.join(dossier, 'images'))
+    return _cache_images
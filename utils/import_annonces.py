@@ -0,0 +1,144 @@
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils.cache_annonces import normaliser_url
+from utils.data import ajouter_vehicules, charger_donnees
+from utils.scraping import ANALYSEURS, definir_analyseur, extraire_infos_annonce, site_supporte
+
+# Annonces téléchargées en même temps ; le débit de chaque site reste limité
+# par le client HTTP (voir utils.client_http)
+PARALLELISME = 4
+
+# Valeurs des champs que les annonces ne donnent pas, comme dans le formulaire d'ajout
+VALEURS_DEFAUT = {
+    'Consommation': 7.0,
+    'Cout_Assurance': 500,
+    'Fiabilite': 5
+}
+
+def lire_urls(texte):
+    """
+    Retourne les URL d'un texte (une par ligne), sans lignes vides ni commentaires
+    (#) et sans doublons : deux variantes d'une même annonce comptent pour une.
+    """
+    urls = {}
+    for ligne in texte.splitlines():
+        url = ligne.strip()
+        if url and not url.startswith('#'):
+            urls.setdefault(normaliser_url(url), url)
+    return list(urls.values())
+
+def vehicule_depuis_annonce(infos):
+    """Retourne l'enregistrement du véhicule correspondant aux informations extraites d'une annonce."""
+    return dict(
+        VALEURS_DEFAUT,
+        Marque=infos.get('marque', ''),
+        Modele=infos.get('modele', ''),
+        Annee=infos.get('annee'),
+        Prix=infos.get('prix'),
+        Motorisation=infos.get('motorisation'),
+        Puissance=infos.get('puissance'),
+        Transmission=infos.get('transmission'),
+        Categorie=infos.get('categorie'),
+        Type_Vendeur=infos.get('type_vendeur'),
+        Note_Vendeur=infos.get('note_vendeur'),
+        Distance=infos.get('distance'),
+        Equipements=infos.get('equipements', ''),
+        Lien_Annonce=infos.get('url', ''),
+        Image_URL=infos.get('image_url', ''),
+        Status='En attente',
+        Notes_Detaillees='',
+        Score_Match=0,
+        Coup_de_Coeur=False
+    )
+
+def importer_annonces(df, urls, parallelisme=PARALLELISME, progression=None):
+    """
+    Importe les annonces des URL données : elles sont téléchargées et analysées
+    en parallèle (au plus `parallelisme` à la fois), puis les véhicules extraits
+    sont ajoutés au stockage en une seule écriture.
+
+    progression(resultat, termines, total) est appelée, dans le thread appelant,
+    à chaque annonce terminée. Chaque résultat est un dictionnaire (url, statut,
+    message) ; le statut vaut 'ajoutee', 'deja_presente', 'non_supportee' ou 'echec'.
+    Retourne le DataFrame mis à jour et la liste des résultats, dans l'ordre des URL.
+    """
+    urls = lire_urls('\n'.join(urls))
+    existantes = set()
+    if 'Lien_Annonce' in df.columns:
+        existantes = {normaliser_url(lien) for lien in df['Lien_Annonce'].dropna() if isinstance(lien, str) and lien}
+
+    resultats = {}
+    a_extraire = []
+    for url in urls:
+        if normaliser_url(url) in existantes:
+            resultats[url] = {'url': url, 'statut': 'deja_presente', 'message': "Annonce déjà importée"}
+        elif not site_supporte(url):
+            resultats[url] = {'url': url, 'statut': 'non_supportee', 'message': "Site non supporté"}
+        else:
+            a_extraire.append(url)
+
+    termines = 0
+    def signaler(resultat):
+        nonlocal termines
+        termines += 1
+        if progression is not None:
+            progression(resultat, termines, len(urls))
+
+    for resultat in resultats.values():
+        signaler(resultat)
+
+    vehicules = {}
+    if a_extraire:
+        with ThreadPoolExecutor(max_workers=max(1, min(parallelisme, len(a_extraire))), thread_name_prefix='import') as executeur:
+            futurs = {executeur.submit(extraire_infos_annonce, url): url for url in a_extraire}
+            for futur in as_completed(futurs):
+                url = futurs[futur]
+                infos = futur.result()
+                if infos:
+                    vehicules[url] = vehicule_depuis_annonce(dict(infos, url=url))
+                    resultat = {'url': url, 'statut': 'ajoutee', 'message': f"{infos.get('marque', '')} {infos.get('modele', '')}".strip()}
+                else:
+                    resultat = {'url': url, 'statut': 'echec', 'message': "Extraction impossible"}
+                resultats[url] = resultat
+                signaler(resultat)
+
+    # Une seule écriture pour tous les véhicules extraits, dans l'ordre des URL
+    df = ajouter_vehicules(df, [vehicules[url] for url in urls if url in vehicules])
+    return df, [resultats[url] for url in urls]
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m utils.import_annonces',
+        description="Importe des annonces AutoScout24 et LeBonCoin à partir de leurs URL."
+    )
+    parser.add_argument('fichiers', nargs='*', help="Fichiers d'URL, une par ligne (entrée standard par défaut, ou -)")
+    parser.add_argument('--url', action='append', default=[], help="URL à importer (répétable)")
+    parser.add_argument('--parallelisme', type=int, default=PARALLELISME, help="Annonces téléchargées en même temps")
+    parser.add_argument('--analyseur', choices=ANALYSEURS, help="Analyseur HTML des pages (le plus rapide installé par défaut)")
+    args = parser.parse_args()
+    try:
+        definir_analyseur(args.analyseur)
+    except ValueError as erreur:
+        parser.error(str(erreur))
+
+    urls = list(args.url)
+    for fichier in args.fichiers or ([] if urls else ['-']):
+        if fichier == '-':
+            urls += lire_urls(sys.stdin.read())
+        else:
+            with open(fichier, 'r', encoding='utf-8') as f:
+                urls += lire_urls(f.read())
+
+    def afficher(resultat, termines, total):
+        print(f"[{termines}/{total}] {resultat['statut']:<14} {resultat['url']} {resultat['message']}", file=sys.stderr, flush=True)
+
+    df, _ = charger_donnees()
+    _, resultats = importer_annonces(df, urls, args.parallelisme, afficher)
+    ajoutees = sum(resultat['statut'] == 'ajoutee' for resultat in resultats)
+    print(f"{ajoutees} véhicule(s) ajouté(s) sur {len(resultats)} annonce(s)")
+    return 0 if ajoutees or not resultats else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.cache_scores import obtenir_cache_scores
+from utils.scoring import revisions_vehicules
+
+def _decimales(scores):
+    """Reconvertit des scores float32 en flottants à une décimale, comme à leur calcul."""
+    return np.round(scores.astype(float), 1)
+
+class MatriceScores:
+    """
+    Scores de tous les véhicules pour toutes les recherches sauvegardées,
+    stockés dans une matrice float32 (véhicules × recherches).
+
+    La matrice est construite en une passe : chaque recherche est scorée sur
+    toute la flotte par le calcul vectorisé (via le cache de scores). Les
+    requêtes (meilleure recherche d'un véhicule, meilleurs véhicules d'une
+    recherche) sont ensuite lues dans la matrice, sans recalcul.
+
+    La matrice est associée au DataFrame d'origine et à la révision de chaque
+    véhicule : seules les lignes des véhicules modifiés depuis sont recalculées
+    (voir actualiser).
+    """
+    def __init__(self, df, recherches, index_equipements=None):
+        self.vehicules = df.index
+        self.source = id(df)
+        self.revisions = revisions_vehicules(df)
+        self.recherches = []
+        self.invalides = {}
+        self._criteres = []
+        self._verrou = threading.Lock()
+        colonnes = []
+        cache = obtenir_cache_scores()
+        for nom, config in recherches.items():
+            # Recherche aux critères invalides, ou portant sur une colonne absente
+            # des véhicules : ignorée, avec la raison
+            try:
+                scores = cache.scores(df, config['criteres'], index_equipements)
+            except ValueError as e:
+                self.invalides[nom] = str(e)
+                continue
+            except KeyError as e:
+                self.invalides[nom] = f"colonne {e} absente des véhicules"
+                continue
+            self.recherches.append(nom)
+            self._criteres.append(config['criteres'])
+            colonnes.append(scores.to_numpy(dtype=np.float32))
+
+        if colonnes:
+            self.scores = np.column_stack(colonnes)
+        else:
+            self.scores = np.zeros((len(df), 0), dtype=np.float32)
+        self._positions = {nom: position for position, nom in enumerate(self.recherches)}
+
+    def actualiser(self, df, index_equipements=None):
+        """
+        Recalcule les lignes des seuls véhicules de df modifiés depuis la construction
+        de la matrice (révision changée). Retourne False si df n'est plus le DataFrame
+        d'origine ou n'a plus les mêmes véhicules : la matrice est alors à reconstruire.
+        """
+        if id(df) != self.source or not df.index.equals(self.vehicules):
+            return False
+        revisions = revisions_vehicules(df)
+        positions = np.flatnonzero(revisions != self.revisions)
+        if len(positions):
+            cache = obtenir_cache_scores()
+            colonnes = [
+                cache.scores(df, criteres, index_equipements, positions).to_numpy(dtype=np.float32)
+                for criteres in self._criteres
+            ]
+            with self._verrou:
+                for position, colonne in enumerate(colonnes):
+                    self.scores[positions, position] = colonne
+                self.revisions[positions] = revisions[positions]
+        return True
+
+    def _ligne(self, identifiant):
+        return self.scores[self.vehicules.get_loc(identifiant)]
+
+    def scores_vehicule(self, identifiant):
+        """
+        Retourne les scores d'un véhicule pour chaque recherche, du meilleur au moins bon.
+        """
+        scores = pd.Series(_decimales(self._ligne(identifiant)), index=self.recherches, name='Score_Match')
+        return scores.sort_values(ascending=False, kind='stable')
+
+    def meilleure_recherche(self, identifiant):
+        """
+        Retourne (nom de la recherche, score) de la recherche à laquelle le véhicule
+        correspond le mieux, ou None s'il ne correspond à aucune (aucune recherche
+        valide, ou rejeté par toutes).
+        """
+        if not self.recherches:
+            return None
+        ligne = self._ligne(identifiant)
+        position = int(np.argmax(ligne))
+        if ligne[position] <= 0:
+            return None
+        return self.recherches[position], round(float(ligne[position]), 1)
+
+    def meilleurs_vehicules(self, nom_recherche, n=10):
+        """
+        Retourne les n véhicules ayant le meilleur score pour une recherche, sous
+        forme de Series (identifiant du véhicule → score) triée par score décroissant.
+        Les véhicules rejetés (score nul) sont exclus.
+        """
+        colonne = self.scores[:, self._positions[nom_recherche]]
+        n = min(n, len(colonne))
+        if n <= 0:
+            return pd.Series(dtype=float, name='Score_Match')
+        # Sélection partielle des n meilleurs, puis tri de ces seuls n scores
+        candidats = np.argpartition(-colonne, n - 1)[:n]
+        candidats = candidats[np.argsort(-colonne[candidats], kind='stable')]
+        candidats = candidats[colonne[candidats] > 0]
+        return pd.Series(_decimales(colonne[candidats]), index=self.vehicules[candidats], name='Score_Match')
@@ -1,8 +1,22 @@
-from fpdf import FPDF
 import json
 import base64
+from fpdf import FPDF
+from utils.equipements import liste_equipements
+
+# Caractères hors latin-1 (seul encodage des polices de base de fpdf) et leur remplacement
+_REMPLACEMENTS = {'€': 'EUR', '•': '-', '✓': '+', '✗': '-', '’': "'", '“': '"', '”': '"', '…': '...'}
+
+def _latin1(texte):
+    """Rend un texte imprimable par les polices de base du PDF (latin-1)."""
+    for caractere, remplacement in _REMPLACEMENTS.items():
+        texte = texte.replace(caractere, remplacement)
+    return texte.encode('latin-1', 'replace').decode('latin-1')
 
 class VehiculePDF(FPDF):
+    """Classe personnalisée pour générer un PDF de fiche véhicule."""
+    def cell(self, w, h=0, txt='', border=0, ln=0, align='', fill=0, link=''):
+        super().cell(w, h, _latin1(str(txt)), border, ln, align, fill, link)
+
     def header(self):
         self.set_font('Arial', 'B', 15)
         self.cell(0, 10, 'Fiche Véhicule', 0, 1, 'C')
@@ -13,8 +27,45 @@ class VehiculePDF(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Page {self.page_no()}', 0, 0, 'C')
 
-def generer_pdf_vehicule(vehicule):
-    """Génère un PDF avec les informations détaillées du véhicule."""
+# Libellés des critères affichés dans le détail du score
+LIBELLES_CRITERES = {
+    'budget': "Budget", 'budget_min': "Budget minimum", 'budget_max': "Budget maximum",
+    'annee': "Année", 'annee_min': "Année minimum", 'annee_max': "Année maximum",
+    'marques': "Marque", 'categories': "Catégorie", 'motorisations': "Motorisation",
+    'puissance': "Puissance", 'puissance_min': "Puissance minimum", 'puissance_max': "Puissance maximum",
+    'transmissions': "Transmission", 'conso_max': "Consommation", 'assurance_max': "Coût assurance",
+    'type_vendeur': "Type de vendeur", 'note_vendeur': "Note vendeur", 'distance_max': "Distance"
+}
+
+def libelle_critere(nom):
+    """Retourne le libellé d'un critère de recherche."""
+    if nom.startswith('equipements_'):
+        categorie, _, equipement = nom[len('equipements_'):].partition(' ')
+        return f"Équipements {categorie} {equipement}".strip()
+    return LIBELLES_CRITERES.get(nom, nom)
+
+def lignes_detail_score(detail_score):
+    """
+    Retourne les lignes de texte décrivant le détail d'un score
+    (calculer_score_vehicule avec detail=True).
+    """
+    if detail_score['rejet']:
+        return [f"Score nul : critère obligatoire '{libelle_critere(detail_score['rejet'])}' non respecté"]
+    lignes = []
+    for terme in detail_score['criteres']:
+        ligne = f"{libelle_critere(terme['critere'])} : {terme['points']:.1f} / {terme['maximum']:.1f} pts"
+        if terme['partiel']:
+            ligne += " (crédit partiel, dans la tolérance)"
+        lignes.append(ligne)
+    if detail_score['bonus_coup_de_coeur']:
+        lignes.append(f"Bonus coup de coeur : +{detail_score['bonus_coup_de_coeur']:.1f} pts")
+    return lignes
+
+def generer_pdf_vehicule(vehicule, detail_score=None):
+    """
+    Génère un PDF contenant les informations détaillées d'un véhicule,
+    avec le détail de son score s'il est fourni.
+    """
     pdf = VehiculePDF()
     pdf.add_page()
     
@@ -25,6 +76,14 @@ def generer_pdf_vehicule(vehicule):
     pdf.set_font('Arial', '', 12)
     pdf.cell(0, 10, f"Prix: {vehicule['Prix']:,.0f} €", 0, 1)
     
+    # Score de correspondance
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, f"Score de correspondance: {vehicule['Score_Match']:.1f}%", 0, 1)
+    if detail_score:
+        pdf.set_font('Arial', '', 11)
+        for ligne in lignes_detail_score(detail_score):
+            pdf.cell(0, 8, ligne, 0, 1)
+    
     # Caractéristiques techniques
     pdf.ln(5)
     pdf.set_font('Arial', 'B', 14)
@@ -34,8 +93,18 @@ def generer_pdf_vehicule(vehicule):
     pdf.cell(0, 10, f"Fiabilité: {vehicule['Fiabilite']}/10", 0, 1)
     pdf.cell(0, 10, f"Coût assurance: {vehicule['Cout_Assurance']} €/an", 0, 1)
     
+    # Équipements
+    equipements = liste_equipements(vehicule)
+    if equipements:
+        pdf.ln(5)
+        pdf.set_font('Arial', 'B', 14)
+        pdf.cell(0, 10, "Équipements", 0, 1)
+        pdf.set_font('Arial', '', 12)
+        for equip in equipements:
+            pdf.cell(0, 10, f"• {equip}", 0, 1)
+    
     # Points forts et points faibles
-    if 'Points_Forts' in vehicule and vehicule['Points_Forts']:
+    if vehicule.get('Points_Forts'):
         pdf.ln(5)
         pdf.set_font('Arial', 'B', 14)
         pdf.cell(0, 10, "Points forts", 0, 1)
@@ -44,7 +113,7 @@ def generer_pdf_vehicule(vehicule):
             if point.strip():
                 pdf.cell(0, 10, f"✓ {point.strip()}", 0, 1)
     
-    if 'Points_Faibles' in vehicule and vehicule['Points_Faibles']:
+    if vehicule.get('Points_Faibles'):
         pdf.ln(5)
         pdf.set_font('Arial', 'B', 14)
         pdf.cell(0, 10, "Points faibles", 0, 1)
@@ -54,7 +123,7 @@ def generer_pdf_vehicule(vehicule):
                 pdf.cell(0, 10, f"✗ {point.strip()}", 0, 1)
     
     # Notes détaillées
-    if 'Notes_Detaillees' in vehicule and vehicule['Notes_Detaillees']:
+    if vehicule.get('Notes_Detaillees'):
         pdf.ln(5)
         pdf.set_font('Arial', 'B', 14)
         pdf.cell(0, 10, "Évaluation détaillée", 0, 1)
@@ -64,7 +133,7 @@ def generer_pdf_vehicule(vehicule):
             pdf.cell(0, 10, f"{critere}: {note}/5", 0, 1)
     
     # Red flags
-    if 'Red_Flags' in vehicule and vehicule['Red_Flags']:
+    if vehicule.get('Red_Flags'):
         pdf.ln(5)
         pdf.set_font('Arial', 'B', 14)
         pdf.cell(0, 10, "Points d'attention", 0, 1)
@@ -74,7 +143,7 @@ def generer_pdf_vehicule(vehicule):
                 pdf.cell(0, 10, f"• {flag.strip()}", 0, 1)
     
     # Tags
-    if 'Tags' in vehicule and vehicule['Tags']:
+    if vehicule.get('Tags'):
         pdf.ln(5)
         pdf.set_font('Arial', 'B', 14)
         pdf.cell(0, 10, "Tags", 0, 1)
@@ -84,6 +153,8 @@ def generer_pdf_vehicule(vehicule):
     return pdf.output(dest='S').encode('latin1')
 
 def get_download_link(pdf_bytes, filename):
-    """Crée un lien de téléchargement pour le PDF."""
+    """
+    Crée un lien de téléchargement pour un fichier PDF.
+    """
     b64 = base64.b64encode(pdf_bytes).decode()
-    return f'<a href="data:application/pdf;base64,{b64}" download="{filename}">Télécharger le PDF</a>' 
\ No newline at end of file
+    return f'<a href="data:application/pdf;base64,{b64}" download="{filename}">Télécharger le PDF</a>'
@@ -0,0 +1,222 @@
+import math
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# Colonnes indexées pour la recherche texte de la barre latérale : l'identité du
+# véhicule (marque, modèle, tags), recherchée de façon approchée, et ses notes,
+# texte libre où seule la recherche exacte est retenue
+COLONNES_IDENTITE = ['Marque', 'Modele', 'Tags']
+COLONNE_NOTES = 'Notes'
+COLONNES_TEXTE = COLONNES_IDENTITE + [COLONNE_NOTES]
+
+# Part minimale des trigrammes de la recherche présents dans l'identité d'un véhicule,
+# pour les recherches les plus courtes et les plus longues (voir seuil_similarite)
+SEUIL_SIMILARITE = 0.6
+SEUIL_SIMILARITE_MIN = 0.4
+# En dessous de cette longueur (lettres et chiffres), seules les correspondances
+# exactes en début de mot sont retenues : "a4" ne trouve pas une A3
+LONGUEUR_APPROCHEE = 4
+
+# Pertinence des correspondances, par ordre de classement : recherche trouvée telle
+# quelle dans l'identité, puis dans les notes, puis correspondances approchées
+# (pertinence proportionnelle à leur similarité)
+PERTINENCE_EXACTE = 1.0
+PERTINENCE_NOTES = 0.8
+PERTINENCE_APPROCHEE = 0.6
+
+_NON_ALPHANUMERIQUE = re.compile(r'[^a-z0-9]+')
+# Frontière entre lettres et chiffres : "C200" s'écrit aussi "C 200"
+_LETTRES_CHIFFRES = re.compile(r'(?<=[a-z])(?=[0-9])|(?<=[0-9])(?=[a-z])')
+
+def normaliser_texte(texte):
+    """
+    Met un texte sous forme comparable : minuscules, sans accents ni ponctuation,
+    lettres et chiffres séparés ("Série 3 E46" → "serie 3 e 46").
+    """
+    if not isinstance(texte, str):
+        return ''
+    texte = unicodedata.normalize('NFKD', texte.lower())
+    texte = ''.join(caractere for caractere in texte if not unicodedata.combining(caractere))
+    texte = _NON_ALPHANUMERIQUE.sub(' ', texte)
+    return _LETTRES_CHIFFRES.sub(' ', texte).strip()
+
+def trigrammes(texte):
+    """
+    Retourne l'ensemble des trigrammes d'un texte, chaque mot étant encadré
+    d'espaces (deux avant, un après) pour que les débuts de mots comptent.
+    """
+    resultat = set()
+    for mot in normaliser_texte(texte).split():
+        mot = f'  {mot} '
+        resultat.update(mot[position:position + 3] for position in range(len(mot) - 2))
+    return resultat
+
+def seuil_similarite(nombre_trigrammes):
+    """
+    Retourne la part minimale des trigrammes d'une recherche qu'un véhicule doit
+    contenir : plus la recherche est longue, plus elle tolère de trigrammes absents
+    ("bmw e46" trouve une BMW Série 3, "peugot" une Peugeot).
+    """
+    seuil = 0.7 - 0.03 * nombre_trigrammes
+    return min(SEUIL_SIMILARITE, max(SEUIL_SIMILARITE_MIN, seuil))
+
+def _joindre(valeurs):
+    return ' '.join(str(valeur) for valeur in valeurs if valeur is not None and not pd.isna(valeur))
+
+def textes_vehicule(vehicule):
+    """Retourne les textes indexés d'un véhicule : (identité, notes)."""
+    return _joindre(vehicule.get(colonne) for colonne in COLONNES_IDENTITE), _joindre([vehicule.get(COLONNE_NOTES)])
+
+def _textes(df, colonnes):
+    """Texte indexé de chaque véhicule d'un DataFrame pour ces colonnes."""
+    textes = pd.Series('', index=df.index)
+    for colonne in colonnes:
+        if colonne in df.columns:
+            textes = textes + ' ' + df[colonne].fillna('').astype(str)
+    return textes
+
+class IndexTrigrammes:
+    """
+    Index de trigrammes pour la recherche des véhicules sur leur marque, leur
+    modèle, leurs tags et leurs notes.
+
+    Une recherche trouvée telle quelle en début de mot ("a4" dans "Audi A4") est
+    toujours retenue, d'abord dans l'identité du véhicule (marque, modèle, tags)
+    puis dans ses notes. Les recherches d'au moins LONGUEUR_APPROCHEE caractères
+    retiennent aussi, classées après, les identités proches, tolérantes aux fautes
+    de frappe et aux espaces ("mercedes c 200" trouve une "Mercedes C200") ; les
+    notes, texte libre, ne donnent jamais de correspondance approchée.
+
+    Les véhicules de mêmes textes partagent une seule entrée : les listes de
+    trigrammes portent sur les textes distincts, peu nombreux devant la flotte.
+    L'index est tenu à jour véhicule par véhicule (ajout, modification).
+    """
+    def __init__(self, df=None):
+        self._numeros = {}
+        self._vehicules = []
+        self._textes = []
+        self._tailles = []
+        self._texte_vehicule = {}
+        # Listes de trigrammes des identités (position 0) et des notes (position 1)
+        self._listes = ({}, {})
+        self._tableaux = {}
+        if df is not None and len(df):
+            # Séparateur absent des textes normalisés
+            textes_df = _textes(df, COLONNES_IDENTITE) + '\x1f' + _textes(df, [COLONNE_NOTES])
+            codes, textes = pd.factorize(textes_df)
+            ordre = np.argsort(codes, kind='stable')
+            identifiants = df.index.to_numpy()[ordre]
+            frontieres = np.flatnonzero(np.diff(codes[ordre])) + 1
+            for texte, groupe in zip(textes, np.split(identifiants, frontieres)):
+                numero = self._numero(*texte.split('\x1f'))
+                self._vehicules[numero].update(groupe.tolist())
+                self._texte_vehicule.update(dict.fromkeys(groupe.tolist(), numero))
+
+    def _numero(self, identite, notes):
+        """
+        Retourne le numéro des textes distincts (une fois normalisés) d'un véhicule,
+        en les indexant à leur première apparition.
+        """
+        textes = (normaliser_texte(identite), normaliser_texte(notes))
+        numero = self._numeros.get(textes)
+        if numero is None:
+            numero = len(self._vehicules)
+            self._numeros[textes] = numero
+            self._vehicules.append(set())
+            self._textes.append(textes)
+            for position, texte in enumerate(textes):
+                for trigramme in trigrammes(texte):
+                    self._listes[position].setdefault(trigramme, []).append(numero)
+                    self._tableaux.pop((position, trigramme), None)
+            self._tailles.append(len(trigrammes(textes[0])))
+        return numero
+
+    def __len__(self):
+        return len(self._texte_vehicule)
+
+    def ajouter(self, identifiant, vehicule):
+        """Indexe un véhicule (ou le réindexe si ses textes ont changé)."""
+        self.retirer(identifiant)
+        numero = self._numero(*textes_vehicule(vehicule))
+        self._vehicules[numero].add(identifiant)
+        self._texte_vehicule[identifiant] = numero
+
+    def retirer(self, identifiant):
+        """Retire un véhicule de l'index ; des textes sans véhicule ne sont plus retournés."""
+        numero = self._texte_vehicule.pop(identifiant, None)
+        if numero is not None:
+            self._vehicules[numero].discard(identifiant)
+
+    def _liste(self, position, trigramme):
+        cle = (position, trigramme)
+        tableau = self._tableaux.get(cle)
+        if tableau is None:
+            tableau = np.array(self._listes[position].get(trigramme, []), dtype=np.int64)
+            self._tableaux[cle] = tableau
+        return tableau
+
+    def _candidats(self, position, requis, minimum):
+        """
+        Numéros des textes (identités en position 0, notes en 1) contenant au moins
+        minimum des trigrammes requis, et leur nombre de trigrammes communs.
+        """
+        listes = [self._liste(position, trigramme) for trigramme in requis]
+        numeros, communs = np.unique(np.concatenate(listes), return_counts=True)
+        retenus = communs >= minimum
+        return numeros[retenus], communs[retenus]
+
+    def _exactes(self, position, requete, requis):
+        """
+        Numéros des textes (voir _candidats) contenant la recherche normalisée en
+        début de mot, vérifiée sur les seuls textes ayant tous ses trigrammes requis.
+        """
+        numeros, _ = self._candidats(position, requis, len(requis))
+        recherche = ' ' + requete
+        return [numero for numero in numeros.tolist() if recherche in ' ' + self._textes[numero][position]]
+
+    def rechercher(self, texte, seuil=None):
+        """
+        Retourne la Series (identifiant du véhicule → pertinence entre 0 et 1) des
+        véhicules correspondant à la recherche, du plus au moins pertinent : la
+        recherche trouvée dans l'identité (PERTINENCE_EXACTE), puis dans les notes
+        (PERTINENCE_NOTES), puis les identités proches (PERTINENCE_APPROCHEE fois la
+        part des trigrammes de la recherche présents, au moins seuil, par défaut
+        seuil_similarite). À pertinence égale, les identités les plus courtes passent
+        en premier.
+        """
+        requete = normaliser_texte(texte)
+        recherche = trigrammes(requete)
+        if not recherche:
+            return pd.Series(dtype=float, name='Similarite')
+        # Le dernier mot peut n'être que le début d'un mot du véhicule : son
+        # trigramme final (suivi d'une espace) n'est pas requis
+        dernier = f'  {requete.split()[-1]} '[-3:]
+        requis = [trigramme for trigramme in recherche if trigramme != dernier]
+
+        pertinences = {}
+        for numero in self._exactes(1, requete, requis):
+            pertinences[numero] = PERTINENCE_NOTES
+        for numero in self._exactes(0, requete, requis):
+            pertinences[numero] = PERTINENCE_EXACTE
+        if len(requete.replace(' ', '')) >= LONGUEUR_APPROCHEE:
+            seuil = seuil_similarite(len(recherche)) if seuil is None else seuil
+            numeros, communs = self._candidats(0, recherche, math.ceil(seuil * len(recherche) - 1e-9))
+            for numero, commun in zip(numeros.tolist(), communs.tolist()):
+                if numero not in pertinences:
+                    pertinences[numero] = PERTINENCE_APPROCHEE * commun / len(recherche)
+
+        numeros = np.fromiter(pertinences, dtype=np.int64, count=len(pertinences))
+        valeurs = np.fromiter(pertinences.values(), dtype=float, count=len(pertinences))
+        tailles = np.fromiter((self._tailles[numero] for numero in numeros), dtype=np.int64, count=len(numeros))
+        ordre = np.lexsort((numeros, tailles, -valeurs))
+
+        groupes = [self._vehicules[numero] for numero in numeros[ordre]]
+        identifiants = [np.sort(np.fromiter(groupe, dtype=np.int64, count=len(groupe))) for groupe in groupes]
+        return pd.Series(
+            np.repeat(valeurs[ordre], [len(groupe) for groupe in groupes]),
+            index=np.concatenate(identifiants) if identifiants else np.array([], dtype=np.int64),
+            name='Similarite'
+        )
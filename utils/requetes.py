@@ -0,0 +1,226 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+from utils.equipements import obtenir_vocabulaire
+
+# Une condition porte sur un champ : 'dans' (valeur parmi une liste), 'entre'
+# (bornes incluses), 'tous' (contient tous les jetons), 'texte' (recherche approchée
+# sur la marque, le modèle, les tags et les notes) ou 'identifiants' (véhicules désignés)
+Condition = namedtuple('Condition', ['champ', 'operateur', 'valeur'])
+
+# Requête normalisée : conditions triées par champ, empreinte des critères de la
+# recherche dont les scores sont filtrés (None sans filtre de score)
+Requete = namedtuple('Requete', ['conditions', 'empreinte'])
+
+# Filtres de la barre latérale : clé → (champ, opérateur)
+FILTRES = {
+    'vehicules': ('Index', 'identifiants'),
+    'search': ('Marque/Modele', 'texte'),
+    'status': ('Status', 'dans'),
+    'marques': ('Marque', 'dans'),
+    'motorisations': ('Motorisation', 'dans'),
+    'transmissions': ('Transmission', 'dans'),
+    'types_vendeur': ('Type_Vendeur', 'dans'),
+    'equipements': ('Equipements', 'tous'),
+    'tags': ('Tags', 'tous'),
+    'prix_range': ('Prix', 'entre'),
+    'annee_range': ('Annee', 'entre'),
+    'puissance_range': ('Puissance', 'entre'),
+    'score_range': ('Score_Match', 'entre')
+}
+
+# Ordre d'évaluation : les conditions les moins coûteuses d'abord, les suivantes
+# ne portant que sur les véhicules encore retenus
+COUTS = {'identifiants': 0, 'entre': 1, 'dans': 2, 'tous': 3, 'texte': 4}
+
+def _jetons(texte):
+    return {jeton.strip() for jeton in texte.lower().split(',')} - {''}
+
+def _valeur_normalisee(operateur, valeur):
+    """Retourne la forme canonique (hashable) de la valeur d'un filtre, ou None si le filtre est vide."""
+    if operateur == 'texte':
+        valeur = valeur.strip().lower() if isinstance(valeur, str) else ''
+        return valeur or None
+    if operateur == 'entre':
+        if valeur is None:
+            return None
+        minimum, maximum = valeur
+        return (float(minimum), float(maximum))
+    if operateur == 'identifiants':
+        return None if valeur is None else tuple(sorted({int(identifiant) for identifiant in valeur}))
+    if operateur == 'tous':
+        valeurs = {str(v).strip().lower() for v in valeur or []} - {''}
+        return tuple(sorted(valeurs)) or None
+    valeurs = set(valeur or [])
+    return tuple(sorted(valeurs, key=str)) or None
+
+def normaliser_filtres(filtres, empreinte=None):
+    """
+    Retourne la requête normalisée (hashable) correspondant à un dictionnaire de
+    filtres : les filtres vides sont ignorés, les listes triées et dédoublonnées,
+    le texte recherché mis en minuscules. Deux jeux de filtres équivalents donnent
+    la même requête. Le filtre de score exige l'empreinte des critères de la recherche.
+    """
+    conditions = []
+    for cle, (champ, operateur) in FILTRES.items():
+        valeur = _valeur_normalisee(operateur, filtres.get(cle))
+        if valeur is not None:
+            conditions.append(Condition(champ, operateur, valeur))
+    avec_score = any(condition.champ == 'Score_Match' for condition in conditions)
+    if avec_score and empreinte is None:
+        raise ValueError("Le filtre de score exige une recherche active")
+    return Requete(tuple(sorted(conditions)), empreinte if avec_score else None)
+
+def _colonne(df, colonne, positions):
+    valeurs = df[colonne]
+    return valeurs if positions is None else valeurs.iloc[positions]
+
+def _contient_tous(textes, jetons):
+    """Masque des textes (listes séparées par des virgules) contenant tous les jetons. Chaque texte distinct n'est découpé qu'une fois."""
+    codes, uniques = pd.factorize(textes)
+    presents = np.array([set(jetons) <= _jetons(texte) for texte in uniques] + [False], dtype=bool)
+    return presents[codes]
+
+def _evaluer_condition(df, condition, positions, scores, correspondances):
+    """Retourne le masque de la condition pour les véhicules aux positions données (tous si None)."""
+    champ, operateur, valeur = condition
+    if operateur == 'identifiants':
+        index = df.index if positions is None else df.index[positions]
+        return index.isin(valeur)
+    if operateur == 'texte' and correspondances is not None:
+        index = df.index if positions is None else df.index[positions]
+        return index.isin(correspondances(valeur))
+    if operateur == 'texte':
+        # Sans index de recherche : sous-chaîne de la marque ou du modèle
+        masque = np.zeros(len(df) if positions is None else len(positions), dtype=bool)
+        for colonne in ('Marque', 'Modele'):
+            # Peu de marques et de modèles distincts : seules les valeurs distinctes sont comparées
+            codes, uniques = pd.factorize(_colonne(df, colonne, positions))
+            trouves = pd.Series(uniques, dtype=object).str.lower().str.contains(valeur, regex=False, na=False)
+            masque |= np.append(trouves.to_numpy(dtype=bool), False)[codes]
+        return masque
+    if operateur == 'entre':
+        if champ == 'Score_Match':
+            valeurs = scores(np.arange(len(df)) if positions is None else positions)
+        else:
+            valeurs = pd.to_numeric(_colonne(df, champ, positions), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        return (valeurs >= valeur[0]) & (valeurs <= valeur[1])
+    if operateur == 'tous' and champ == 'Equipements':
+        vocabulaire = obtenir_vocabulaire()
+        connus = np.uint64(vocabulaire.masque(valeur))
+        masques = _colonne(df, 'Equipements_Bits', positions).fillna(0).to_numpy(dtype=np.uint64)
+        masque = (masques & connus) == connus
+        extras = [equip for equip in valeur if vocabulaire.bit(equip) is None]
+        if extras:
+            masque &= _contient_tous(_colonne(df, 'Equipements_Extras', positions), extras)
+        return masque
+    if operateur == 'tous':
+        return _contient_tous(_colonne(df, champ, positions), valeur)
+    return _colonne(df, champ, positions).isin(valeur).to_numpy()
+
+def evaluer(df, requete, positions=None, scores=None, correspondances=None):
+    """
+    Retourne le tableau trié des positions (dans df) des véhicules vérifiant toutes
+    les conditions de la requête, parmi les positions données (toutes si None).
+    Les conditions sont évaluées de la moins à la plus coûteuse, chacune sur les
+    seuls véhicules encore retenus. scores(positions) retourne les scores de la
+    recherche de la requête pour ces positions (filtre de score uniquement) ;
+    correspondances(texte) les identifiants des véhicules trouvés par la recherche
+    texte (voir utils.recherche_texte), à défaut de quoi le texte est cherché tel quel
+    dans la marque et le modèle.
+    """
+    conditions = sorted(
+        requete.conditions,
+        key=lambda condition: 5 if condition.champ == 'Score_Match' else COUTS[condition.operateur]
+    )
+    for condition in conditions:
+        if positions is not None and not len(positions):
+            break
+        masque = np.asarray(_evaluer_condition(df, condition, positions, scores, correspondances), dtype=bool)
+        positions = np.flatnonzero(masque) if positions is None else positions[masque]
+    if positions is None:
+        positions = np.arange(len(df))
+    return positions
+
+def _implique(condition, large):
+    """Indique si tout véhicule vérifiant condition vérifie aussi large (même champ)."""
+    if condition == large:
+        return True
+    operateur, valeur, valeur_large = condition.operateur, condition.valeur, large.valeur
+    if operateur == 'entre':
+        return valeur_large[0] <= valeur[0] and valeur[1] <= valeur_large[1]
+    if operateur == 'texte':
+        # Recherche approchée : un texte plus long peut trouver d'autres véhicules
+        return False
+    if operateur == 'tous':
+        return set(valeur_large) <= set(valeur)
+    return set(valeur) <= set(valeur_large)
+
+def _affine(requete, large):
+    """Indique si les résultats de requete sont inclus dans ceux de large."""
+    if large.empreinte is not None and large.empreinte != requete.empreinte:
+        return False
+    conditions = {condition.champ: condition for condition in requete.conditions}
+    return all(
+        condition.champ in conditions and _implique(conditions[condition.champ], condition)
+        for condition in large.conditions
+    )
+
+class MoteurRequetes:
+    """
+    Évalue des requêtes de filtrage et garde en cache (LRU) les positions des
+    véhicules retenus, par (version des données, requête). Une requête déjà posée
+    est servie sans calcul ; une requête plus restrictive qu'une requête en cache
+    (filtre ajouté, liste réduite, intervalle resserré...) n'est évaluée que sur
+    les résultats de celle-ci.
+    """
+    def __init__(self, taille=64):
+        self.taille = taille
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+        self._compteurs = {'hits': 0, 'affinages': 0, 'misses': 0}
+
+    def positions(self, df, requete, version, scores=None, correspondances=None):
+        """
+        Retourne le tableau trié (en lecture seule) des positions des véhicules de df
+        vérifiant la requête. version identifie l'état des données de df : toute
+        modification des véhicules doit la changer.
+        """
+        cle = (version, requete)
+        with self._verrou:
+            resultat = self._entrees.get(cle)
+            if resultat is not None:
+                self._entrees.move_to_end(cle)
+                self._compteurs['hits'] += 1
+                return resultat
+            # Plus petit résultat en cache contenant celui de la requête
+            base = None
+            for (version_entree, large), positions in self._entrees.items():
+                if version_entree == version and _affine(requete, large) and (base is None or len(positions) < len(base[1])):
+                    base = (large, positions)
+
+        if base is None:
+            resultat = evaluer(df, requete, scores=scores, correspondances=correspondances)
+            compteur = 'misses'
+        else:
+            large, positions = base
+            restantes = tuple(condition for condition in requete.conditions if condition not in large.conditions)
+            resultat = evaluer(df, requete._replace(conditions=restantes), positions, scores, correspondances)
+            compteur = 'affinages'
+        resultat.flags.writeable = False
+
+        with self._verrou:
+            self._compteurs[compteur] += 1
+            self._entrees[cle] = resultat
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+        return resultat
+
+    def statistiques(self):
+        """Retourne les compteurs de requêtes servies par le cache, affinées ou évaluées."""
+        with self._verrou:
+            return dict(self._compteurs)
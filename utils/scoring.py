@@ -1,175 +1,955 @@
-def calculer_score_vehicule(vehicule, criteres):
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from utils.equipements import compter_bits, obtenir_vocabulaire
+
+# Version du calcul des scores, à incrémenter à toute modification qui change les
+# scores obtenus : les scores enregistrés par une version précédente sont ignorés
+VERSION_SCORING = 1
+
+# Catégories d'équipements prises en compte dans le score
+CATEGORIES_EQUIPEMENTS = ['securite', 'confort', 'multimedia', 'exterieur', 'pratique']
+
+# Critères numériques obligatoires : (colonne, sens, colonne requise)
+# Un véhicule est rejeté si sa valeur est sous le minimum ('min') ou au-dessus du maximum ('max').
+# Une colonne non requise vaut 0 si elle est absente (comme vehicule.get(colonne, 0)).
+CRITERES_NUMERIQUES = {
+    'budget_min': ('Prix', 'min', True),
+    'budget_max': ('Prix', 'max', True),
+    'annee_min': ('Annee', 'min', True),
+    'annee_max': ('Annee', 'max', True),
+    'puissance_min': ('Puissance', 'min', False),
+    'puissance_max': ('Puissance', 'max', False),
+    'conso_max': ('Consommation', 'max', True),
+    'assurance_max': ('Cout_Assurance', 'max', True),
+    'note_vendeur': ('Note_Vendeur', 'min', False),
+    'distance_max': ('Distance', 'max', False)
+}
+
+# Critères de liste : le véhicule doit avoir une des valeurs sélectionnées
+CRITERES_LISTES = {
+    'marques': 'Marque',
+    'categories': 'Categorie',
+    'motorisations': 'Motorisation',
+    'transmissions': 'Transmission',
+    'type_vendeur': 'Type_Vendeur'
+}
+
+@dataclass(frozen=True)
+class PlanScoring:
     """
-    Calcule le score de correspondance d'un véhicule par rapport aux critères définis.
-    Retourne un score entre 0 et 100, ou 0 si un critère obligatoire n'est pas respecté.
+    Critères d'une recherche compilés une fois pour toutes.
+
+    - empreinte : hash des critères d'origine
+    - poids_total : somme des poids servant à normaliser le score
+    - obligatoires : règles de rejet (nom, colonne, sens, valeur, colonne requise),
+      sens valant 'min', 'max' ou 'liste'
+    - equipements_obligatoires : (nom du critère, équipement en minuscules)
+    - termes : contributions au score, dans l'ordre du calcul
     """
-    score = 0
+    empreinte: str
+    poids_total: float
+    obligatoires: tuple
+    equipements_obligatoires: tuple
+    termes: tuple
+
+    def equipements(self):
+        """Retourne l'ensemble des équipements (en minuscules) utilisés par le plan."""
+        noms = {equip for _, equip in self.equipements_obligatoires}
+        for terme in self.termes:
+            if terme[0] == 'equipements':
+                noms.update(equip for equip, _ in terme[2])
+        return noms
+
+def _verifier_nombre(nom, valeur, champ):
+    if isinstance(valeur, bool) or not isinstance(valeur, (int, float)):
+        raise ValueError(f"Critère '{nom}' : {champ} numérique attendu, reçu {valeur!r}")
+
+def empreinte_criteres(criteres):
+    """
+    Retourne un hash stable des critères d'une recherche.
+    """
+    texte = json.dumps(criteres, ensure_ascii=False, default=str)
+    return hashlib.sha1(texte.encode('utf-8')).hexdigest()
+
+def _compiler(criteres, empreinte):
+    """
+    Valide les critères et construit le plan de scoring correspondant.
+    """
+    for nom, critere in criteres.items():
+        if not isinstance(critere, dict):
+            continue
+        if 'poids' in critere:
+            _verifier_nombre(nom, critere['poids'], 'poids')
+        if nom in CRITERES_NUMERIQUES or nom in CRITERES_LISTES:
+            if 'valeur' not in critere:
+                raise ValueError(f"Critère '{nom}' : valeur manquante")
+            if nom in CRITERES_NUMERIQUES:
+                _verifier_nombre(nom, critere['valeur'], 'valeur')
+            elif not isinstance(critere['valeur'], (list, tuple)):
+                raise ValueError(f"Critère '{nom}' : liste de valeurs attendue")
+
     poids_total = sum(critere['poids'] for critere in criteres.values() if isinstance(critere, dict) and 'poids' in critere)
-    
-    # Vérification des critères obligatoires
+    if not poids_total:
+        raise ValueError("Aucun critère pondéré : la somme des poids est nulle")
+
+    # Règles de rejet
+    obligatoires = []
     for nom, critere in criteres.items():
         if isinstance(critere, dict) and critere.get('obligatoire', False):
-            if nom == 'budget_min' and vehicule['Prix'] < critere['valeur']:
-                return 0
-            elif nom == 'budget_max' and vehicule['Prix'] > critere['valeur']:
-                return 0
-            elif nom == 'annee_min' and vehicule['Annee'] < critere['valeur']:
-                return 0
-            elif nom == 'annee_max' and vehicule['Annee'] > critere['valeur']:
-                return 0
-            elif nom == 'marques' and critere['valeur'] and vehicule['Marque'] not in critere['valeur']:
-                return 0
-            elif nom == 'categories' and critere['valeur'] and vehicule.get('Categorie') not in critere['valeur']:
-                return 0
-            elif nom == 'motorisations' and critere['valeur'] and vehicule.get('Motorisation') not in critere['valeur']:
-                return 0
-            elif nom == 'puissance_min' and vehicule.get('Puissance', 0) < critere['valeur']:
-                return 0
-            elif nom == 'puissance_max' and vehicule.get('Puissance', 0) > critere['valeur']:
-                return 0
-            elif nom == 'transmissions' and critere['valeur'] and vehicule.get('Transmission') not in critere['valeur']:
-                return 0
-            elif nom == 'conso_max' and vehicule['Consommation'] > critere['valeur']:
-                return 0
-            elif nom == 'assurance_max' and vehicule['Cout_Assurance'] > critere['valeur']:
-                return 0
-            elif nom == 'type_vendeur' and critere['valeur'] and vehicule.get('Type_Vendeur') not in critere['valeur']:
-                return 0
-            elif nom == 'note_vendeur' and vehicule.get('Note_Vendeur', 0) < critere['valeur']:
-                return 0
-            elif nom == 'distance_max' and vehicule.get('Distance', 0) > critere['valeur']:
-                return 0
-    
-    # Calcul du score pour les critères non obligatoires
-    # Budget
+            if nom in CRITERES_NUMERIQUES:
+                colonne, sens, requise = CRITERES_NUMERIQUES[nom]
+                obligatoires.append((nom, colonne, sens, critere['valeur'], requise))
+            elif nom in CRITERES_LISTES and critere['valeur']:
+                obligatoires.append((nom, CRITERES_LISTES[nom], 'liste', tuple(critere['valeur']), False))
+
+    def poids(nom):
+        if 'poids' not in criteres[nom]:
+            raise ValueError(f"Critère '{nom}' : poids manquant")
+        return criteres[nom]['poids']
+
+    def liste(nom):
+        if nom in criteres and criteres[nom]['valeur']:
+            termes.append(('liste', nom, CRITERES_LISTES[nom], tuple(criteres[nom]['valeur']), poids(nom)))
+
+    # Termes du score, dans l'ordre historique du calcul
+    termes = []
     if 'budget_min' in criteres and 'budget_max' in criteres:
-        if criteres['budget_min']['valeur'] <= vehicule['Prix'] <= criteres['budget_max']['valeur']:
-            score += (criteres['budget_min']['poids'] + criteres['budget_max']['poids']) / 2
-        else:
-            # Score partiel si proche des limites (tolérance de 20%)
-            if vehicule['Prix'] < criteres['budget_min']['valeur']:
-                ecart = (criteres['budget_min']['valeur'] - vehicule['Prix']) / criteres['budget_min']['valeur']
-                if ecart <= 0.2:
-                    score += (criteres['budget_min']['poids'] + criteres['budget_max']['poids']) / 2 * (1 - ecart)
-            else:
-                ecart = (vehicule['Prix'] - criteres['budget_max']['valeur']) / criteres['budget_max']['valeur']
-                if ecart <= 0.2:
-                    score += (criteres['budget_min']['poids'] + criteres['budget_max']['poids']) / 2 * (1 - ecart)
-    
-    # Année
+        termes.append(('plage', 'budget', 'Prix', criteres['budget_min']['valeur'], criteres['budget_max']['valeur'],
+                       (poids('budget_min') + poids('budget_max')) / 2, 0.2, True))
     if 'annee_min' in criteres and 'annee_max' in criteres:
-        if criteres['annee_min']['valeur'] <= vehicule['Annee'] <= criteres['annee_max']['valeur']:
-            score += (criteres['annee_min']['poids'] + criteres['annee_max']['poids']) / 2
-        else:
-            # Score partiel si proche des limites (tolérance de 2 ans)
-            if vehicule['Annee'] < criteres['annee_min']['valeur']:
-                diff = criteres['annee_min']['valeur'] - vehicule['Annee']
-                if diff <= 2:
-                    score += (criteres['annee_min']['poids'] + criteres['annee_max']['poids']) / 2 * (1 - diff/2)
-            else:
-                diff = vehicule['Annee'] - criteres['annee_max']['valeur']
-                if diff <= 2:
-                    score += (criteres['annee_min']['poids'] + criteres['annee_max']['poids']) / 2 * (1 - diff/2)
-    
-    # Marques
-    if 'marques' in criteres and criteres['marques']['valeur']:
-        if vehicule['Marque'] in criteres['marques']['valeur']:
-            score += criteres['marques']['poids']
-    
-    # Catégories
-    if 'categories' in criteres and criteres['categories']['valeur']:
-        if vehicule.get('Categorie') in criteres['categories']['valeur']:
-            score += criteres['categories']['poids']
-    
-    # Motorisation
-    if 'motorisations' in criteres and criteres['motorisations']['valeur']:
-        if vehicule.get('Motorisation') in criteres['motorisations']['valeur']:
-            score += criteres['motorisations']['poids']
-    
-    # Puissance
-    if 'puissance_min' in criteres and 'puissance_max' in criteres and vehicule.get('Puissance'):
-        if criteres['puissance_min']['valeur'] <= vehicule['Puissance'] <= criteres['puissance_max']['valeur']:
-            score += (criteres['puissance_min']['poids'] + criteres['puissance_max']['poids']) / 2
-    
-    # Transmission
-    if 'transmissions' in criteres and criteres['transmissions']['valeur']:
-        if vehicule.get('Transmission') in criteres['transmissions']['valeur']:
-            score += criteres['transmissions']['poids']
-    
-    # Consommation
+        termes.append(('plage', 'annee', 'Annee', criteres['annee_min']['valeur'], criteres['annee_max']['valeur'],
+                       (poids('annee_min') + poids('annee_max')) / 2, 2, False))
+    liste('marques')
+    liste('categories')
+    liste('motorisations')
+    if 'puissance_min' in criteres and 'puissance_max' in criteres:
+        termes.append(('intervalle', 'puissance', 'Puissance', criteres['puissance_min']['valeur'],
+                       criteres['puissance_max']['valeur'], (poids('puissance_min') + poids('puissance_max')) / 2))
+    liste('transmissions')
     if 'conso_max' in criteres:
-        if vehicule['Consommation'] <= criteres['conso_max']['valeur']:
-            score += criteres['conso_max']['poids']
-        else:
-            # Score partiel si proche de la consommation max (tolérance de 20%)
-            depassement = (vehicule['Consommation'] - criteres['conso_max']['valeur']) / criteres['conso_max']['valeur']
-            if depassement <= 0.2:
-                score += criteres['conso_max']['poids'] * (1 - depassement)
-    
-    # Assurance
+        termes.append(('plafond', 'conso_max', 'Consommation', criteres['conso_max']['valeur'], poids('conso_max'), True))
     if 'assurance_max' in criteres:
-        if vehicule['Cout_Assurance'] <= criteres['assurance_max']['valeur']:
-            score += criteres['assurance_max']['poids']
-        else:
-            # Score partiel si proche du coût max (tolérance de 20%)
-            depassement = (vehicule['Cout_Assurance'] - criteres['assurance_max']['valeur']) / criteres['assurance_max']['valeur']
-            if depassement <= 0.2:
-                score += criteres['assurance_max']['poids'] * (1 - depassement)
-    
-    # Type de vendeur
-    if 'type_vendeur' in criteres and criteres['type_vendeur']['valeur']:
-        if vehicule.get('Type_Vendeur') in criteres['type_vendeur']['valeur']:
-            score += criteres['type_vendeur']['poids']
-    
-    # Note vendeur
-    if 'note_vendeur' in criteres and vehicule.get('Note_Vendeur'):
-        if vehicule['Note_Vendeur'] >= criteres['note_vendeur']['valeur']:
-            score += criteres['note_vendeur']['poids']
-        else:
-            # Score partiel si proche de la note minimale (tolérance de 1 point)
-            diff = criteres['note_vendeur']['valeur'] - vehicule['Note_Vendeur']
-            if diff <= 1:
-                score += criteres['note_vendeur']['poids'] * (1 - diff)
-    
-    # Distance
-    if 'distance_max' in criteres and vehicule.get('Distance'):
-        if vehicule['Distance'] <= criteres['distance_max']['valeur']:
-            score += criteres['distance_max']['poids']
-        else:
-            # Score partiel si proche de la distance max (tolérance de 20%)
-            depassement = (vehicule['Distance'] - criteres['distance_max']['valeur']) / criteres['distance_max']['valeur']
-            if depassement <= 0.2:
-                score += criteres['distance_max']['poids'] * (1 - depassement)
-    
+        termes.append(('plafond', 'assurance_max', 'Cout_Assurance', criteres['assurance_max']['valeur'], poids('assurance_max'), True))
+    liste('type_vendeur')
+    if 'note_vendeur' in criteres:
+        termes.append(('plancher', 'note_vendeur', 'Note_Vendeur', criteres['note_vendeur']['valeur'], poids('note_vendeur')))
+    if 'distance_max' in criteres:
+        termes.append(('plafond', 'distance_max', 'Distance', criteres['distance_max']['valeur'], poids('distance_max'), False))
+
     # Équipements par catégorie avec poids individuels
-    equips_vehicule = set(map(str.strip, vehicule['Equipements'].lower().split(',')))
-    for categorie in ['securite', 'confort', 'multimedia', 'exterieur', 'pratique']:
-        critere_key = f'equipements_{categorie}'
-        if critere_key in criteres and criteres[critere_key]['valeur']:
-            score_equipements = 0
+    equipements_obligatoires = []
+    for categorie in CATEGORIES_EQUIPEMENTS:
+        nom = f'equipements_{categorie}'
+        if nom in criteres and criteres[nom]['valeur']:
+            ponderes = []
+            for equip, config in criteres[nom].get('poids_individuels', {}).items():
+                if config.get('obligatoire', False):
+                    equipements_obligatoires.append((nom, equip.lower()))
+                else:
+                    _verifier_nombre(f'{nom}/{equip}', config.get('poids'), 'poids')
+                    ponderes.append((equip.lower(), config['poids']))
             poids_total_equipements = 0
-            
-            # Vérification des équipements obligatoires
-            for equip, config in criteres[critere_key]['poids_individuels'].items():
-                if config.get('obligatoire', False) and equip.lower() not in equips_vehicule:
-                    return 0
-            
-            # Calcul du score pour les équipements non obligatoires
-            for equip, config in criteres[critere_key]['poids_individuels'].items():
-                if not config.get('obligatoire', False):
-                    poids = config['poids']
-                    poids_total_equipements += poids
-                    if equip.lower() in equips_vehicule:
-                        score_equipements += poids
-            
+            for _, poids_equipement in ponderes:
+                poids_total_equipements += poids_equipement
             if poids_total_equipements > 0:
-                score += (score_equipements / poids_total_equipements) * 2  # Poids de base de 2 pour les équipements
-    
+                termes.append(('equipements', nom, tuple(ponderes), poids_total_equipements))
+
+    return PlanScoring(
+        empreinte=empreinte,
+        poids_total=poids_total,
+        obligatoires=tuple(obligatoires),
+        equipements_obligatoires=tuple(equipements_obligatoires),
+        termes=tuple(termes)
+    )
+
+# Plans déjà compilés, par empreinte des critères
+_plans = OrderedDict()
+_TAILLE_MAX_PLANS = 128
+
+def compiler_criteres(criteres):
+    """
+    Compile les critères d'une recherche (recherches[nom]['criteres']) en un plan
+    de scoring immuable et validé. Lève ValueError si les critères sont invalides.
+    Les plans sont mis en cache par empreinte des critères.
+    """
+    if isinstance(criteres, PlanScoring):
+        return criteres
+    empreinte = empreinte_criteres(criteres)
+    plan = _plans.get(empreinte)
+    if plan is None:
+        plan = _compiler(criteres, empreinte)
+        _plans[empreinte] = plan
+        if len(_plans) > _TAILLE_MAX_PLANS:
+            _plans.popitem(last=False)
+    else:
+        _plans.move_to_end(empreinte)
+    return plan
+
+class _EquipementsVehicule:
+    """
+    Équipements d'un véhicule, testés par bit sur son masque (calculé au chargement,
+    ou à défaut encodé depuis son texte) et par nom pour les équipements hors vocabulaire.
+    """
+    def __init__(self, vehicule):
+        self.vocabulaire = obtenir_vocabulaire()
+        if 'Equipements_Bits' in vehicule and not pd.isna(vehicule['Equipements_Bits']):
+            self.masque = int(vehicule['Equipements_Bits'])
+            extras = vehicule.get('Equipements_Extras', '')
+        else:
+            self.masque, extras = self.vocabulaire.encoder(vehicule['Equipements'])
+        self.extras = set(map(str.strip, extras.lower().split(','))) if isinstance(extras, str) else set()
+
+    def __contains__(self, equip):
+        bit = self.vocabulaire.bit(equip)
+        if bit is None:
+            return equip in self.extras
+        return bool(self.masque & bit)
+
+def _valeur(vehicule, colonne, requise):
+    return vehicule[colonne] if requise else vehicule.get(colonne, 0)
+
+def _detail(score, rejet=None, termes=None, bonus=0.0):
+    """
+    Construit le détail d'un score : critère obligatoire ayant causé le rejet,
+    et pour chaque critère sa contribution en points sur 100.
+    """
+    return {'score': score, 'rejet': rejet, 'criteres': termes or [], 'bonus_coup_de_coeur': bonus}
+
+def calculer_score_vehicule(vehicule, criteres, detail=False):
+    """
+    Calcule le score de correspondance d'un véhicule par rapport aux critères définis
+    (dictionnaire de critères ou plan compilé).
+    Retourne un score entre 0 et 100, ou 0 si un critère obligatoire n'est pas respecté.
+
+    Avec detail=True, retourne (score, détail), le détail étant calculé dans la même
+    passe : dictionnaire avec 'rejet' (critère obligatoire non respecté, ou None),
+    'criteres' (pour chaque critère : nom, points obtenus et maximum sur 100, crédit
+    partiel dû à une tolérance) et 'bonus_coup_de_coeur' (points du bonus).
+    """
+    plan = compiler_criteres(criteres)
+
+    # Vérification des critères obligatoires
+    for nom, colonne, sens, valeur, requise in plan.obligatoires:
+        if ((sens == 'liste' and vehicule.get(colonne) not in valeur)
+                or (sens == 'min' and _valeur(vehicule, colonne, requise) < valeur)
+                or (sens == 'max' and _valeur(vehicule, colonne, requise) > valeur)):
+            return (0, _detail(0, nom)) if detail else 0
+
+    equips_vehicule = None
+    if plan.equipements_obligatoires or any(terme[0] == 'equipements' for terme in plan.termes):
+        equips_vehicule = _EquipementsVehicule(vehicule)
+        for nom, equip in plan.equipements_obligatoires:
+            if equip not in equips_vehicule:
+                return (0, _detail(0, f"{nom} ({equip})")) if detail else 0
+
+    # Calcul du score
+    score = 0
+    termes = [] if detail else None
+    for terme in plan.termes:
+        genre = terme[0]
+        apport = 0
+        partiel = False
+        if genre == 'plage':
+            # Score partiel si proche des limites (tolérance relative de 20% ou de 2 ans)
+            _, _, colonne, mini, maxi, poids, tolerance, relative = terme
+            valeur = vehicule[colonne]
+            if mini <= valeur <= maxi:
+                apport = poids
+            else:
+                if valeur < mini:
+                    ecart = (mini - valeur) / mini if relative else mini - valeur
+                else:
+                    ecart = (valeur - maxi) / maxi if relative else valeur - maxi
+                if ecart <= tolerance:
+                    apport = poids * (1 - ecart if relative else 1 - ecart / tolerance)
+                    partiel = True
+        elif genre == 'liste':
+            _, _, colonne, valeurs, poids = terme
+            if vehicule.get(colonne) in valeurs:
+                apport = poids
+        elif genre == 'intervalle':
+            _, _, colonne, mini, maxi, poids = terme
+            if vehicule.get(colonne) and mini <= vehicule[colonne] <= maxi:
+                apport = poids
+        elif genre == 'plafond':
+            # Score partiel si proche du maximum (tolérance de 20%)
+            _, _, colonne, maxi, poids, requise = terme
+            if requise or vehicule.get(colonne):
+                valeur = vehicule[colonne]
+                if valeur <= maxi:
+                    apport = poids
+                else:
+                    depassement = (valeur - maxi) / maxi
+                    if depassement <= 0.2:
+                        apport = poids * (1 - depassement)
+                        partiel = True
+        elif genre == 'plancher':
+            # Score partiel si proche du minimum (tolérance de 1 point)
+            _, _, colonne, mini, poids = terme
+            if vehicule.get(colonne):
+                valeur = vehicule[colonne]
+                if valeur >= mini:
+                    apport = poids
+                else:
+                    diff = mini - valeur
+                    if diff <= 1:
+                        apport = poids * (1 - diff)
+                        partiel = True
+        elif genre == 'equipements':
+            _, _, ponderes, poids_total_equipements = terme
+            score_equipements = 0
+            for equip, poids in ponderes:
+                if equip in equips_vehicule:
+                    score_equipements += poids
+            apport = (score_equipements / poids_total_equipements) * 2  # Poids de base de 2 pour les équipements
+            poids = 2
+        score += apport
+        if termes is not None:
+            termes.append({
+                'critere': terme[1],
+                'points': float(apport / plan.poids_total * 100),
+                'maximum': float(poids / plan.poids_total * 100),
+                'partiel': partiel
+            })
+
     # Normalisation du score sur 100
-    score_final = (score / poids_total) * 100
-    
+    score_final = (score / plan.poids_total) * 100
+
     # Bonus pour les véhicules "coup de cœur"
+    bonus = 0.0
     if vehicule.get('Coup_de_Coeur', False):
+        score_base = score_final
         score_final = min(100, score_final * 1.1)  # Bonus de 10%, plafonné à 100
-    
-    return round(score_final, 1) 
\ No newline at end of file
+        bonus = float(score_final - score_base)
+
+    # Conversion en float : l'arrondi ne dépend pas du type (NumPy ou Python) des valeurs de la ligne
+    score_final = round(float(score_final), 1)
+    return (score_final, _detail(score_final, None, termes, bonus)) if detail else score_final
+
+def _colonne_numerique(df, nom, obligatoire=False):
+    """
+    Retourne une colonne sous forme de tableau NumPy de flottants.
+    Une colonne absente vaut 0 (comme vehicule.get(nom, 0)), sauf si elle est
+    obligatoire : l'accès lève alors KeyError comme vehicule[nom].
+    """
+    if nom not in df.columns and not obligatoire:
+        return np.zeros(len(df))
+    return pd.to_numeric(df[nom], errors='coerce').to_numpy(dtype=float)
+
+def _appartient(df, nom, valeurs):
+    """
+    Masque des véhicules dont la colonne prend une des valeurs données
+    (équivalent vectorisé de vehicule.get(nom) in valeurs).
+    """
+    if nom not in df.columns:
+        return np.full(len(df), None in valeurs)
+    return df[nom].isin(valeurs).to_numpy()
+
+def _masques_equipements(df):
+    """
+    Retourne les masques uint64 des équipements connus de chaque véhicule et la
+    Series de leurs équipements hors vocabulaire : colonnes Equipements_Bits et
+    Equipements_Extras si le DataFrame les possède, sinon encodage du texte.
+    """
+    if 'Equipements_Bits' in df.columns:
+        masques = df['Equipements_Bits'].fillna(0).to_numpy(dtype=np.uint64)
+        extras = df['Equipements_Extras'] if 'Equipements_Extras' in df.columns else pd.Series('', index=df.index)
+        return masques, extras
+    return obtenir_vocabulaire().encoder_serie(df['Equipements'])
+
+def _presences_extras(extras, equipements):
+    """
+    Retourne, pour chaque équipement hors vocabulaire demandé (en minuscules), le
+    masque des véhicules qui le possèdent. Chaque texte distinct n'est découpé qu'une fois.
+    """
+    codes, textes = pd.factorize(extras)
+    presences_textes = {equip: np.zeros(len(textes) + 1, dtype=bool) for equip in equipements}
+    for position, texte in enumerate(textes):
+        for jeton in set(map(str.strip, texte.lower().split(','))):
+            if jeton in presences_textes:
+                presences_textes[jeton][position] = True
+    # Le code -1 (valeur manquante) pointe sur la dernière case, toujours fausse
+    return {equip: presence[codes] for equip, presence in presences_textes.items()}
+
+def revisions_vehicules(df, positions=None):
+    """
+    Retourne les révisions (int64) des véhicules de df, ou de ceux aux positions
+    données. Sans colonne Revision, toutes les révisions valent 0.
+    """
+    n = len(df) if positions is None else len(positions)
+    if 'Revision' not in df.columns:
+        return np.zeros(n, dtype=np.int64)
+    revisions = df['Revision'].to_numpy()
+    if positions is not None:
+        revisions = revisions[positions]
+    return pd.Series(revisions).fillna(0).to_numpy(dtype=np.int64)
+
+def _sans_poids(critere):
+    """
+    Retourne un critère sans ses poids. Pour les équipements, seuls restent les
+    équipements pondérés et obligatoires (dans l'ordre du calcul) et la présence
+    du terme au score, qui disparaît quand tous les poids individuels sont nuls.
+    """
+    if not isinstance(critere, dict):
+        return critere
+    structure = {cle: valeur for cle, valeur in critere.items() if cle not in ('poids', 'poids_individuels')}
+    if 'poids_individuels' in critere:
+        individuels = critere['poids_individuels']
+        structure['poids_individuels'] = [
+            (equip, bool(config.get('obligatoire', False))) for equip, config in individuels.items()
+        ]
+        poids = [config.get('poids') for config in individuels.values() if not config.get('obligatoire', False)]
+        # Poids invalides ignorés ici : compiler_criteres les signale
+        structure['pondere'] = sum(p for p in poids if isinstance(p, (int, float)) and not isinstance(p, bool)) > 0
+    return structure
+
+def empreinte_structure(criteres):
+    """
+    Retourne un hash des critères sans leurs poids, principaux et individuels des
+    équipements : deux recherches de même structure ne diffèrent que par
+    l'importance donnée à chaque critère ou équipement.
+    """
+    return empreinte_criteres({nom: _sans_poids(critere) for nom, critere in criteres.items()})
+
+def _poids_terme(terme):
+    """
+    Retourne le poids d'un terme du plan. Les équipements ont leur propre
+    pondération, déjà incluse dans leur contribution.
+    """
+    genre = terme[0]
+    if genre in ('plage', 'intervalle'):
+        return terme[5]
+    if genre == 'equipements':
+        return 1.0
+    return terme[4]
+
+def _lecteur_colonnes(df):
+    """
+    Retourne une fonction colonne(nom, requise=False) donnant les colonnes
+    numériques de df, converties une seule fois.
+    """
+    colonnes = {}
+    def colonne(nom, requise=False):
+        if nom not in colonnes:
+            colonnes[nom] = _colonne_numerique(df, nom, requise)
+        return colonnes[nom]
+    return colonne
+
+def _rejets(df, plan, colonne, causes=None):
+    """
+    Masque des véhicules rejetés par les critères obligatoires numériques et de liste.
+    Si causes est une liste, (critère, masque des véhicules qu'il rejette) y est
+    ajouté pour chaque critère, dans l'ordre de vérification.
+    """
+    rejete = np.zeros(len(df), dtype=bool)
+    for nom, nom_colonne, sens, valeur, requise in plan.obligatoires:
+        if sens == 'liste':
+            rejet = ~_appartient(df, nom_colonne, valeur)
+        elif sens == 'min':
+            rejet = colonne(nom_colonne, requise) < valeur
+        else:
+            rejet = colonne(nom_colonne, requise) > valeur
+        rejete |= rejet
+        if causes is not None:
+            causes.append((nom, rejet))
+    return rejete
+
+def _rejets_equipements(plan, vocabulaire, masques, presences_extras, causes=None):
+    """
+    Masque des véhicules rejetés faute d'un équipement obligatoire
+    (causes : voir _rejets).
+    """
+    # Équipements obligatoires connus : un seul ET bit à bit pour toute la flotte
+    obligatoires = [equip for _, equip in plan.equipements_obligatoires]
+    masque_obligatoire = np.uint64(vocabulaire.masque(obligatoires))
+    rejete = (masques & masque_obligatoire) != masque_obligatoire
+    for equip in obligatoires:
+        if vocabulaire.bit(equip) is None:
+            rejete |= ~presences_extras[equip]
+    if causes is not None:
+        for nom, equip in plan.equipements_obligatoires:
+            bit = vocabulaire.bit(equip)
+            absent = ~presences_extras[equip] if bit is None else (masques & np.uint64(bit)) == 0
+            causes.append((f"{nom} ({equip})", absent))
+    return rejete
+
+def _score_equipements(presences, ponderes, poids_total_equipements):
+    """
+    Contribution d'un terme d'équipements à partir de la matrice de présence
+    véhicules × équipements pondérés, dans l'ordre du calcul unitaire.
+    """
+    score_equipements = np.zeros(len(presences))
+    for position, (_, poids) in enumerate(ponderes):
+        score_equipements += np.where(presences[:, position], poids, 0.0)
+    return (score_equipements / poids_total_equipements) * 2  # Poids de base de 2 pour les équipements
+
+def _contributions(df, plan, causes=None, presences=None):
+    """
+    Calcule les contributions unitaires (pour un poids de 1) de chaque terme du plan,
+    sous forme de matrice véhicules × termes, ainsi que les masques des véhicules
+    rejetés et des coups de cœur (causes : voir _rejets). Si presences est un
+    dictionnaire, la matrice de présence de chaque terme d'équipements y est
+    ajoutée sous sa position, pour en changer ensuite les poids individuels.
+    """
+    n = len(df)
+    contributions = np.zeros((n, len(plan.termes)), order='F')
+    colonne = _lecteur_colonnes(df)
+    rejete = _rejets(df, plan, colonne, causes)
+
+    equipements = plan.equipements()
+    if equipements:
+        vocabulaire = obtenir_vocabulaire()
+        masques, extras = _masques_equipements(df)
+        presences_extras = _presences_extras(extras, [equip for equip in equipements if vocabulaire.bit(equip) is None])
+
+        def presence(equip):
+            bit = vocabulaire.bit(equip)
+            if bit is None:
+                return presences_extras[equip]
+            return (masques & np.uint64(bit)) != 0
+
+        rejete |= _rejets_equipements(plan, vocabulaire, masques, presences_extras, causes)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for position, terme in enumerate(plan.termes):
+            genre = terme[0]
+            if genre == 'plage':
+                _, _, nom_colonne, mini, maxi, _, tolerance, relative = terme
+                valeurs = colonne(nom_colonne, True)
+                dans = (mini <= valeurs) & (valeurs <= maxi)
+                dessous = valeurs < mini
+                ecart = np.where(dessous, mini - valeurs, valeurs - maxi)
+                if relative:
+                    ecart = ecart / np.where(dessous, mini, maxi)
+                    partiel = 1 - ecart
+                else:
+                    partiel = 1 - ecart / tolerance
+                contribution = np.where(dans, 1.0, 0.0)
+                contribution = np.where(~dans & (ecart <= tolerance), partiel, contribution)
+            elif genre == 'liste':
+                _, _, nom_colonne, valeurs, _ = terme
+                contribution = np.where(_appartient(df, nom_colonne, valeurs), 1.0, 0.0)
+            elif genre == 'intervalle':
+                _, _, nom_colonne, mini, maxi, _ = terme
+                valeurs = colonne(nom_colonne)
+                contribution = np.where((valeurs != 0) & (mini <= valeurs) & (valeurs <= maxi), 1.0, 0.0)
+            elif genre == 'plafond':
+                _, _, nom_colonne, maxi, _, requise = terme
+                valeurs = colonne(nom_colonne, requise)
+                renseignee = True if requise else valeurs != 0
+                depassement = (valeurs - maxi) / maxi
+                contribution = np.where(renseignee & (valeurs <= maxi), 1.0, 0.0)
+                contribution = np.where(renseignee & ~(valeurs <= maxi) & (depassement <= 0.2), 1 - depassement, contribution)
+            elif genre == 'plancher':
+                _, _, nom_colonne, mini, _ = terme
+                valeurs = colonne(nom_colonne)
+                renseignee = valeurs != 0
+                diff = mini - valeurs
+                contribution = np.where(renseignee & (valeurs >= mini), 1.0, 0.0)
+                contribution = np.where(renseignee & ~(valeurs >= mini) & (diff <= 1), 1 - diff, contribution)
+            else:
+                _, _, ponderes, poids_total_equipements = terme
+                if presences is not None:
+                    presences[position] = np.column_stack([presence(equip) for equip, _ in ponderes])
+                score_equipements = np.zeros(n)
+                if (len({equip for equip, _ in ponderes}) == len(ponderes)
+                        and all(vocabulaire.bit(equip) is not None and float(poids).is_integer() for equip, poids in ponderes)):
+                    # Poids entiers : les équipements de même poids sont comptés ensemble
+                    # (ET bit à bit puis comptage des bits) ; la somme d'entiers reste
+                    # exacte quel que soit l'ordre des additions
+                    par_poids = {}
+                    for equip, poids in ponderes:
+                        par_poids[poids] = par_poids.get(poids, 0) | vocabulaire.bit(equip)
+                    for poids, masque in par_poids.items():
+                        score_equipements += compter_bits(masques & np.uint64(masque)) * float(poids)
+                else:
+                    for equip, poids in ponderes:
+                        score_equipements += np.where(presence(equip), poids, 0.0)
+                contribution = (score_equipements / poids_total_equipements) * 2  # Poids de base de 2 pour les équipements
+            contributions[:, position] = contribution
+
+    # Bonus pour les véhicules "coup de cœur" (même test de vérité que vehicule.get)
+    if 'Coup_de_Coeur' in df.columns:
+        coup_de_coeur = np.fromiter(map(bool, df['Coup_de_Coeur']), dtype=bool, count=n)
+    else:
+        coup_de_coeur = np.zeros(n, dtype=bool)
+
+    return contributions, rejete, coup_de_coeur
+
+def _combiner(index, contributions, poids, poids_total, rejete, coup_de_coeur):
+    """
+    Combine les contributions unitaires avec les poids des termes et retourne
+    la Series des scores finaux.
+    """
+    # Produit matrice-vecteur colonne par colonne : les termes sont additionnés
+    # dans l'ordre du calcul unitaire, pour des scores identiques au bit près
+    score = np.zeros(len(index))
+    for position, poids_terme in enumerate(poids):
+        score += contributions[:, position] * poids_terme
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Normalisation du score sur 100
+        score_final = (score / poids_total) * 100
+
+    score_final = np.where(coup_de_coeur, np.minimum(100, score_final * 1.1), score_final)
+    score_final[rejete] = 0.0
+
+    # Arrondi de Python (et non np.round) pour des valeurs identiques au calcul unitaire
+    return pd.Series([round(valeur, 1) for valeur in score_final.tolist()], index=index, name='Score_Match', dtype=float)
+
+class ContributionsScoring:
+    """
+    Contributions de chaque critère au score des véhicules, calculées une fois pour
+    une recherche. Changer uniquement les poids des critères ne demande alors plus
+    qu'un produit matrice-vecteur, sans rescorer les véhicules. Les présences des
+    équipements pondérés sont conservées : changer leurs poids individuels ne
+    recalcule que la colonne de leur catégorie.
+
+    Les contributions sont associées au DataFrame d'origine et à la révision de
+    chaque véhicule : seuls les véhicules modifiés depuis sont recalculés (voir actualiser).
+    """
+    def __init__(self, df, criteres):
+        self.plan = compiler_criteres(criteres)
+        self.index = df.index
+        self.source = id(df)
+        self.revisions = revisions_vehicules(df)
+        self.structure = empreinte_structure(criteres)
+        self.presences = {}
+        self.contributions, self.rejete, self.coup_de_coeur = _contributions(df, self.plan, presences=self.presences)
+        self._verrou = threading.Lock()
+
+    def actualiser(self, df):
+        """
+        Recalcule les contributions des seuls véhicules de df modifiés depuis leur
+        calcul (révision changée). Retourne False si df n'est plus le DataFrame
+        d'origine ou n'a plus les mêmes véhicules : tout est alors à recalculer.
+        """
+        if id(df) != self.source or not df.index.equals(self.index):
+            return False
+        revisions = revisions_vehicules(df)
+        positions = np.flatnonzero(revisions != self.revisions)
+        if len(positions):
+            presences = {}
+            contributions, rejete, coup_de_coeur = _contributions(df.iloc[positions], self.plan, presences=presences)
+            with self._verrou:
+                self.contributions[positions] = contributions
+                self.rejete[positions] = rejete
+                self.coup_de_coeur[positions] = coup_de_coeur
+                for terme, presence in presences.items():
+                    self.presences[terme][positions] = presence
+                self.revisions[positions] = revisions[positions]
+        return True
+
+    def scores(self, criteres):
+        """
+        Retourne la Series des scores pour ces critères, qui ne doivent différer de
+        ceux d'origine que par leurs poids. Lève ValueError sinon.
+        """
+        if empreinte_structure(criteres) != self.structure:
+            raise ValueError("Les critères ne diffèrent pas seulement par leurs poids")
+        plan = compiler_criteres(criteres)
+        with self._verrou:
+            contributions = self.contributions
+            if plan is not self.plan and self.presences:
+                # Poids individuels des équipements : colonnes recalculées sur une copie
+                contributions = contributions.copy(order='F')
+                for position, presences in self.presences.items():
+                    _, _, ponderes, poids_total_equipements = plan.termes[position]
+                    contributions[:, position] = _score_equipements(presences, ponderes, poids_total_equipements)
+            return _combiner(
+                self.index, contributions, [_poids_terme(terme) for terme in plan.termes],
+                plan.poids_total, self.rejete, self.coup_de_coeur
+            )
+
+def _detail_scores(index, plan, contributions, poids, rejete, coup_de_coeur, causes):
+    """
+    Construit le détail des scores d'un calcul vectorisé : une colonne float32 par
+    critère (points obtenus sur 100), la colonne Bonus du coup de cœur et la colonne
+    catégorielle Rejet (premier critère obligatoire non respecté).
+    """
+    detail = {}
+    score = np.zeros(len(index))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for position, (terme, poids_terme) in enumerate(zip(plan.termes, poids)):
+            apport = contributions[:, position] * poids_terme
+            score += apport
+            detail[terme[1]] = np.where(rejete, 0.0, apport / plan.poids_total * 100).astype(np.float32)
+        score_base = (score / plan.poids_total) * 100
+    bonus = np.where(coup_de_coeur, np.minimum(100, score_base * 1.1) - score_base, 0.0)
+    detail['Bonus'] = np.where(rejete, 0.0, bonus).astype(np.float32)
+
+    # Premier critère obligatoire non respecté, dans l'ordre de vérification
+    noms = list(dict.fromkeys(nom for nom, _ in causes))
+    codes = np.full(len(index), -1, dtype=np.int16)
+    for nom, rejet in reversed(causes):
+        codes[rejet] = noms.index(nom)
+    detail['Rejet'] = pd.Categorical.from_codes(codes, categories=noms)
+    return pd.DataFrame(detail, index=index)
+
+def calculer_scores_vehicules(df, criteres, index_equipements=None, detail=False):
+    """
+    Calcule en une passe vectorisée le score de correspondance de tous les véhicules
+    d'un DataFrame (critères en dictionnaire ou plan compilé). Retourne une Series
+    indexée comme df, dont chaque valeur est identique à celle de calculer_score_vehicule
+    pour la ligne correspondante.
+
+    Avec un index inversé des équipements (IndexEquipements), les équipements
+    obligatoires sont résolus avant tout calcul : seuls les véhicules qui les
+    possèdent tous sont scorés, les autres valent 0.
+
+    Avec detail=True, retourne (scores, détail), le détail étant un DataFrame
+    compact calculé dans la même passe (voir _detail_scores).
+    """
+    plan = compiler_criteres(criteres)
+    obligatoires = [equip for _, equip in plan.equipements_obligatoires]
+    if not detail and index_equipements is not None and obligatoires and index_equipements.couvre(obligatoires):
+        candidats = df.index.isin(index_equipements.vehicules(obligatoires))
+        scores = pd.Series(0.0, index=df.index, name='Score_Match')
+        if candidats.any():
+            scores[candidats] = calculer_scores_vehicules(df[candidats], plan)
+        return scores
+
+    causes = [] if detail else None
+    contributions, rejete, coup_de_coeur = _contributions(df, plan, causes)
+    poids = [_poids_terme(terme) for terme in plan.termes]
+    scores = _combiner(df.index, contributions, poids, plan.poids_total, rejete, coup_de_coeur)
+    if detail:
+        return scores, _detail_scores(df.index, plan, contributions, poids, rejete, coup_de_coeur, causes)
+    return scores
+
+def masque_obligatoires(df, criteres, index_equipements=None):
+    """
+    Retourne le masque des véhicules de df respectant tous les critères obligatoires
+    (budget, année, marques, transmissions, équipements...), par de simples
+    comparaisons vectorisées et, si l'index est fourni, par l'index des équipements.
+    Les véhicules exclus ont un score nul, inutile de les scorer.
+    """
+    plan = compiler_criteres(criteres)
+    survivants = ~_rejets(df, plan, _lecteur_colonnes(df))
+    obligatoires = [equip for _, equip in plan.equipements_obligatoires]
+    if obligatoires and survivants.any():
+        if index_equipements is not None and index_equipements.couvre(obligatoires):
+            survivants &= df.index.isin(index_equipements.vehicules(obligatoires))
+        else:
+            vocabulaire = obtenir_vocabulaire()
+            masques, extras = _masques_equipements(df)
+            presences_extras = _presences_extras(extras, [equip for equip in obligatoires if vocabulaire.bit(equip) is None])
+            survivants &= ~_rejets_equipements(plan, vocabulaire, masques, presences_extras)
+    return survivants
+
+def meilleurs_scores(scores, k):
+    """
+    Retourne les k meilleurs scores d'une Series, du meilleur au moins bon (à score
+    égal, dans l'ordre de la Series). Les k premiers sont sélectionnés par
+    argpartition puis seuls ceux-ci sont triés : O(n + k log k) au lieu d'un tri complet.
+    """
+    valeurs = scores.to_numpy(dtype=float)
+    k = min(k, len(valeurs))
+    if k <= 0:
+        return scores.iloc[:0]
+    if k < len(valeurs):
+        # Seuil du k-ième score ; les ex aequo au seuil sont tous gardés pour que
+        # le départage par position ne dépende pas de argpartition
+        seuil = valeurs[np.argpartition(-valeurs, k - 1)[k - 1]]
+        candidats = np.flatnonzero(valeurs >= seuil)
+    else:
+        candidats = np.arange(len(valeurs))
+    ordre = candidats[np.lexsort((candidats, -valeurs[candidats]))][:k]
+    return scores.iloc[ordre]
+
+def classer_vehicules(df, criteres, k, index_equipements=None):
+    """
+    Retourne la Series des scores des k meilleurs véhicules de df pour ces critères,
+    triée par score décroissant. Les critères obligatoires sont appliqués d'abord :
+    seuls les véhicules qui les respectent sont scorés puis classés.
+    """
+    survivants = df[masque_obligatoires(df, criteres, index_equipements)]
+    return meilleurs_scores(calculer_scores_vehicules(survivants, criteres), k)
+
+# Exécution multi-processus : en dessous de ce nombre de véhicules, le coût de
+# démarrage des processus dépasse le gain et le calcul reste dans le processus
+SEUIL_PARALLELE = 200_000
+TAILLE_BLOC = 100_000
+
+def _colonnes_plan(plan):
+    """
+    Retourne les colonnes numériques (nom → requise) et de liste lues par un plan.
+    """
+    numeriques = {}
+    listes = set()
+    for _, colonne, sens, _, requise in plan.obligatoires:
+        if sens == 'liste':
+            listes.add(colonne)
+        else:
+            numeriques[colonne] = numeriques.get(colonne, False) or requise
+    for terme in plan.termes:
+        genre = terme[0]
+        if genre == 'liste':
+            listes.add(terme[2])
+        elif genre == 'plage':
+            numeriques[terme[2]] = True
+        elif genre == 'plafond':
+            numeriques[terme[2]] = numeriques.get(terme[2], False) or terme[5]
+        elif genre in ('intervalle', 'plancher'):
+            numeriques.setdefault(terme[2], False)
+    return numeriques, listes
+
+class _ColonnesPartagees:
+    """
+    Colonnes des véhicules copiées dans des segments de mémoire partagée, que les
+    processus de calcul lisent sans recevoir de DataFrame sérialisé.
+    """
+    def __init__(self):
+        self.segments = []
+        self.colonnes = {}
+
+    def _partager(self, tableau):
+        tableau = np.ascontiguousarray(tableau)
+        segment = shared_memory.SharedMemory(create=True, size=max(tableau.nbytes, 1))
+        self.segments.append(segment)
+        np.ndarray(tableau.shape, dtype=tableau.dtype, buffer=segment.buf)[:] = tableau
+        return (segment.name, tableau.dtype.str, len(tableau))
+
+    def ajouter_tableau(self, nom, tableau):
+        self.colonnes[nom] = ('tableau', self._partager(tableau))
+
+    def ajouter_objets(self, nom, valeurs):
+        """
+        Partage une colonne de chaînes par ses codes, les valeurs distinctes étant
+        envoyées telles quelles. None et NaN restent distincts, comme pour isin.
+        """
+        codes, uniques = pd.factorize(valeurs)
+        est_none = np.fromiter((valeur is None for valeur in valeurs), dtype=bool, count=len(valeurs))
+        self.colonnes[nom] = ('objets', self._partager(codes.astype(np.int32)),
+                              self._partager(est_none), list(uniques))
+
+    def sortie(self, n):
+        """Crée le segment partagé des scores calculés."""
+        return self._partager(np.zeros(n))
+
+    def liberer(self):
+        for segment in self.segments:
+            segment.close()
+            segment.unlink()
+        self.segments = []
+
+def _lire_segment(description, debut, fin):
+    nom, dtype, longueur = description
+    segment = shared_memory.SharedMemory(name=nom)
+    try:
+        return np.ndarray((longueur,), dtype=dtype, buffer=segment.buf)[debut:fin].copy()
+    finally:
+        segment.close()
+
+def _scorer_bloc(plan, colonnes, sortie, debut, fin):
+    """
+    Calcule, dans un processus de calcul, les scores des véhicules [debut, fin)
+    à partir des colonnes partagées, et les écrit dans le segment de sortie.
+    """
+    donnees = {}
+    for nom, colonne in colonnes.items():
+        if colonne[0] == 'tableau':
+            donnees[nom] = _lire_segment(colonne[1], debut, fin)
+        else:
+            _, codes, est_none, uniques = colonne
+            codes = _lire_segment(codes, debut, fin)
+            valeurs = np.append(np.array(uniques, dtype=object), np.nan)[codes]
+            valeurs[_lire_segment(est_none, debut, fin)] = None
+            donnees[nom] = valeurs
+    scores = calculer_scores_vehicules(pd.DataFrame(donnees, index=pd.RangeIndex(fin - debut)), plan).to_numpy()
+
+    nom, dtype, longueur = sortie
+    segment = shared_memory.SharedMemory(name=nom)
+    try:
+        np.ndarray((longueur,), dtype=dtype, buffer=segment.buf)[debut:fin] = scores
+    finally:
+        segment.close()
+
+_executeurs = {}
+
+def _executeur(processus):
+    """
+    Retourne le groupe de processus de calcul, créé une fois par nombre de processus.
+    Les processus sont démarrés par 'spawn', sûr dans un serveur multi-thread.
+    """
+    executeur = _executeurs.get(processus)
+    if executeur is None:
+        executeur = ProcessPoolExecutor(max_workers=processus, mp_context=multiprocessing.get_context('spawn'))
+        _executeurs[processus] = executeur
+    return executeur
+
+@atexit.register
+def _arreter_executeurs():
+    for executeur in _executeurs.values():
+        executeur.shutdown(wait=False, cancel_futures=True)
+    _executeurs.clear()
+
+def calculer_scores_paralleles(df, criteres, index_equipements=None, processus=None,
+                               taille_bloc=TAILLE_BLOC, seuil=SEUIL_PARALLELE):
+    """
+    Variante multi-processus de calculer_scores_vehicules pour les rescorings de
+    grandes flottes. Les colonnes utiles au plan sont placées en mémoire partagée,
+    puis chaque bloc de taille_bloc véhicules est scoré par un processus de calcul.
+
+    processus vaut par défaut le nombre de cœurs. Avec un seul processus ou moins
+    de seuil véhicules, le calcul reste dans le processus courant. Les scores sont
+    identiques au bit près à ceux de calculer_scores_vehicules.
+    """
+    plan = compiler_criteres(criteres)
+    processus = processus or os.cpu_count() or 1
+
+    obligatoires = [equip for _, equip in plan.equipements_obligatoires]
+    if index_equipements is not None and obligatoires and index_equipements.couvre(obligatoires):
+        candidats = df.index.isin(index_equipements.vehicules(obligatoires))
+        scores = pd.Series(0.0, index=df.index, name='Score_Match')
+        if candidats.any():
+            scores[candidats] = calculer_scores_paralleles(
+                df[candidats], plan, processus=processus, taille_bloc=taille_bloc, seuil=seuil
+            ).to_numpy()
+        return scores
+
+    if processus <= 1 or len(df) < seuil:
+        return calculer_scores_vehicules(df, plan, index_equipements)
+
+    partage = _ColonnesPartagees()
+    try:
+        numeriques, listes = _colonnes_plan(plan)
+        for nom, requise in numeriques.items():
+            # Une colonne facultative absente vaut 0 : elle reste absente
+            if nom in df.columns or requise:
+                partage.ajouter_tableau(nom, _colonne_numerique(df, nom, requise))
+        for nom in listes:
+            if nom in df.columns:
+                partage.ajouter_objets(nom, df[nom].to_numpy(dtype=object))
+        if plan.equipements():
+            masques, extras = _masques_equipements(df)
+            partage.ajouter_tableau('Equipements_Bits', masques)
+            partage.ajouter_objets('Equipements_Extras', extras.to_numpy(dtype=object))
+        if 'Coup_de_Coeur' in df.columns:
+            partage.ajouter_tableau('Coup_de_Coeur', np.fromiter(map(bool, df['Coup_de_Coeur']), dtype=bool, count=len(df)))
+        sortie = partage.sortie(len(df))
+
+        executeur = _executeur(processus)
+        taches = [
+            executeur.submit(_scorer_bloc, plan, partage.colonnes, sortie, debut, min(debut + taille_bloc, len(df)))
+            for debut in range(0, len(df), taille_bloc)
+        ]
+        for tache in taches:
+            tache.result()
+        scores = _lire_segment(sortie, 0, len(df))
+    finally:
+        partage.liberer()
+
+    return pd.Series(scores, index=df.index, name='Score_Match')
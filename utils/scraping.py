@@ -1,225 +1,348 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
 from urllib.parse import urlparse
 import re
 import json
+import logging
+from utils.cache_annonces import obtenir_cache_annonces
+from utils.client_http import obtenir_client
 
-def extraire_infos_annonce(url):
+journal = logging.getLogger(__name__)
+
+def _extraire_autoscout24(soup, url):
+    """Extrait les informations d'une page d'annonce AutoScout24."""
+    # Extraction du prix
+    prix = soup.find('span', {'class': 'price'})
+    prix = int(re.sub(r'[^\d]', '', prix.text)) if prix else 0
+    
+    # Extraction du titre (marque et modèle)
+    titre = soup.find('h1').text.strip()
+    marque, modele = titre.split(' ', 1)
+    
+    # Extraction de l'année
+    annee = soup.find('span', {'class': 'year'})
+    annee = int(annee.text) if annee else 2000
+    
+    # Extraction de l'image principale
+    image_url = ''
+    img = soup.find('img', {'class': 'gallery-picture'})
+    if img:
+        image_url = img['src']
+    
+    # Extraction des caractéristiques techniques
+    specs = {}
+    specs_container = soup.find('div', {'class': 'technical-specifications'})
+    if specs_container:
+        for item in specs_container.find_all('div', {'class': 'item'}):
+            label = item.find('span', {'class': 'label'})
+            value = item.find('span', {'class': 'value'})
+            if label and value:
+                specs[label.text.strip()] = value.text.strip()
+    
+    # Extraction de la motorisation
+    motorisation = None
+    if 'Carburant' in specs:
+        motorisation = specs['Carburant']
+    elif 'Type de carburant' in specs:
+        motorisation = specs['Type de carburant']
+    
+    # Extraction de la puissance
+    puissance = None
+    if 'Puissance' in specs:
+        puissance_match = re.search(r'(\d+)\s*ch', specs['Puissance'])
+        if puissance_match:
+            puissance = int(puissance_match.group(1))
+    
+    # Extraction de la transmission
+    transmission = None
+    if 'Boîte de vitesses' in specs:
+        transmission = 'Automatique' if 'automatique' in specs['Boîte de vitesses'].lower() else 'Manuelle'
+    
+    # Extraction de la catégorie
+    categorie = None
+    if 'Type de véhicule' in specs:
+        categorie = specs['Type de véhicule']
+    
+    # Informations sur le vendeur
+    type_vendeur = 'Professionnel' if soup.find('div', {'class': 'dealer-info'}) else 'Particulier'
+    note_vendeur = 0
+    note_element = soup.find('div', {'class': 'rating'})
+    if note_element:
+        note_match = re.search(r'(\d+(?:\.\d+)?)', note_element.text)
+        if note_match:
+            note_vendeur = float(note_match.group(1))
+    
+    # Extraction de la distance
+    distance = None
+    localisation = soup.find('div', {'class': 'location'})
+    if localisation:
+        distance_match = re.search(r'(\d+)\s*km', localisation.text)
+        if distance_match:
+            distance = int(distance_match.group(1))
+    
+    # Extraction des équipements
+    equipements = []
+    equip_container = soup.find('div', {'class': 'equipment'})
+    if equip_container:
+        for equip in equip_container.find_all('li'):
+            equipements.append(equip.text.strip())
+    
+    return {
+        'prix': prix,
+        'marque': marque,
+        'modele': modele,
+        'annee': annee,
+        'image_url': image_url,
+        'motorisation': motorisation,
+        'puissance': puissance,
+        'transmission': transmission,
+        'categorie': categorie,
+        'type_vendeur': type_vendeur,
+        'note_vendeur': note_vendeur,
+        'distance': distance,
+        'equipements': ', '.join(equipements),
+        'specs': specs,
+        'url': url
+    }
+
+def _extraire_leboncoin(soup, url):
+    """Extrait les informations d'une page d'annonce LeBonCoin."""
+    # Extraction du prix
+    prix = soup.find('span', {'class': '_1F5u3'})
+    prix = int(re.sub(r'[^\d]', '', prix.text)) if prix else 0
+    
+    # Extraction du titre et des informations
+    titre = soup.find('h1', {'class': '_3MDJa'})
+    titre = titre.text.strip() if titre else ""
+    
+    # Tentative d'extraction de la marque et du modèle
+    marque = ""
+    modele = titre
+    marques_communes = ['Peugeot', 'Renault', 'Citroën', 'BMW', 'Audi', 'Mercedes', 'Volkswagen']
+    for m in marques_communes:
+        if m.lower() in titre.lower():
+            marque = m
+            modele = titre.replace(m, '').strip()
+            break
+    
+    # Extraction de l'année
+    annee_pattern = r'\b(19|20)\d{2}\b'
+    annee_match = re.search(annee_pattern, titre)
+    annee = int(annee_match.group()) if annee_match else 2000
+    
+    # Extraction de l'image principale
+    image_url = ''
+    img = soup.find('img', {'class': '_3GJ1I'})
+    if img:
+        image_url = img['src']
+    
+    # Extraction des caractéristiques depuis le JSON-LD
+    script = soup.find('script', {'type': 'application/ld+json'})
+    specs = {}
+    if script:
+        try:
+            data = json.loads(script.string)
+            if 'vehicle' in data:
+                specs = data['vehicle']
+        except:
+            pass
+    
+    # Extraction de la motorisation
+    motorisation = None
+    if 'fuelType' in specs:
+        motorisation = specs['fuelType']
+    
+    # Extraction de la puissance
+    puissance = None
+    if 'enginePower' in specs:
+        puissance = int(specs['enginePower'])
+    
+    # Extraction de la transmission
+    transmission = None
+    if 'transmissionType' in specs:
+        transmission = 'Automatique' if 'auto' in specs['transmissionType'].lower() else 'Manuelle'
+    
+    # Extraction de la catégorie
+    categorie = None
+    if 'bodyType' in specs:
+        categorie = specs['bodyType']
+    
+    # Informations sur le vendeur
+    type_vendeur = 'Professionnel' if soup.find('div', {'class': 'shopLogo'}) else 'Particulier'
+    note_vendeur = 0
+    note_element = soup.find('div', {'class': 'sellerRating'})
+    if note_element:
+        note_match = re.search(r'(\d+(?:\.\d+)?)', note_element.text)
+        if note_match:
+            note_vendeur = float(note_match.group(1))
+    
+    # Extraction de la distance
+    distance = None
+    localisation = soup.find('div', {'class': '_1yzJv'})
+    if localisation:
+        distance_match = re.search(r'(\d+)\s*km', localisation.text)
+        if distance_match:
+            distance = int(distance_match.group(1))
+    
+    # Extraction des équipements
+    equipements = []
+    equip_container = soup.find('div', {'class': '_3eNLO'})
+    if equip_container:
+        for equip in equip_container.find_all('div', {'class': '_3Jxf3'}):
+            equipements.append(equip.text.strip())
+    
+    return {
+        'prix': prix,
+        'marque': marque,
+        'modele': modele,
+        'annee': annee,
+        'image_url': image_url,
+        'motorisation': motorisation,
+        'puissance': puissance,
+        'transmission': transmission,
+        'categorie': categorie,
+        'type_vendeur': type_vendeur,
+        'note_vendeur': note_vendeur,
+        'distance': distance,
+        'equipements': ', '.join(equipements),
+        'specs': specs,
+        'url': url
+    }
+
+# Extraction des informations par site
+EXTRACTEURS = {
+    'autoscout24.fr': _extraire_autoscout24,
+    'leboncoin.fr': _extraire_leboncoin
+}
+
+# Éléments lus par l'extraction de chaque site : (balise, attributs) où chaque
+# attribut doit contenir la valeur donnée (une des classes pour 'class').
+# L'analyse partielle ne construit que ces éléments et leur contenu.
+CIBLES = {
+    'autoscout24.fr': [
+        ('h1', {}),
+        ('span', {'class': 'price'}),
+        ('span', {'class': 'year'}),
+        ('img', {'class': 'gallery-picture'}),
+        ('div', {'class': 'technical-specifications'}),
+        ('div', {'class': 'dealer-info'}),
+        ('div', {'class': 'rating'}),
+        ('div', {'class': 'location'}),
+        ('div', {'class': 'equipment'})
+    ],
+    'leboncoin.fr': [
+        ('span', {'class': '_1F5u3'}),
+        ('h1', {'class': '_3MDJa'}),
+        ('img', {'class': '_3GJ1I'}),
+        ('script', {'type': 'application/ld+json'}),
+        ('div', {'class': 'shopLogo'}),
+        ('div', {'class': 'sellerRating'}),
+        ('div', {'class': '_1yzJv'}),
+        ('div', {'class': '_3eNLO'})
+    ]
+}
+
+# Analyseurs HTML, du plus rapide au plus lent ; lxml n'est utilisé que s'il est installé
+ANALYSEURS = ['lxml', 'html.parser']
+
+_analyseur = None
+_analyse_partielle = True
+
+def analyseurs_disponibles():
+    """Retourne les analyseurs HTML installés, du plus rapide au plus lent."""
+    return [nom for nom in ANALYSEURS if builder_registry.lookup(nom) is not None]
+
+def definir_analyseur(analyseur=None, partielle=True):
+    """
+    Choisit l'analyseur HTML des pages d'annonces ('lxml', 'html.parser', ou None
+    pour le plus rapide installé) et active ou non l'analyse partielle, limitée
+    aux éléments lus par l'extraction (voir CIBLES).
+    """
+    global _analyseur, _analyse_partielle
+    if analyseur is not None and builder_registry.lookup(analyseur) is None:
+        raise ValueError(f"Analyseur HTML non disponible : {analyseur}")
+    _analyseur = analyseur
+    _analyse_partielle = partielle
+
+def _filtre(cibles):
+    """Retourne le filtre (SoupStrainer) ne retenant que les éléments ciblés."""
+    par_balise = {}
+    for balise, attributs in cibles:
+        par_balise.setdefault(balise, []).append(attributs)
+
+    def retenir(balise, attributs):
+        for attendus in par_balise.get(balise, ()):
+            # À ce stade, l'attribut class n'est pas encore découpé en liste de classes
+            if all(
+                attributs.get(nom) == valeur or (nom == 'class' and valeur in (attributs.get(nom) or '').split())
+                for nom, valeur in attendus.items()
+            ):
+                return True
+        return False
+    return SoupStrainer(retenir)
+
+_filtres = {site: _filtre(cibles) for site, cibles in CIBLES.items()}
+
+def analyser_page(html, site, analyseur=None, partielle=None):
+    """
+    Construit l'arbre d'une page d'annonce du site donné, avec l'analyseur choisi
+    (voir definir_analyseur) ou celui donné, partiellement si l'analyse partielle
+    est active : l'extraction en tire exactement les mêmes informations.
+    """
+    analyseur = analyseur or _analyseur or analyseurs_disponibles()[0]
+    partielle = _analyse_partielle if partielle is None else partielle
+    return BeautifulSoup(html, analyseur, parse_only=_filtres.get(site) if partielle else None)
+
+def _site(url):
+    """Retourne le site (clé de EXTRACTEURS) de l'annonce, ou None si le site n'est pas supporté."""
+    domain = urlparse(url).netloc
+    for site in EXTRACTEURS:
+        if site in domain:
+            return site
+    return None
+
+def site_supporte(url):
+    """Indique si l'annonce est sur un site dont les informations peuvent être extraites."""
+    return _site(url) is not None
+
+def extraire_infos_page(html, url, site=None, analyseur=None, partielle=None):
+    """Extrait les informations d'une page d'annonce déjà téléchargée (HTML)."""
+    site = site or _site(url)
+    return EXTRACTEURS[site](analyser_page(html, site, analyseur, partielle), url)
+
+def _recuperer(url, site, entetes_conditionnels):
+    """
+    Télécharge la page d'une annonce avec le client HTTP partagé (délais, nouvelles
+    tentatives et débit limité par site), sous condition si des entêtes ETag ou
+    Last-Modified sont donnés, et en extrait les informations.
+    Retourne (non_modifiee, infos, etag, last_modified) pour le cache des annonces.
+    """
+    response = obtenir_client().get(url, headers=entetes_conditionnels)
+    if response.status_code == 304:
+        return True, None, response.headers.get('ETag'), response.headers.get('Last-Modified')
+    if response.status_code != 200:
+        # Page d'erreur (annonce retirée, site indisponible) : rien à extraire ni à mettre en cache
+        return False, None, None, None
+    infos = extraire_infos_page(response.text, url, site)
+    return False, infos, response.headers.get('ETag'), response.headers.get('Last-Modified')
+
+def extraire_infos_annonce(url, cache=True):
     """
     Extrait les informations d'une annonce à partir de son URL.
     Supporte actuellement AutoScout24 et LeBonCoin.
+    Les extractions sont gardées dans le cache des annonces (voir
+    utils.cache_annonces) : une même annonce n'est pas retéléchargée à chaque
+    réexécution de la page. cache=False force le téléchargement.
     """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        domain = urlparse(url).netloc
-        
-        if 'autoscout24.fr' in domain:
-            response = requests.get(url, headers=headers)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extraction du prix
-            prix = soup.find('span', {'class': 'price'})
-            prix = int(re.sub(r'[^\d]', '', prix.text)) if prix else 0
-            
-            # Extraction du titre (marque et modèle)
-            titre = soup.find('h1').text.strip()
-            marque, modele = titre.split(' ', 1)
-            
-            # Extraction de l'année
-            annee = soup.find('span', {'class': 'year'})
-            annee = int(annee.text) if annee else 2000
-            
-            # Extraction de l'image principale
-            image_url = ''
-            img = soup.find('img', {'class': 'gallery-picture'})
-            if img:
-                image_url = img['src']
-            
-            # Extraction des caractéristiques techniques
-            specs = {}
-            specs_container = soup.find('div', {'class': 'technical-specifications'})
-            if specs_container:
-                for item in specs_container.find_all('div', {'class': 'item'}):
-                    label = item.find('span', {'class': 'label'})
-                    value = item.find('span', {'class': 'value'})
-                    if label and value:
-                        specs[label.text.strip()] = value.text.strip()
-            
-            # Extraction de la motorisation
-            motorisation = None
-            if 'Carburant' in specs:
-                motorisation = specs['Carburant']
-            elif 'Type de carburant' in specs:
-                motorisation = specs['Type de carburant']
-            
-            # Extraction de la puissance
-            puissance = None
-            if 'Puissance' in specs:
-                puissance_match = re.search(r'(\d+)\s*ch', specs['Puissance'])
-                if puissance_match:
-                    puissance = int(puissance_match.group(1))
-            
-            # Extraction de la transmission
-            transmission = None
-            if 'Boîte de vitesses' in specs:
-                transmission = 'Automatique' if 'automatique' in specs['Boîte de vitesses'].lower() else 'Manuelle'
-            
-            # Extraction de la catégorie
-            categorie = None
-            if 'Type de véhicule' in specs:
-                categorie = specs['Type de véhicule']
-            
-            # Informations sur le vendeur
-            type_vendeur = 'Professionnel' if soup.find('div', {'class': 'dealer-info'}) else 'Particulier'
-            note_vendeur = 0
-            note_element = soup.find('div', {'class': 'rating'})
-            if note_element:
-                note_match = re.search(r'(\d+(?:\.\d+)?)', note_element.text)
-                if note_match:
-                    note_vendeur = float(note_match.group(1))
-            
-            # Extraction de la distance
-            distance = None
-            localisation = soup.find('div', {'class': 'location'})
-            if localisation:
-                distance_match = re.search(r'(\d+)\s*km', localisation.text)
-                if distance_match:
-                    distance = int(distance_match.group(1))
-            
-            # Extraction des équipements
-            equipements = []
-            equip_container = soup.find('div', {'class': 'equipment'})
-            if equip_container:
-                for equip in equip_container.find_all('li'):
-                    equipements.append(equip.text.strip())
-            
-            return {
-                'prix': prix,
-                'marque': marque,
-                'modele': modele,
-                'annee': annee,
-                'image_url': image_url,
-                'motorisation': motorisation,
-                'puissance': puissance,
-                'transmission': transmission,
-                'categorie': categorie,
-                'type_vendeur': type_vendeur,
-                'note_vendeur': note_vendeur,
-                'distance': distance,
-                'equipements': ', '.join(equipements),
-                'specs': specs,
-                'url': url
-            }
-            
-        elif 'leboncoin.fr' in domain:
-            response = requests.get(url, headers=headers)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extraction du prix
-            prix = soup.find('span', {'class': '_1F5u3'})
-            prix = int(re.sub(r'[^\d]', '', prix.text)) if prix else 0
-            
-            # Extraction du titre et des informations
-            titre = soup.find('h1', {'class': '_3MDJa'})
-            titre = titre.text.strip() if titre else ""
-            
-            # Tentative d'extraction de la marque et du modèle
-            marque = ""
-            modele = titre
-            marques_communes = ['Peugeot', 'Renault', 'Citroën', 'BMW', 'Audi', 'Mercedes', 'Volkswagen']
-            for m in marques_communes:
-                if m.lower() in titre.lower():
-                    marque = m
-                    modele = titre.replace(m, '').strip()
-                    break
-            
-            # Extraction de l'année
-            annee_pattern = r'\b(19|20)\d{2}\b'
-            annee_match = re.search(annee_pattern, titre)
-            annee = int(annee_match.group()) if annee_match else 2000
-            
-            # Extraction de l'image principale
-            image_url = ''
-            img = soup.find('img', {'class': '_3GJ1I'})
-            if img:
-                image_url = img['src']
-            
-            # Extraction des caractéristiques depuis le JSON-LD
-            script = soup.find('script', {'type': 'application/ld+json'})
-            specs = {}
-            if script:
-                try:
-                    data = json.loads(script.string)
-                    if 'vehicle' in data:
-                        specs = data['vehicle']
-                except:
-                    pass
-            
-            # Extraction de la motorisation
-            motorisation = None
-            if 'fuelType' in specs:
-                motorisation = specs['fuelType']
-            
-            # Extraction de la puissance
-            puissance = None
-            if 'enginePower' in specs:
-                puissance = int(specs['enginePower'])
-            
-            # Extraction de la transmission
-            transmission = None
-            if 'transmissionType' in specs:
-                transmission = 'Automatique' if 'auto' in specs['transmissionType'].lower() else 'Manuelle'
-            
-            # Extraction de la catégorie
-            categorie = None
-            if 'bodyType' in specs:
-                categorie = specs['bodyType']
-            
-            # Informations sur le vendeur
-            type_vendeur = 'Professionnel' if soup.find('div', {'class': 'shopLogo'}) else 'Particulier'
-            note_vendeur = 0
-            note_element = soup.find('div', {'class': 'sellerRating'})
-            if note_element:
-                note_match = re.search(r'(\d+(?:\.\d+)?)', note_element.text)
-                if note_match:
-                    note_vendeur = float(note_match.group(1))
-            
-            # Extraction de la distance
-            distance = None
-            localisation = soup.find('div', {'class': '_1yzJv'})
-            if localisation:
-                distance_match = re.search(r'(\d+)\s*km', localisation.text)
-                if distance_match:
-                    distance = int(distance_match.group(1))
-            
-            # Extraction des équipements
-            equipements = []
-            equip_container = soup.find('div', {'class': '_3eNLO'})
-            if equip_container:
-                for equip in equip_container.find_all('div', {'class': '_3Jxf3'}):
-                    equipements.append(equip.text.strip())
-            
-            return {
-                'prix': prix,
-                'marque': marque,
-                'modele': modele,
-                'annee': annee,
-                'image_url': image_url,
-                'motorisation': motorisation,
-                'puissance': puissance,
-                'transmission': transmission,
-                'categorie': categorie,
-                'type_vendeur': type_vendeur,
-                'note_vendeur': note_vendeur,
-                'distance': distance,
-                'equipements': ', '.join(equipements),
-                'specs': specs,
-                'url': url
-            }
-            
+        site = _site(url)
+        if site is None:
+            return None
+        if not cache:
+            _, infos, _, _ = _recuperer(url, site, {})
+            return infos
+        return obtenir_cache_annonces().obtenir(url, lambda entetes: _recuperer(url, site, entetes))
     except Exception as e:
-        print(f"Erreur lors de l'extraction des informations : {str(e)}")
+        # Trace complète pour les pages que l'analyseur ne sait pas lire
+        journal.warning("Extraction des informations de l'annonce %s impossible : %s", url, e, exc_info=True)
         return None 
\ No newline at end of file
@@ -0,0 +1,39 @@
+# Colonnes dont la page de statistiques affiche moyenne et médiane
+COLONNES_METRIQUES = ['Prix', 'Consommation', 'Fiabilite', 'Score_Match']
+COLONNES_CORRELATION = ['Prix', 'Annee', 'Consommation', 'Cout_Assurance', 'Fiabilite', 'Score_Match']
+LIBELLES_DESCRIPTION = ['Nombre', 'Moyenne', 'Écart-type', 'Minimum', '25%', 'Médiane', '75%', 'Maximum']
+
+def avec_scores(df, scores=None):
+    """
+    Retourne df dont la colonne Score_Match porte les scores de la recherche active
+    (Series indexée comme df), ou sans cette colonne si aucune recherche n'est active :
+    la colonne enregistrée n'est plus tenue à jour et ne doit pas être affichée.
+    """
+    df = df.drop(columns=['Score_Match'], errors='ignore')
+    if scores is None:
+        return df
+    return df.assign(Score_Match=scores.reindex(df.index).to_numpy())
+
+def calculer_statistiques(df):
+    """
+    Calcule les agrégations affichées par la page de statistiques, sans Streamlit :
+    moyennes et médianes des métriques principales, score moyen par marque,
+    matrice de corrélation, statistiques détaillées et top 5 des véhicules.
+    Sans colonne Score_Match (voir avec_scores), les statistiques de score valent None.
+    """
+    avec_score = 'Score_Match' in df.columns
+    metriques = {
+        colonne: {'moyenne': df[colonne].mean(), 'mediane': df[colonne].median()}
+        for colonne in COLONNES_METRIQUES if colonne in df.columns
+    }
+
+    description = df.drop(columns=['Revision', 'Equipements_Bits'], errors='ignore').describe()
+    description.index = LIBELLES_DESCRIPTION
+
+    return {
+        'metriques': metriques,
+        'scores_marque': df.groupby('Marque')['Score_Match'].mean().sort_values(ascending=True) if avec_score else None,
+        'correlation': df[[colonne for colonne in COLONNES_CORRELATION if colonne in df.columns]].corr(),
+        'description': description.round(2),
+        'top_5': df.nlargest(5, 'Score_Match')[['Marque', 'Modele', 'Prix', 'Score_Match']] if avec_score else None
+    }
@@ -0,0 +1,465 @@
+import atexit
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+journal = logging.getLogger(__name__)
+
+# Attente avant de retenter une compaction en échec, doublée à chaque nouvel échec (secondes)
+ATTENTE_ECHEC_INITIALE = 1.0
+ATTENTE_ECHEC_MAX = 300.0
+
+def _valeur_json(valeur):
+    """
+    Convertit une valeur issue d'un DataFrame en valeur sérialisable en JSON.
+    Les NaN deviennent None et les scalaires NumPy des types Python natifs.
+    """
+    if hasattr(valeur, 'item') and not isinstance(valeur, (list, dict, str)):
+        valeur = valeur.item()
+    if isinstance(valeur, float) and math.isnan(valeur):
+        return None
+    return valeur
+
+def _enregistrement_json(enregistrement):
+    """Sérialise un enregistrement (dict) de véhicule en texte JSON."""
+    return json.dumps(
+        {cle: _valeur_json(valeur) for cle, valeur in enregistrement.items()},
+        ensure_ascii=False
+    )
+
+class Stockage:
+    """
+    Interface commune des moteurs de stockage des véhicules.
+    Chaque véhicule est identifié par l'index de sa ligne dans le DataFrame.
+    """
+    def charger(self):
+        """Retourne le DataFrame des véhicules indexé par identifiant, ou None si le stockage est vide."""
+        raise NotImplementedError
+
+    def remplacer(self, df):
+        """Remplace l'intégralité des véhicules stockés par ceux du DataFrame."""
+        raise NotImplementedError
+
+    def inserer(self, identifiant, enregistrement):
+        """Ajoute un véhicule."""
+        raise NotImplementedError
+
+    def inserer_lot(self, enregistrements):
+        """Ajoute un dictionnaire {identifiant: enregistrement} de véhicules."""
+        for identifiant, enregistrement in enregistrements.items():
+            self.inserer(identifiant, enregistrement)
+
+    def ajouter_lot(self, enregistrements):
+        """
+        Ajoute une liste de véhicules sous de nouveaux identifiants, à la suite des
+        identifiants existants, et retourne ces identifiants.
+        """
+        df = self.charger()
+        premier = int(df.index.max()) + 1 if df is not None and not df.empty else 0
+        identifiants = list(range(premier, premier + len(enregistrements)))
+        self.inserer_lot(dict(zip(identifiants, enregistrements)))
+        return identifiants
+
+    def mettre_a_jour(self, identifiant, champs):
+        """Met à jour quelques champs d'un véhicule existant."""
+        raise NotImplementedError
+
+    def mettre_a_jour_lot(self, modifications):
+        """Applique un dictionnaire {identifiant: champs} de mises à jour."""
+        for identifiant, champs in modifications.items():
+            self.mettre_a_jour(identifiant, champs)
+
+    def fichiers(self):
+        """Retourne les fichiers dont la modification impose de recharger les véhicules."""
+        return [self.chemin]
+
+    def statistiques(self):
+        """Retourne l'état du stockage à afficher (vide si le moteur n'a rien à signaler)."""
+        return {}
+
+    def fermer(self):
+        """Libère les connexions et fichiers ouverts ; le stockage n'est plus utilisable ensuite."""
+
+class StockageJSON(Stockage):
+    """
+    Stockage historique : un fichier JSON réécrit en entier à chaque modification.
+    """
+    def __init__(self, chemin='data/saved/vehicules.json'):
+        self.chemin = chemin
+
+    def charger(self):
+        try:
+            with open(self.chemin, 'r', encoding='utf-8') as f:
+                vehicules = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not vehicules:
+            return None
+        if isinstance(vehicules, list):
+            # Ancien format : une liste d'enregistrements, identifiés par leur position
+            return pd.DataFrame(vehicules)
+        return pd.DataFrame(list(vehicules.values()), index=[int(identifiant) for identifiant in vehicules])
+
+    def remplacer(self, df):
+        os.makedirs(os.path.dirname(self.chemin) or '.', exist_ok=True)
+        # Enregistrements indexés par identifiant, pour que les identifiants survivent au rechargement
+        vehicules = {str(int(i)): e for i, e in zip(df.index, df.to_dict('records'))}
+        with open(self.chemin, 'w', encoding='utf-8') as f:
+            json.dump(vehicules, f, ensure_ascii=False, indent=2)
+
+    def inserer(self, identifiant, enregistrement):
+        self.inserer_lot({identifiant: enregistrement})
+
+    def inserer_lot(self, enregistrements):
+        df = self.charger()
+        nouvelles_lignes = pd.DataFrame(list(enregistrements.values()), index=list(enregistrements))
+        self.remplacer(nouvelles_lignes if df is None else pd.concat([df, nouvelles_lignes]))
+
+    def mettre_a_jour(self, identifiant, champs):
+        self.mettre_a_jour_lot({identifiant: champs})
+
+    def mettre_a_jour_lot(self, modifications):
+        df = self.charger()
+        if df is None:
+            return
+        for identifiant, champs in modifications.items():
+            # Comme avec SQLite, un véhicule inconnu n'est pas créé par une mise à jour
+            if identifiant not in df.index:
+                continue
+            for cle, valeur in champs.items():
+                df.at[identifiant, cle] = valeur
+        self.remplacer(df)
+
+class StockageSQLite(Stockage):
+    """
+    Stockage dans une base SQLite embarquée : une ligne par véhicule, contenant
+    ses champs au format JSON. Les ajouts et modifications ne touchent qu'une ligne.
+    """
+    def __init__(self, chemin='data/saved/vehicules.db', chemin_migration='data/saved/vehicules.json'):
+        self.chemin = chemin
+        self.chemin_migration = chemin_migration
+        self._verrou = threading.Lock()
+        os.makedirs(os.path.dirname(chemin) or '.', exist_ok=True)
+        self._connexion = sqlite3.connect(chemin, check_same_thread=False)
+        with self._connexion:
+            self._connexion.execute(
+                "CREATE TABLE IF NOT EXISTS vehicules (id INTEGER PRIMARY KEY, donnees TEXT NOT NULL)"
+            )
+            self._connexion.execute(
+                "CREATE TABLE IF NOT EXISTS meta (cle TEXT PRIMARY KEY, valeur TEXT)"
+            )
+        self._migrer_json()
+
+    def _migrer_json(self):
+        """
+        Importe une seule fois le fichier JSON historique dans la base.
+        Le fichier d'origine est conservé tel quel.
+        """
+        with self._verrou:
+            deja_migre = self._connexion.execute(
+                "SELECT 1 FROM meta WHERE cle = 'migration_json'"
+            ).fetchone()
+            if deja_migre:
+                return
+
+            df = StockageJSON(self.chemin_migration).charger() if self.chemin_migration else None
+            with self._connexion:
+                if df is not None and not df.empty:
+                    self._connexion.executemany(
+                        "INSERT OR REPLACE INTO vehicules (id, donnees) VALUES (?, ?)",
+                        ((int(i), _enregistrement_json(e)) for i, e in zip(df.index, df.to_dict('records')))
+                    )
+                self._connexion.execute(
+                    "INSERT INTO meta (cle, valeur) VALUES ('migration_json', ?)",
+                    (self.chemin_migration or '',)
+                )
+
+    def charger(self):
+        with self._verrou:
+            lignes = self._connexion.execute(
+                "SELECT id, donnees FROM vehicules ORDER BY id"
+            ).fetchall()
+        if not lignes:
+            return None
+        return pd.DataFrame(
+            [json.loads(donnees) for _, donnees in lignes],
+            index=[identifiant for identifiant, _ in lignes]
+        )
+
+    def remplacer(self, df):
+        with self._verrou, self._connexion:
+            self._connexion.execute("DELETE FROM vehicules")
+            self._connexion.executemany(
+                "INSERT INTO vehicules (id, donnees) VALUES (?, ?)",
+                ((int(i), _enregistrement_json(e)) for i, e in zip(df.index, df.to_dict('records')))
+            )
+
+    def inserer(self, identifiant, enregistrement):
+        self.inserer_lot({identifiant: enregistrement})
+
+    def inserer_lot(self, enregistrements):
+        # Une seule transaction pour tout le lot
+        with self._verrou, self._connexion:
+            self._connexion.executemany(
+                "INSERT INTO vehicules (id, donnees) VALUES (?, ?)",
+                ((int(i), _enregistrement_json(e)) for i, e in enregistrements.items())
+            )
+
+    def ajouter_lot(self, enregistrements):
+        # Identifiants attribués dans la transaction d'écriture : BEGIN IMMEDIATE prend
+        # le verrou d'écriture de la base avant de lire le plus grand identifiant, si
+        # bien que deux processus (application, import en ligne de commande) ne peuvent
+        # pas attribuer les mêmes
+        with self._verrou, self._connexion:
+            self._connexion.execute("BEGIN IMMEDIATE")
+            premier = self._connexion.execute("SELECT COALESCE(MAX(id), -1) + 1 FROM vehicules").fetchone()[0]
+            identifiants = list(range(premier, premier + len(enregistrements)))
+            self._connexion.executemany(
+                "INSERT INTO vehicules (id, donnees) VALUES (?, ?)",
+                ((i, _enregistrement_json(e)) for i, e in zip(identifiants, enregistrements))
+            )
+        return identifiants
+
+    def mettre_a_jour(self, identifiant, champs):
+        self.mettre_a_jour_lot({identifiant: champs})
+
+    def mettre_a_jour_lot(self, modifications):
+        with self._verrou, self._connexion:
+            for identifiant, champs in modifications.items():
+                if not champs:
+                    continue
+                # json_set modifie les champs directement dans la ligne, sans la relire
+                chemins = ', '.join('?, json(?)' for _ in champs)
+                parametres = []
+                for cle, valeur in champs.items():
+                    parametres.append('$."' + cle + '"')
+                    parametres.append(json.dumps(_valeur_json(valeur), ensure_ascii=False))
+                self._connexion.execute(
+                    f"UPDATE vehicules SET donnees = json_set(donnees, {chemins}) WHERE id = ?",
+                    parametres + [int(identifiant)]
+                )
+
+    def fermer(self):
+        with self._verrou:
+            self._connexion.close()
+
+class StockageJournalise(Stockage):
+    """
+    Journal d'écriture différée placé devant un autre stockage.
+
+    Chaque mise à jour de champs est ajoutée en une ligne au journal (JSON Lines)
+    au lieu d'être écrite dans le stockage principal. Un thread d'arrière-plan
+    regroupe ensuite les lignes par véhicule et les reporte dans le stockage
+    principal (compaction). Au chargement, le journal est rejoué par-dessus
+    l'instantané du stockage principal.
+    """
+    def __init__(self, stockage, chemin=None, delai=1.0):
+        self.stockage = stockage
+        self.chemin = chemin or os.path.splitext(stockage.chemin)[0] + '.journal.jsonl'
+        self.chemin_compaction = self.chemin + '.compaction'
+        self.delai = delai
+        # Fonctions appelées après chaque compaction (le contenu logique est inchangé)
+        self.apres_compaction = []
+        self._verrou_fichier = threading.Lock()
+        self._verrou_compaction = threading.Lock()
+        self._fichier = None
+        self._evenement = threading.Event()
+        self._thread = None
+        self._ferme = False
+        # Dernière compaction en échec (message) et nombre d'échecs consécutifs
+        self.erreur = None
+        self.echecs = 0
+
+    @staticmethod
+    def _lire_journaux(*chemins):
+        """
+        Lit les journaux dans l'ordre et regroupe les modifications par véhicule,
+        la dernière valeur écrite l'emportant. Une ligne tronquée (arrêt brutal
+        pendant une écriture) est ignorée.
+        """
+        modifications = {}
+        for chemin in chemins:
+            try:
+                with open(chemin, 'r', encoding='utf-8') as f:
+                    for ligne in f:
+                        try:
+                            entree = json.loads(ligne)
+                        except json.JSONDecodeError:
+                            continue
+                        modifications.setdefault(entree['id'], {}).update(entree['champs'])
+            except FileNotFoundError:
+                pass
+        return modifications
+
+    def _fermer_fichier(self):
+        if self._fichier is not None:
+            self._fichier.close()
+            self._fichier = None
+
+    def charger(self):
+        with self._verrou_compaction:
+            df = self.stockage.charger()
+            with self._verrou_fichier:
+                modifications = self._lire_journaux(self.chemin_compaction, self.chemin)
+        if df is not None:
+            for identifiant, champs in modifications.items():
+                if identifiant not in df.index:
+                    continue
+                for cle, valeur in champs.items():
+                    df.at[identifiant, cle] = valeur
+        return df
+
+    def remplacer(self, df):
+        # L'instantané complet contient déjà toutes les modifications journalisées
+        with self._verrou_compaction:
+            self.stockage.remplacer(df)
+            with self._verrou_fichier:
+                self._fermer_fichier()
+                for chemin in (self.chemin, self.chemin_compaction):
+                    if os.path.exists(chemin):
+                        os.remove(chemin)
+
+    def inserer(self, identifiant, enregistrement):
+        self.stockage.inserer(identifiant, enregistrement)
+
+    def inserer_lot(self, enregistrements):
+        self.stockage.inserer_lot(enregistrements)
+
+    def ajouter_lot(self, enregistrements):
+        return self.stockage.ajouter_lot(enregistrements)
+
+    def fichiers(self):
+        return self.stockage.fichiers() + [self.chemin, self.chemin_compaction]
+
+    def mettre_a_jour(self, identifiant, champs):
+        ligne = json.dumps(
+            {'id': int(identifiant), 'champs': {cle: _valeur_json(valeur) for cle, valeur in champs.items()}},
+            ensure_ascii=False
+        )
+        with self._verrou_fichier:
+            if self._fichier is None:
+                self._fichier = open(self.chemin, 'a', encoding='utf-8')
+            self._fichier.write(ligne + '\n')
+            self._fichier.flush()
+            self._demarrer()
+        self._evenement.set()
+
+    def compacter(self):
+        """
+        Reporte le journal dans le stockage principal. Le journal courant est
+        d'abord renommé afin que les nouvelles écritures partent dans un fichier
+        neuf pendant la compaction. Après une compaction en échec, le journal
+        renommé qui reste est reporté en premier, puis le journal courant.
+        """
+        with self._verrou_compaction:
+            compacte = False
+            while True:
+                with self._verrou_fichier:
+                    self._fermer_fichier()
+                    reprise = os.path.exists(self.chemin_compaction)
+                    if not reprise and os.path.exists(self.chemin):
+                        os.replace(self.chemin, self.chemin_compaction)
+                if not os.path.exists(self.chemin_compaction):
+                    break
+
+                modifications = self._lire_journaux(self.chemin_compaction)
+                if modifications:
+                    self.stockage.mettre_a_jour_lot(modifications)
+                os.remove(self.chemin_compaction)
+                compacte = True
+                # Le journal courant n'est repris dans la même passe qu'après une reprise
+                if not reprise:
+                    break
+            if not compacte:
+                return
+
+        # Hors du verrou : les rappels peuvent eux-mêmes recharger les données
+        for rappel in self.apres_compaction:
+            rappel()
+
+    def _demarrer(self):
+        """Démarre le thread de compaction à la première écriture."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._boucle, daemon=True)
+            self._thread.start()
+            atexit.register(self.compacter)
+
+    def _boucle(self):
+        while True:
+            self._evenement.wait()
+            # Laisse les modifications rapprochées s'accumuler avant de compacter
+            time.sleep(self.delai)
+            self._evenement.clear()
+            if self._ferme:
+                return
+            try:
+                self.compacter()
+            except Exception as e:
+                # Le journal est conservé : rien n'est perdu, mais il grossit tant que
+                # la compaction échoue. Les essais suivants sont de plus en plus espacés.
+                self.echecs += 1
+                self.erreur = str(e) or type(e).__name__
+                attente = min(ATTENTE_ECHEC_MAX, ATTENTE_ECHEC_INITIALE * 2 ** (self.echecs - 1))
+                # Trace complète au premier échec, un simple avertissement ensuite
+                (journal.exception if self.echecs == 1 else journal.warning)(
+                    "Compaction du journal %s en échec (%d fois), nouvel essai dans %.1f s : %s",
+                    self.chemin, self.echecs, attente, self.erreur
+                )
+                time.sleep(attente)
+                self._evenement.set()
+            else:
+                if self.echecs:
+                    journal.info("Compaction du journal %s rétablie après %d échec(s)", self.chemin, self.echecs)
+                self.echecs = 0
+                self.erreur = None
+
+    def fermer(self):
+        """
+        Reporte le journal dans le stockage principal, arrête le thread de compaction
+        et ferme le stockage principal.
+        """
+        self._ferme = True
+        self._evenement.set()
+        if self._thread is not None:
+            atexit.unregister(self.compacter)
+        self.compacter()
+        with self._verrou_fichier:
+            self._fermer_fichier()
+        self.stockage.fermer()
+
+    def statistiques(self):
+        """
+        Retourne la taille du journal en attente de compaction (octets), le nombre
+        de compactions consécutives en échec et le message de la dernière erreur.
+        """
+        taille = 0
+        for chemin in (self.chemin, self.chemin_compaction):
+            try:
+                taille += os.path.getsize(chemin)
+            except OSError:
+                pass
+        return {'taille_journal': taille, 'echecs': self.echecs, 'erreur': self.erreur}
+
+_stockage = None
+
+def obtenir_stockage():
+    """
+    Retourne le moteur de stockage actif (SQLite derrière un journal par défaut).
+    """
+    global _stockage
+    if _stockage is None:
+        _stockage = StockageJournalise(StockageSQLite())
+    return _stockage
+
+def definir_stockage(stockage):
+    """
+    Remplace le moteur de stockage actif (par exemple par un StockageJSON).
+    """
+    global _stockage
+    _stockage = stockage